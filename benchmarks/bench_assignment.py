@@ -0,0 +1,160 @@
+"""
+Benchmark of the assignment strategies of the AutomatedParkingLot. For every size of parking lot it replays the
+same synthetic trace, where one gate gets most of the arrivals, with every strategy on an in-memory db, then
+reports the mean walking distance from the entrypoint to the slot, the share of rejected arrivals, the mean spread
+of the zone loads when a vehicle arrives, the difference between the shares of the slots that are taken in the
+busiest and in the emptiest zone, and the p50/p99 latency of picking a slot.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_assignment --output results.json
+"""
+
+from benchmarks.synthetic import generate_parking_map, generate_trace, PARK
+from benchmarks.bench_parking_lot import summarize
+from src.parking_lot import AutomatedParkingLot
+from src.parking_slot import ParkingSlot
+from src.assignment import AssignmentStrategy, NearestSlotStrategy, SmallestFitStrategy, ZoneBalancingStrategy
+from src.event_stream import GateEvent, apply_events
+from src.exceptions import NoMoreAvailableSpot
+from src.enums import Direction
+from src.db import Base, create_db_engine
+
+from datetime import datetime
+
+import argparse
+import json
+import platform
+import sys
+import time
+
+STRATEGIES = {
+    "nearest": NearestSlotStrategy,
+    "smallest_fit": SmallestFitStrategy,
+    "zone_balancing": ZoneBalancingStrategy
+}
+
+
+class TimedStrategy(AssignmentStrategy):
+    """
+    Records the latency of every slot search of a strategy
+    """
+    def __init__(self, strategy: AssignmentStrategy):
+        self.strategy = strategy
+        self.latencies = []
+
+    def find_slot(self, slot_index, slot_store, vehicle_size, entrypoint):
+        start = time.perf_counter()
+        slot_id = self.strategy.find_slot(slot_index, slot_store, vehicle_size, entrypoint)
+        self.latencies.append(time.perf_counter() - start)
+
+        return slot_id
+
+
+def to_gate_events(trace: list):
+    """
+    Converts a synthetic trace to gate events
+    :param trace: the list of the Event tuples
+    :return: the generator of the GateEvent objects
+    """
+    for event in trace:
+        if event.kind == PARK:
+            yield GateEvent(event.license_plate, event.size, event.entrypoint, event.date, Direction.IN)
+        else:
+            yield GateEvent(event.license_plate, None, None, event.date, Direction.OUT)
+
+
+def bench_strategy(parking_map: dict, trace: list, strategy: AssignmentStrategy):
+    """
+    Replays a trace on an empty parking lot that uses a strategy
+    :param parking_map: the parking map of the parking lot
+    :param trace: the list of the Event tuples
+    :param strategy: the AssignmentStrategy object
+    :return: the dictionary of the results of the strategy
+    """
+    engine = create_db_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    timed_strategy = TimedStrategy(strategy)
+    parking_lot = AutomatedParkingLot(parking_map, len(parking_map["entrypoints"]), engine=engine,
+                                      assignment_strategy=timed_strategy)
+    slot_store = parking_lot._slot_store
+    zones = range(len(parking_map["distances"][0]))
+    num_of_arrivals = num_of_rejections = total_distance = total_load_spread = 0
+
+    for event, result in apply_events(parking_lot, to_gate_events(trace), batch_size=1000):
+        if event.direction != Direction.IN:
+            continue
+
+        num_of_arrivals += 1
+        loads = [slot_store.load(zone) for zone in zones]
+        total_load_spread += max(loads) - min(loads)
+
+        if isinstance(result, NoMoreAvailableSpot):
+            num_of_rejections += 1
+        elif isinstance(result, ParkingSlot):
+            total_distance += result.distances[event.entrypoint.value]
+
+    parking_lot._session.close()
+    engine.dispose()
+    num_of_parked = num_of_arrivals - num_of_rejections
+
+    return {
+        "mean_distance": total_distance / num_of_parked if num_of_parked else None,
+        "rejection_rate": num_of_rejections / num_of_arrivals if num_of_arrivals else None,
+        "mean_zone_load_spread": total_load_spread / num_of_arrivals if num_of_arrivals else None,
+        "slot_search": summarize(timed_strategy.latencies)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="the numbers of slots of the parking lots")
+    parser.add_argument("--entrypoints", type=int, default=3, help="the number of entrypoints, from 3 to 5")
+    parser.add_argument("--visits", type=int, default=5000, help="the number of arrivals of every trace")
+    parser.add_argument("--occupancy", type=float, default=0.8, help="the expected share of occupied slots")
+    parser.add_argument("--hot-gate-share", type=float, default=0.6,
+                        help="the share of the arrivals that come in through the first entrypoint")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the parking maps and traces")
+    parser.add_argument("--output", help="the path of the JSON results, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    if not 3 <= args.entrypoints <= 5:
+        parser.error("the number of entrypoints must be from 3 to 5")
+
+    other_gate_share = (1 - args.hot_gate_share) / (args.entrypoints - 1)
+    entrypoint_weights = [args.hot_gate_share] + [other_gate_share] * (args.entrypoints - 1)
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "hot_gate_share": args.hot_gate_share,
+        "runs": []
+    }
+
+    for num_of_slots in args.slots:
+        parking_map = generate_parking_map(num_of_slots, args.entrypoints, args.seed)
+        trace = generate_trace(parking_map, args.visits, args.occupancy, seed=args.seed,
+                               entrypoint_weights=entrypoint_weights)
+
+        for name, strategy_class in STRATEGIES.items():
+            run = {"num_of_slots": num_of_slots, "strategy": name,
+                   **bench_strategy(parking_map, trace, strategy_class())}
+            results["runs"].append(run)
+            print(f"{num_of_slots:>7} slots {name:>14}: distance {run['mean_distance'] or 0:8.2f}, "
+                  f"rejected {run['rejection_rate']:6.2%}, zone load spread {run['mean_zone_load_spread'] or 0:6.2%}, "
+                  f"p50 {run['slot_search']['p50_ms'] or 0:7.4f} ms, p99 {run['slot_search']['p99_ms'] or 0:7.4f} ms",
+                  file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
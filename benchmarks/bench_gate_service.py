@@ -0,0 +1,158 @@
+"""
+Benchmark of the HTTP gate service. Many keep-alive clients park and unpark the vehicles of a synthetic parking
+lot on localhost, once with a service that commits every request on its own and once with a service that
+coalesces the concurrent requests, and the throughput, the p50/p99 latency of the requests and the number of
+commits are reported.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_gate_service --output results.json
+"""
+
+from benchmarks.synthetic import generate_parking_map
+from benchmarks.bench_parking_lot import summarize
+from src.parking_lot import AutomatedParkingLot
+from src.gate_service import GateService
+from src.db import Base, create_db_engine
+from src.enums import Size
+
+from sqlalchemy import event
+from datetime import datetime
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+MODES = {"per_request": {"coalesce_window": 0, "max_batch_size": 1}, "coalesced": {}}
+
+
+async def request(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, path: str, body: dict):
+    data = json.dumps(body).encode()
+    writer.write(f"POST {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode() + data)
+    status = int((await reader.readline()).split()[1])
+    content_length = 0
+    line = await reader.readline()
+
+    while line != b"\r\n":
+        name, _, value = line.decode().partition(":")
+
+        if name.lower() == "content-length":
+            content_length = int(value)
+
+        line = await reader.readline()
+
+    await reader.readexactly(content_length)
+
+    return status
+
+
+async def client(port: int, client_id: int, num_of_visits: int, latencies: list):
+    """
+    Parks and unparks the vehicles of a client over one keep-alive connection
+    :param port: the port of the service
+    :param client_id: the number of the client
+    :param num_of_visits: the number of vehicles of the client
+    :param latencies: the list the latencies of the requests are appended to
+    :return:
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    for i in range(num_of_visits):
+        vehicle = {"license_plate": f"C{client_id}V{i}", "size": Size(i % 3 + 1).name, "entrypoint": "A",
+                   "timestamp": "2022-09-25T10:00:00"}
+
+        for path, body in [("/park", vehicle), ("/unpark", {"license_plate": vehicle["license_plate"],
+                                                            "timestamp": "2022-09-25T12:00:00"})]:
+            start = time.perf_counter()
+            await request(reader, writer, path, body)
+            latencies.append(time.perf_counter() - start)
+
+    writer.close()
+
+
+def bench_mode(parking_map: dict, mode: str, num_of_clients: int, num_of_visits: int, directory: str):
+    """
+    Runs the clients against a service with an empty parking lot
+    :param parking_map: the parking map of the parking lot
+    :param mode: one of the MODES
+    :param num_of_clients: the number of concurrent clients
+    :param num_of_visits: the number of vehicles of every client
+    :param directory: the directory of the db
+    :return: the dictionary of the results of the mode
+    """
+    engine = create_db_engine(f"sqlite:///{os.path.join(directory, mode + '.db')}", journal_mode="WAL",
+                              synchronous="NORMAL")
+    Base.metadata.create_all(engine)
+    parking_lot = AutomatedParkingLot(parking_map, len(parking_map["entrypoints"]), engine=engine)
+    commits = []
+    latencies = []
+    event.listen(engine, "commit", lambda connection: commits.append(connection))
+
+    async def run():
+        async with GateService(parking_lot, port=0, **MODES[mode]) as service:
+            await asyncio.gather(*(client(service.port, client_id, num_of_visits, latencies)
+                                   for client_id in range(num_of_clients)))
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    total = time.perf_counter() - start
+    parking_lot._session.close()
+    engine.dispose()
+
+    return {
+        "requests_per_s": len(latencies) / total,
+        "commits": len(commits),
+        "requests": summarize(latencies)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, default=10000, help="the number of slots of the parking lot")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64],
+                        help="the numbers of concurrent clients")
+    parser.add_argument("--visits", type=int, default=50, help="the number of vehicles of every client")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the parking map")
+    parser.add_argument("--output", help="the path of the JSON results, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    parking_map = generate_parking_map(args.slots, seed=args.seed)
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "runs": []
+    }
+
+    for num_of_clients in args.clients:
+        baseline = None
+
+        with tempfile.TemporaryDirectory() as directory:
+            for mode in MODES:
+                run = {"clients": num_of_clients, "mode": mode,
+                       **bench_mode(parking_map, mode, num_of_clients, args.visits, directory)}
+                baseline = baseline or run["requests_per_s"]
+                run["speedup"] = run["requests_per_s"] / baseline
+                results["runs"].append(run)
+                print(f"{num_of_clients:>4} clients {mode:>11}: {run['requests_per_s']:8.0f} requests/s "
+                      f"({run['speedup']:5.1f}x), {run['commits']:6} commits, "
+                      f"p50 {run['requests']['p50_ms'] or 0:7.3f} ms, p99 {run['requests']['p99_ms'] or 0:7.3f} ms",
+                      file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
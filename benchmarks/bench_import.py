@@ -0,0 +1,91 @@
+"""
+Benchmark of the import time of the modules of the src package. Every module is imported by a fresh interpreter,
+several times, and the median time of the import is reported together with whether it imported SQLAlchemy and
+whether it created the default db engine of src.db.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_import --output results.json
+"""
+
+from datetime import datetime
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+
+MODULES = ["src.enums", "src.fee_calculator", "src.slot_index", "src.assignment", "src.vehicles",
+           "src.parking_lot", "src.journaled_parking_lot", "src.event_stream"]
+
+IMPORT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+db = sys.modules.get("src.db")
+print(json.dumps({{"seconds": seconds, "sqlalchemy": "sqlalchemy" in sys.modules,
+                   "engine": db is not None and "engine" in vars(db)}}))
+"""
+
+
+def bench_module(module: str, repeat: int):
+    """
+    Imports a module in fresh interpreters
+    :param module: the name of the module
+    :param repeat: the number of imports
+    :return: the dictionary of the results of the module
+    """
+    runs = []
+
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, "-c", IMPORT_SCRIPT.format(module=module)], check=True,
+                                capture_output=True, text=True, cwd=os.getcwd()).stdout
+        runs.append(json.loads(output))
+
+    seconds = sorted(run["seconds"] for run in runs)
+
+    return {
+        "module": module,
+        "median_ms": statistics.median(seconds) * 1000,
+        "min_ms": seconds[0] * 1000,
+        "imports_sqlalchemy": runs[-1]["sqlalchemy"],
+        "creates_engine": runs[-1]["engine"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modules", nargs="+", default=MODULES, help="the modules to import")
+    parser.add_argument("--repeat", type=int, default=7, help="the number of imports of every module")
+    parser.add_argument("--output", help="the path of the JSON results, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": []
+    }
+
+    for module in args.modules:
+        run = bench_module(module, args.repeat)
+        results["runs"].append(run)
+        print(f"{module:>28}: median {run['median_ms']:8.1f} ms, min {run['min_ms']:8.1f} ms, "
+              f"sqlalchemy {'yes' if run['imports_sqlalchemy'] else 'no':>3}, "
+              f"engine {'yes' if run['creates_engine'] else 'no':>3}", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
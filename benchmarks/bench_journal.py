@@ -0,0 +1,136 @@
+"""
+Benchmark of the persistence backends of the parking lot. For every size of parking lot it replays the same
+synthetic trace on an AutomatedParkingLot that commits every call to a SQLite db, on a JournaledParkingLot, and on
+a JournaledParkingLot that also writes the records to a SQLite db through a ReportingSink, then reports the
+throughput and the p50/p99 latency of parking and unparking, the speedup over the db, and how long the journaled
+parking lot takes to recover from its journal.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_journal --output results.json
+"""
+
+from benchmarks.synthetic import generate_parking_map, generate_trace
+from benchmarks.bench_parking_lot import replay, summarize
+from src.parking_lot import AutomatedParkingLot
+from src.journal import Journal, ReportingSink
+from src.journaled_parking_lot import JournaledParkingLot
+from src.db import Base, create_db_engine
+
+from datetime import datetime
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+BACKENDS = ["db", "journal", "journal_with_sink"]
+
+
+def create_engine(directory: str, name: str):
+    engine = create_db_engine(f"sqlite:///{os.path.join(directory, name)}", journal_mode="WAL", synchronous="NORMAL")
+    Base.metadata.create_all(engine)
+
+    return engine
+
+
+def bench_backend(parking_map: dict, trace: list, backend: str, fsync_interval: float, directory: str):
+    """
+    Replays a trace on an empty parking lot of a backend
+    :param parking_map: the parking map of the parking lot
+    :param trace: the list of the Event tuples
+    :param backend: one of the BACKENDS
+    :param fsync_interval: the fsync interval of the journals
+    :param directory: the directory of the db and journal files
+    :return: the dictionary of the results of the backend
+    """
+    num_of_entrypoints = len(parking_map["entrypoints"])
+    recovery_latencies = []
+    start = time.perf_counter()
+
+    if backend == "db":
+        engine = create_engine(directory, "parking_lot.db")
+        parking_lot = AutomatedParkingLot(parking_map, num_of_entrypoints, engine=engine)
+        park_latencies, unpark_latencies, _ = replay(parking_lot, trace)
+        parking_lot._session.close()
+        engine.dispose()
+        total = time.perf_counter() - start
+    else:
+        journal_directory = os.path.join(directory, backend)
+        engine = create_engine(directory, "reports.db") if backend == "journal_with_sink" else None
+        reporting_sink = ReportingSink(engine) if engine is not None else None
+
+        with JournaledParkingLot(parking_map, Journal(journal_directory, fsync_interval), num_of_entrypoints,
+                                 reporting_sink=reporting_sink) as parking_lot:
+            park_latencies, unpark_latencies, _ = replay(parking_lot, trace)
+
+        total = time.perf_counter() - start  # including the wait for the reporting sink
+        recovery_start = time.perf_counter()
+        JournaledParkingLot(parking_map, Journal(journal_directory), num_of_entrypoints).close()
+        recovery_latencies.append(time.perf_counter() - recovery_start)
+
+        if engine is not None:
+            engine.dispose()
+
+    return {
+        "operations_per_s": (len(park_latencies) + len(unpark_latencies)) / total,
+        "park": summarize(park_latencies),
+        "unpark": summarize(unpark_latencies),
+        "recovery": summarize(recovery_latencies)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, nargs="+", default=[1000, 10000],
+                        help="the numbers of slots of the parking lots")
+    parser.add_argument("--entrypoints", type=int, default=3, help="the number of entrypoints, from 3 to 5")
+    parser.add_argument("--visits", type=int, default=5000, help="the number of arrivals of every trace")
+    parser.add_argument("--fsync-interval", type=float, default=0.01,
+                        help="the number of seconds the records of the journals can wait for an fsync")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the parking maps and traces")
+    parser.add_argument("--output", help="the path of the JSON results, defaults to stdout")
+    args = parser.parse_args(argv)
+
+    if not 3 <= args.entrypoints <= 5:
+        parser.error("the number of entrypoints must be from 3 to 5")
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "fsync_interval": args.fsync_interval,
+        "runs": []
+    }
+
+    for num_of_slots in args.slots:
+        parking_map = generate_parking_map(num_of_slots, args.entrypoints, args.seed)
+        trace = generate_trace(parking_map, args.visits, seed=args.seed)
+        db_operations_per_s = None
+
+        with tempfile.TemporaryDirectory() as directory:
+            for backend in BACKENDS:
+                run = {"num_of_slots": num_of_slots, "backend": backend,
+                       **bench_backend(parking_map, trace, backend, args.fsync_interval, directory)}
+                db_operations_per_s = db_operations_per_s or run["operations_per_s"]
+                run["speedup"] = run["operations_per_s"] / db_operations_per_s
+                results["runs"].append(run)
+                print(f"{num_of_slots:>7} slots {backend:>17}: {run['operations_per_s']:9.0f} ops/s "
+                      f"({run['speedup']:5.1f}x), park p50 {run['park']['p50_ms'] or 0:7.3f} ms, "
+                      f"p99 {run['park']['p99_ms'] or 0:7.3f} ms", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,288 @@
+"""
+Benchmark of the AutomatedParkingLot. For every size of parking lot and number of entrypoints it replays a
+synthetic trace of arrivals and departures on a fresh db, then reports the throughput and the p50/p99 latency
+of park_vehicle, unpark_vehicle, ParkingFeeCalculator.calculate_fee and of the warm restart of the parking lot.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_parking_lot --output results.json
+
+The results are written as JSON. Passing the JSON of an earlier run with --baseline compares the p50 latencies
+to it and exits with 1 if one of them regressed more than --max-regression.
+"""
+
+from benchmarks.synthetic import generate_parking_map, generate_occupants, generate_trace, PARK
+from src.vehicles import Base, Vehicle, ParkingVehicle
+from src.parking_slot import ParkingSlot
+from src.parking_lot import AutomatedParkingLot
+from src.fee_calculator import ParkingFeeCalculator
+from src.exceptions import NoMoreAvailableSpot
+from src.db import create_db_engine
+
+from datetime import datetime
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import sqlalchemy
+
+
+def summarize(latencies: list):
+    """
+    Summarizes the latencies of an operation
+    :param latencies: the list of the latencies in seconds
+    :return: the dictionary of the count, throughput and latency percentiles of the operation
+    """
+    latencies = sorted(latencies)
+    count = len(latencies)
+    total = sum(latencies)
+
+    def percentile(q):
+        return latencies[min(count - 1, int(q * count))] * 1000 if count else None
+
+    return {
+        "count": count,
+        "total_s": total,
+        "throughput_per_s": count / total if total else None,
+        "p50_ms": percentile(0.5),
+        "p99_ms": percentile(0.99),
+        "max_ms": latencies[-1] * 1000 if count else None
+    }
+
+
+def fill_db(engine, occupants: list):
+    """
+    Fills the db with the vehicles that are already parked when the trace starts
+    :param engine: the Engine of the db
+    :param occupants: the list of the Occupant tuples
+    :return:
+    """
+    if not occupants:
+        return
+
+    with engine.begin() as connection:
+        connection.execute(Vehicle.__table__.insert(), [
+            {"license_plate": occupant.license_plate, "type": "parking_vehicle", "size": occupant.size,
+             "date_of_first_entry": occupant.date_of_entry, "date_of_entry": occupant.date_of_entry,
+             "charge_flat_rate": True, "date_of_exit": None, "total_hours_stayed": 0, "hour_paid": 0}
+            for occupant in occupants])
+        connection.execute(ParkingSlot.__table__.insert(), [
+            {"slot_id": occupant.slot_id, "vehicle_plate": occupant.license_plate, "size": occupant.size}
+            for occupant in occupants])
+
+
+def replay(parking_lot: AutomatedParkingLot, trace: list):
+    """
+    Replays a trace of arrivals and departures on the parking lot
+    :param parking_lot: the AutomatedParkingLot object
+    :param trace: the list of the Event tuples
+    :return: the latencies of the parks, the latencies of the unparks and the number of rejected vehicles
+    """
+    park_latencies = []
+    unpark_latencies = []
+    rejected = set()
+
+    for event in trace:
+        vehicle = ParkingVehicle(event.size, event.license_plate)
+
+        if event.kind == PARK:
+            start = time.perf_counter()
+
+            try:
+                parking_lot.park_vehicle(vehicle, event.entrypoint, event.date)
+            except NoMoreAvailableSpot:
+                rejected.add(event.license_plate)
+                continue
+
+            park_latencies.append(time.perf_counter() - start)
+            rejected.discard(event.license_plate)
+        elif event.license_plate not in rejected:
+            start = time.perf_counter()
+            parking_lot.unpark_vehicle(vehicle, event.date)
+            unpark_latencies.append(time.perf_counter() - start)
+
+    return park_latencies, unpark_latencies, len(rejected)
+
+
+def bench_fees(trace: list, occupants: list, num_of_entrypoints: int):
+    """
+    Measures the fee calculation of the visits of a trace, without the db
+    :param trace: the list of the Event tuples
+    :param occupants: the list of the Occupant tuples of the vehicles parked before the trace
+    :param num_of_entrypoints: the number of entrypoints of the parking lot
+    :return: the list of the latencies of calculate_fee
+    """
+    fee_calculator = ParkingFeeCalculator()
+    dates_of_entry = {occupant.license_plate: occupant.date_of_entry for occupant in occupants}
+    vehicles = []
+
+    for event in trace:
+        if event.kind == PARK:
+            dates_of_entry[event.license_plate] = event.date
+            continue
+
+        vehicle = ParkingVehicle(event.size, event.license_plate)
+        vehicle.date_of_entry = vehicle.date_of_first_entry = dates_of_entry[event.license_plate]
+        vehicle.date_of_exit = event.date
+        vehicle.hour_paid = 0
+        vehicle.charge_flat_rate = True
+        vehicle.slot = ParkingSlot(0, event.size, (0,) * num_of_entrypoints)
+        vehicles.append(vehicle)
+
+    latencies = []
+
+    for vehicle in vehicles:
+        start = time.perf_counter()
+        fee_calculator.calculate_fee(vehicle)
+        latencies.append(time.perf_counter() - start)
+
+    return latencies
+
+
+def bench_parking_lot(num_of_slots: int, num_of_entrypoints: int, num_of_visits: int, num_of_restarts: int,
+                      seed: int):
+    """
+    Runs the benchmarks of one parking lot on a fresh db. The parking lot starts warm, with the share of
+    occupied slots the trace keeps.
+    :param num_of_slots: the number of slots of the parking lot
+    :param num_of_entrypoints: the number of entrypoints of the parking lot
+    :param num_of_visits: the number of arrivals of the trace
+    :param num_of_restarts: the number of warm restarts measured after the trace
+    :param seed: the seed of the parking map and trace
+    :return: the dictionary of the results of the parking lot
+    """
+    parking_map = generate_parking_map(num_of_slots, num_of_entrypoints, seed)
+    occupants = generate_occupants(parking_map, seed=seed)
+    trace = generate_trace(parking_map, num_of_visits, occupants=occupants, seed=seed)
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_db_engine(f"sqlite:///{os.path.join(directory, 'parking_lot.db')}", journal_mode="WAL",
+                                  synchronous="NORMAL")
+        Base.metadata.create_all(engine)
+        fill_db(engine, occupants)
+
+        parking_lot = AutomatedParkingLot(parking_map, num_of_entrypoints, engine=engine)
+        park_latencies, unpark_latencies, num_of_rejected = replay(parking_lot, trace)
+        parking_lot._session.close()
+
+        restart_latencies = []
+
+        for _ in range(num_of_restarts):
+            start = time.perf_counter()
+            parking_lot = AutomatedParkingLot(parking_map, num_of_entrypoints, engine=engine)
+            restart_latencies.append(time.perf_counter() - start)
+            parking_lot._session.close()
+
+        occupied_slots = int(parking_lot._slot_store.occupied.sum())
+        engine.dispose()
+
+    return {
+        "num_of_slots": num_of_slots,
+        "num_of_entrypoints": num_of_entrypoints,
+        "num_of_visits": num_of_visits,
+        "rejected_vehicles": num_of_rejected,
+        "occupied_slots_at_restart": occupied_slots,
+        "operations": {
+            "park": summarize(park_latencies),
+            "unpark": summarize(unpark_latencies),
+            "fee": summarize(bench_fees(trace, occupants, num_of_entrypoints)),
+            "warm_restart": summarize(restart_latencies)
+        }
+    }
+
+
+def compare(results: dict, baseline: dict, max_regression: float):
+    """
+    Compares the p50 latencies of the results to the ones of a baseline run
+    :param results: the results of this run
+    :param baseline: the results of the baseline run
+    :param max_regression: the allowed relative increase of a p50 latency
+    :return: the list of the messages of the regressed operations
+    """
+    baseline_runs = {(run["num_of_slots"], run["num_of_entrypoints"]): run for run in baseline["runs"]}
+    regressions = []
+
+    for run in results["runs"]:
+        baseline_run = baseline_runs.get((run["num_of_slots"], run["num_of_entrypoints"]))
+
+        if baseline_run is None:
+            continue
+
+        for operation, stats in run["operations"].items():
+            baseline_p50 = baseline_run["operations"].get(operation, {}).get("p50_ms")
+
+            if not baseline_p50 or stats["p50_ms"] is None:
+                continue
+
+            ratio = stats["p50_ms"] / baseline_p50
+
+            if ratio > 1 + max_regression:
+                regressions.append(f"{operation} of {run['num_of_slots']} slots and {run['num_of_entrypoints']} "
+                                   f"entrypoints: p50 {baseline_p50:.3f} ms -> {stats['p50_ms']:.3f} ms")
+
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--slots", type=int, nargs="+", default=[10, 1000, 10000, 100000],
+                        help="the numbers of slots of the parking lots")
+    parser.add_argument("--entrypoints", type=int, nargs="+", default=[3, 5],
+                        help="the numbers of entrypoints of the parking lots, from 3 to 5")
+    parser.add_argument("--visits", type=int, default=2000, help="the number of arrivals of every trace")
+    parser.add_argument("--restarts", type=int, default=3, help="the number of measured warm restarts")
+    parser.add_argument("--seed", type=int, default=0, help="the seed of the parking maps and traces")
+    parser.add_argument("--output", help="the path of the JSON results, defaults to stdout")
+    parser.add_argument("--baseline", help="the path of the JSON results of a run to compare to")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="the allowed relative increase of a p50 latency over the baseline")
+    args = parser.parse_args(argv)
+
+    if any(not 3 <= num_of_entrypoints <= 5 for num_of_entrypoints in args.entrypoints):
+        parser.error("the number of entrypoints must be from 3 to 5")
+
+    results = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "seed": args.seed,
+        "runs": []
+    }
+
+    for num_of_slots in args.slots:
+        for num_of_entrypoints in args.entrypoints:
+            run = bench_parking_lot(num_of_slots, num_of_entrypoints, args.visits, args.restarts, args.seed)
+            results["runs"].append(run)
+
+            for operation, stats in run["operations"].items():
+                print(f"{num_of_slots:>7} slots {num_of_entrypoints} entrypoints {operation:>12}: "
+                      f"{stats['count']:>6} ops, p50 {stats['p50_ms'] or 0:9.3f} ms, p99 {stats['p99_ms'] or 0:9.3f} ms",
+                      file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(results, json.load(file), args.max_regression)
+
+        for regression in regressions:
+            print(f"regression: {regression}", file=sys.stderr)
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+"""
+Benchmark of the warm restart of the AutomatedParkingLot. It fills a fresh db with occupied slots and
+recently exited vehicles, then reports how long the parking lot takes to restore them, from the parking map
+dictionary and from a cached compiled parking map.
+
+Run it from the root of the repository:
+
+    python -m benchmarks.bench_startup
+"""
+
+import sys
+import tempfile
+import time
+
+from src.vehicles import Base, Vehicle
+from src.parking_slot import ParkingSlot
+from src.parking_lot import AutomatedParkingLot
+from src.enums import Size, EntryPoint
+from src.compiled_parking_map import CompiledParkingMap, compile_parking_map
+from src.db import create_db_engine
+
+from sqlalchemy import event
+from datetime import datetime, timedelta
+
+NUM_OF_SLOTS = 50000
+OCCUPIED_SLOTS = [0, 1000, 10000, 50000]
+
+
+def fill_db(engine, num_of_occupied_slots: int):
+    """
+    Fills the db with occupied slots and as many vehicles that exited within the continuous window
+    :param engine: the Engine of the db
+    :param num_of_occupied_slots: the number of occupied slots
+    :return:
+    """
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+
+    date_of_entry = datetime(2022, 9, 25, 15, 30)
+    parked = [{"license_plate": f"P{i}", "type": "parking_vehicle", "size": Size.SMALL,
+               "date_of_first_entry": date_of_entry, "date_of_entry": date_of_entry, "charge_flat_rate": True,
+               "date_of_exit": None, "total_hours_stayed": 0, "hour_paid": 0} for i in range(num_of_occupied_slots)]
+    exited = [dict(vehicle, license_plate=f"E{i}", date_of_exit=date_of_entry + timedelta(hours=2))
+              for i, vehicle in enumerate(parked)]
+
+    with engine.begin() as connection:
+        if parked:
+            connection.execute(Vehicle.__table__.insert(), parked + exited)
+            connection.execute(ParkingSlot.__table__.insert(), [
+                {"slot_id": i, "vehicle_plate": f"P{i}", "size": Size.SMALL} for i in range(num_of_occupied_slots)])
+
+
+def main():
+    parking_map = {
+        "slot_sizes": [Size.SMALL] * NUM_OF_SLOTS,
+        "distances": [(i, NUM_OF_SLOTS - i, i % 100) for i in range(NUM_OF_SLOTS)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+    directory = tempfile.mkdtemp()
+    engine = create_db_engine(f"sqlite:///{directory}/parking_lot.db", journal_mode="WAL", synchronous="NORMAL")
+    compiled_parking_map_path = f"{directory}/{compile_parking_map(parking_map, cache_dir=directory).hash}.plmap"
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(args[2]))
+
+    print(f"{'occupied slots':>15} {'restore time (s)':>17} {'compiled map (s)':>17} {'queries':>8}")
+
+    for num_of_occupied_slots in OCCUPIED_SLOTS:
+        fill_db(engine, num_of_occupied_slots)
+        queries.clear()
+
+        start = time.perf_counter()
+        parking_lot = AutomatedParkingLot(parking_map, engine=engine)  # a new session, like a new process
+        restore_time = time.perf_counter() - start
+
+        parking_lot._session.close()
+        num_of_queries = len(queries)
+
+        start = time.perf_counter()
+        parking_lot = AutomatedParkingLot(CompiledParkingMap.load(compiled_parking_map_path), engine=engine)
+        compiled_restore_time = time.perf_counter() - start
+
+        parking_lot._session.close()
+
+        print(f"{num_of_occupied_slots:>15} {restore_time:>17.3f} {compiled_restore_time:>17.3f} {num_of_queries:>8}")
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
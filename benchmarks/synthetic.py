@@ -0,0 +1,154 @@
+"""
+Generators of synthetic parking maps and arrival and departure traces for the benchmarks.
+"""
+
+from src.enums import Size, EntryPoint, Hours
+
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+import heapq
+import math
+import random
+
+PARK = "park"
+UNPARK = "unpark"
+
+Event = namedtuple("Event", ["date", "kind", "license_plate", "size", "entrypoint"])
+Occupant = namedtuple("Occupant", ["slot_id", "license_plate", "size", "date_of_entry", "date_of_exit"])
+
+SIZE_WEIGHTS = {Size.SMALL: 0.5, Size.MEDIUM: 0.35, Size.LARGE: 0.15}
+
+
+def generate_parking_map(num_of_slots: int, num_of_entrypoints: int = 3, seed: int = 0):
+    """
+    Generates the parking map of a square parking lot. The slots are laid out on a grid and the entrypoints
+    are spread along its border, so the distance of a slot from an entrypoint is their manhattan distance.
+    :param num_of_slots: the number of slots of the parking lot
+    :param num_of_entrypoints: the number of entrypoints of the parking lot
+    :param seed: the seed of the random slot sizes
+    :return: the parking map dictionary
+    """
+    rng = random.Random(seed)
+    width = math.ceil(math.sqrt(num_of_slots))
+    entrypoints = list(EntryPoint)[:num_of_entrypoints]
+    perimeter = 4 * width
+
+    gates = []
+
+    for i in range(num_of_entrypoints):
+        position = i * perimeter // num_of_entrypoints
+        side, offset = divmod(position, width)
+        gates.append([(offset, -1), (width, offset), (width - 1 - offset, width), (-1, width - 1 - offset)][side])
+
+    slot_sizes = rng.choices(list(SIZE_WEIGHTS), weights=list(SIZE_WEIGHTS.values()), k=num_of_slots)
+    distances = [tuple(abs(i % width - x) + abs(i // width - y) for x, y in gates) for i in range(num_of_slots)]
+
+    return {
+        "slot_sizes": slot_sizes,
+        "distances": distances,
+        "entrypoints": entrypoints
+    }
+
+
+def _duration_of_stay(rng: random.Random):
+    """
+    Draws how long a vehicle stays in the parking lot. Most of the vehicles stay for a few hours, some for
+    the rest of the day and a few for more than a day.
+    :param rng: the random number generator
+    :return: the timedelta of the stay
+    """
+    kind = rng.random()
+
+    if kind < 0.85:
+        hours = min(rng.lognormvariate(math.log(2), 0.6), Hours.IN_A_DAY.value)
+    elif kind < 0.97:
+        hours = rng.uniform(Hours.WITHIN_FLAT_RATE.value, Hours.IN_A_DAY.value)
+    else:
+        hours = rng.uniform(Hours.IN_A_DAY.value, 3 * Hours.IN_A_DAY.value)
+
+    return timedelta(minutes=max(1, round(hours * 60)))
+
+
+def generate_occupants(parking_map: dict, occupancy=0.8, start=datetime(2022, 9, 25, 6, 0), seed: int = 0):
+    """
+    Generates the vehicles that are already parked when a trace starts, so the trace starts from a warm
+    parking lot instead of an empty one. Every vehicle is in a random slot of its own size.
+    :param parking_map: the parking map of the parking lot
+    :param occupancy: the share of occupied slots
+    :param start: the date the trace starts
+    :param seed: the seed of the occupants
+    :return: the list of the Occupant tuples
+    """
+    rng = random.Random(seed)
+    num_of_slots = len(parking_map["slot_sizes"])
+    occupants = []
+
+    for i, slot_id in enumerate(sorted(rng.sample(range(num_of_slots), int(occupancy * num_of_slots)))):
+        stay = _duration_of_stay(rng)
+        date_of_entry = start - stay * rng.random()
+        occupants.append(Occupant(slot_id, f"W{i:07d}", parking_map["slot_sizes"][slot_id], date_of_entry,
+                                  date_of_entry + stay))
+
+    return occupants
+
+
+def generate_trace(parking_map: dict, num_of_visits: int, occupancy=0.8, return_probability=0.1,
+                   start=datetime(2022, 9, 25, 6, 0), occupants: list = (), seed: int = 0,
+                   entrypoint_weights: list = None):
+    """
+    Generates a trace of arrivals and departures. The vehicles arrive as a Poisson process at the rate that
+    keeps the given share of the slots occupied, and some of them come back within the continuous window
+    after they leave.
+    :param parking_map: the parking map of the parking lot
+    :param num_of_visits: the number of arrivals of the trace
+    :param occupancy: the expected share of occupied slots once the parking lot is warm
+    :param return_probability: the probability that a vehicle comes back within the continuous window
+    :param start: the date of the first arrival
+    :param occupants: the Occupant tuples of the vehicles already parked, whose departures are part of the trace
+    :param seed: the seed of the trace
+    :param entrypoint_weights: the relative weights of the entrypoints of the arrivals, e.g. to make one gate
+    busier than the others. Defaults to the same weight for every entrypoint.
+    :return: the list of the Event tuples ordered by date, with departures before arrivals at the same date. The
+    trace ends at the last arrival, so the vehicles that are still parked then never leave.
+    """
+    rng = random.Random(seed)
+    entrypoints = parking_map["entrypoints"]
+    mean_stay_hours = 3.5
+    arrivals_per_hour = max(occupancy * len(parking_map["slot_sizes"]) / mean_stay_hours, 1)
+    continuous_minutes = Hours.WITHIN_CONTINUOUS.value * 60
+
+    events = [Event(occupant.date_of_exit, UNPARK, occupant.license_plate, occupant.size, None)
+              for occupant in occupants]
+    returns = []  # min-heap of the (date, license_plate, size) of the vehicles that come back
+    date = start
+    num_of_vehicles = 0
+
+    for _ in range(num_of_visits):
+        next_arrival = date + timedelta(hours=rng.expovariate(arrivals_per_hour))
+
+        if returns and returns[0][0] <= next_arrival:
+            date, license_plate, size = heapq.heappop(returns)
+        else:
+            date = next_arrival
+            license_plate = f"V{num_of_vehicles:07d}"
+            size = rng.choices(list(SIZE_WEIGHTS), weights=list(SIZE_WEIGHTS.values()))[0]
+            num_of_vehicles += 1
+
+        date_of_exit = date + _duration_of_stay(rng)
+        if entrypoint_weights is None:
+            entrypoint = rng.choice(entrypoints)
+        else:
+            entrypoint = rng.choices(entrypoints, weights=entrypoint_weights)[0]
+
+        events.append(Event(date, PARK, license_plate, size, entrypoint))
+        events.append(Event(date_of_exit, UNPARK, license_plate, size, None))
+
+        if rng.random() < return_probability:
+            date_of_return = date_of_exit + timedelta(minutes=rng.randint(1, continuous_minutes - 1))
+            heapq.heappush(returns, (date_of_return, license_plate, size))
+
+    events = [event for event in events if event.date <= date]
+    events.sort(key=lambda event: (event.date, event.kind != UNPARK))
+
+    return events
@@ -1,13 +1,34 @@
-"""A simple interactive cmdline program for the Parking Lot system"""
+"""
+The command line program of the Parking Lot system. Without a command it runs the interactive program, and the
+commands park, unpark, replay, status and bench process many vehicles at once and print their results as JSON lines,
+and serve runs the HTTP gate service.
+
+    python main.py park ABC123 small A 2022-09-25T15:30
+    printf "ABC123 small A\\nABC456 large B\\n" | python main.py park --layout layout.json
+    python main.py unpark ABC123
+    python main.py replay gate_events.ndjson
+    python main.py status
+    python main.py bench --slots 1000 --visits 10000
+    python main.py serve --port 8080
+"""
 
 from src.vehicles import Vehicle, ParkingVehicle, Base
 from src.parking_lot import AutomatedParkingLot
-from src.enums import EntryPoint, Size
-from src.db import engine
+from src.compiled_parking_map import CompiledParkingMap, load_parking_map
+from src.event_stream import parse_event, apply_events, replay, write_results
+from src.exceptions import InvalidGateEvent, InvalidEntryPoint
+from src.enums import EntryPoint, Size, Direction
 
-import datetime
+from contextlib import nullcontext
 
-Base.metadata.create_all(engine)
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
 
 slots = [Size.SMALL, Size.LARGE, Size.MEDIUM, Size.SMALL, Size.MEDIUM, Size.LARGE]
 distances = [(1, 2, 3), (1, 3, 2), (3, 2, 1), (2, 1, 3), (3, 1, 2), (2, 3, 1)]
@@ -19,7 +40,10 @@ parking_map = {
     "entrypoints": entrypoints
 }
 
-parking_lot = AutomatedParkingLot(parking_map)
+COMMAND_FIELDS = {
+    Direction.IN: ["license_plate", "size", "entrypoint", "timestamp"],
+    Direction.OUT: ["license_plate", "timestamp"]
+}
 
 
 def entry_point_prompt():
@@ -59,7 +83,7 @@ def size_prompt():
             print("Invalid size, please try again.")
 
 
-def prompt(action):
+def prompt(parking_lot: AutomatedParkingLot, action):
     if action.lower() not in ["park", "unpark"]:
         print("Invalid action input, please try again.")
         return
@@ -86,12 +110,270 @@ def prompt(action):
             print(e)
 
 
-def main():
+def interactive(parking_lot: AutomatedParkingLot):
     print("Welcome to the OOP Parking Lot!")
     while True:
         action = input("Please select an action (park/unpark): ")
-        prompt(action)
+        prompt(parking_lot, action)
+
+
+def parse_command(fields: list, direction: Direction):
+    """
+    Parses a park or unpark command
+    :param fields: the list of the fields of the command: the license plate, the size and the entrypoint of a
+    vehicle coming in, and the timestamp, which defaults to now
+    :param direction: Direction.IN for park, Direction.OUT for unpark
+    :return: the GateEvent object
+    """
+    names = COMMAND_FIELDS[direction]
+
+    if not fields or len(fields) > len(names):
+        raise InvalidGateEvent(f"Invalid command {' '.join(fields)!r}, expected {' '.join(names)}")
+
+    record = {"timestamp": datetime.datetime.now().isoformat(), **dict(zip(names, fields)),
+              "direction": direction.value}
+
+    return parse_event(record)
+
+
+def read_commands(lines, direction: Direction):
+    """
+    Reads the park or unpark commands of lines, one command per line with its fields separated by spaces or commas
+    :param lines: the iterable of the lines, e.g. stdin
+    :param direction: Direction.IN for park, Direction.OUT for unpark
+    :return: the generator of the GateEvent objects, and of the InvalidGateEvent exceptions of the invalid lines
+    """
+    for line in lines:
+        fields = line.replace(",", " ").split()
+
+        if not fields:
+            continue
+
+        try:
+            yield parse_command(fields, direction)
+        except InvalidGateEvent as e:
+            yield e
+
+
+def create_parking_lot(layout, db_url: str = None, journal_directory: str = None, db_settings: dict = None):
+    """
+    Creates the parking lot of the command line program
+    :param layout: the parking map dictionary or CompiledParkingMap object
+    :param db_url: the url of the db, defaults to the db of src.db
+    :param journal_directory: the directory of the journal of a JournaledParkingLot, which is used instead of the db
+    :param db_settings: the SQLite settings of the db url, defaults to the PARKING_LOT_DB_* variables like the
+    default engine of src.db
+    :return: the AutomatedParkingLot object
+    """
+    if journal_directory:
+        from src.journal import Journal
+        from src.journaled_parking_lot import JournaledParkingLot
+
+        return JournaledParkingLot(layout, Journal(journal_directory))
+
+    if db_url:
+        from src.db import create_db_engine, environment_settings
+
+        engine = create_db_engine(db_url, **(db_settings if db_settings is not None else environment_settings()))
+    else:
+        from src.db import engine  # the default engine of src.db, from the PARKING_LOT_DB_URL variable
+
+    Base.metadata.create_all(engine)
+
+    return AutomatedParkingLot(layout, engine=engine)
+
+
+def close_parking_lot(parking_lot: AutomatedParkingLot):
+    if hasattr(parking_lot, "close"):
+        parking_lot.close()
+    else:
+        parking_lot._session.close()
+
+
+def write_status(parking_lot: AutomatedParkingLot, zone: EntryPoint, output):
+    """
+    Writes the number of slots, of occupied slots and of available slots of every size as JSON lines
+    :param parking_lot: the AutomatedParkingLot object
+    :param zone: the entrypoint whose zone is counted, or None for the whole parking lot
+    :param output: the file object to write to
+    :return:
+    """
+    for size, (num_of_slots, num_of_occupied_slots) in parking_lot.occupancy(zone).items():
+        record = {"size": size.name, "slots": num_of_slots, "occupied": num_of_occupied_slots,
+                  "available": parking_lot.available_slots(size, zone)}
+
+        if zone is not None:
+            record["zone"] = zone.name
+
+        output.write(json.dumps(record) + "\n")
+
+
+def bench(layout: dict, backend: str, num_of_visits: int, batch_size: int, seed: int):
+    """
+    Replays a synthetic trace through the same pipeline as the replay command, on a parking lot with fresh storage
+    :param layout: the parking map dictionary the trace is generated for
+    :param backend: "db" for a SQLite db, "journal" for a JournaledParkingLot
+    :param num_of_visits: the number of arrivals of the trace
+    :param batch_size: the number of events committed together
+    :param seed: the seed of the trace
+    :return: the dictionary of the throughput of the parking lot
+    """
+    from benchmarks.synthetic import generate_trace, PARK
+
+    lines = []
+
+    for event in generate_trace(layout, num_of_visits, seed=seed):
+        record = {"license_plate": event.license_plate, "timestamp": event.date.isoformat(),
+                  "direction": Direction.IN.value if event.kind == PARK else Direction.OUT.value}
+
+        if event.kind == PARK:
+            record.update(size=event.size.name, entrypoint=event.entrypoint.name)
+
+        lines.append(json.dumps(record))
+
+    with tempfile.TemporaryDirectory() as directory:
+        if backend == "journal":
+            parking_lot = create_parking_lot(layout, journal_directory=os.path.join(directory, "journal"))
+        else:
+            # the db is thrown away, so it doesn't need the durability of the default settings
+            parking_lot = create_parking_lot(layout, db_url=f"sqlite:///{os.path.join(directory, 'parking_lot.db')}",
+                                             db_settings={"journal_mode": "WAL", "synchronous": "NORMAL"})
+
+        with open(os.devnull, "w") as devnull:
+            start = time.perf_counter()
+            num_of_errors = write_results(replay(parking_lot, lines, batch_size=batch_size), devnull)
+            seconds = time.perf_counter() - start
+
+        close_parking_lot(parking_lot)
+
+    return {"backend": backend, "events": len(lines), "errors": num_of_errors, "batch_size": batch_size,
+            "seconds": seconds, "events_per_s": len(lines) / seconds}
+
+
+def parse_args(argv):
+    storage = argparse.ArgumentParser(add_help=False)
+    storage.add_argument("--layout", help="the JSON layout or compiled parking map file of the parking lot, "
+                                          "defaults to the 6 slots of main.py")
+    storage.add_argument("--db", help="the url of the db, defaults to $PARKING_LOT_DB_URL or sqlite:///parking_lot.db")
+    storage.add_argument("--journal", help="the directory of a journal to store the parking lot in instead of the db")
+
+    batches = argparse.ArgumentParser(add_help=False)
+    batches.add_argument("--batch-size", type=int, default=1000, help="the number of commands committed together")
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+
+    park = commands.add_parser("park", parents=[storage, batches], help="park vehicles",
+                               description="Parks a vehicle, or the vehicles of the lines of stdin, one "
+                                           "'LICENSE_PLATE SIZE ENTRYPOINT [TIMESTAMP]' per line")
+    park.add_argument("fields", nargs="*", metavar="LICENSE_PLATE SIZE ENTRYPOINT [TIMESTAMP]")
+
+    unpark = commands.add_parser("unpark", parents=[storage, batches], help="unpark vehicles",
+                                 description="Unparks a vehicle, or the vehicles of the lines of stdin, one "
+                                             "'LICENSE_PLATE [TIMESTAMP]' per line")
+    unpark.add_argument("fields", nargs="*", metavar="LICENSE_PLATE [TIMESTAMP]")
+
+    replay_parser = commands.add_parser("replay", parents=[storage, batches], help="replay a file of gate events")
+    replay_parser.add_argument("file", help="the NDJSON or CSV file of the gate events, - for stdin")
+    replay_parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson",
+                               help="the format of the gate events")
+    replay_parser.add_argument("--max-delay", type=float, default=300,
+                               help="how many seconds late an event can arrive and still be put in order")
+
+    status = commands.add_parser("status", parents=[storage], help="print the occupancy of the parking lot")
+    status.add_argument("--zone", type=str.upper, choices=[entrypoint.name for entrypoint in EntryPoint],
+                        help="the entrypoint whose zone is counted, defaults to the whole parking lot")
+
+    bench_parser = commands.add_parser("bench", parents=[batches], help="measure the throughput of the replay "
+                                                                        "pipeline on a synthetic trace")
+    bench_parser.add_argument("--layout", help="the JSON layout the trace is generated for, defaults to the 6 slots "
+                                               "of main.py")
+    bench_parser.add_argument("--slots", type=int, help="generate a layout of this many slots instead")
+    bench_parser.add_argument("--backend", choices=["db", "journal"], default="db",
+                              help="store the parking lot in a SQLite db or in a journal")
+    bench_parser.add_argument("--visits", type=int, default=10000, help="the number of arrivals of the trace")
+    bench_parser.add_argument("--seed", type=int, default=0, help="the seed of the layout and trace")
+
+    serve = commands.add_parser("serve", parents=[storage], help="run the HTTP gate service")
+    serve.add_argument("--host", default="127.0.0.1", help="the host the service listens on")
+    serve.add_argument("--port", type=int, default=8080, help="the port the service listens on")
+    serve.add_argument("--coalesce-window", type=float, default=0.002,
+                       help="how many seconds the service waits for more requests to commit together")
+    serve.add_argument("--max-pending", type=int, default=4096,
+                       help="how many requests can wait for a commit before the service answers 503")
+
+    commands.add_parser("interactive", parents=[storage], help="run the interactive program, the default")
+
+    return parser.parse_args(argv)
+
+
+def run_commands(parking_lot: AutomatedParkingLot, args, output):
+    """
+    Runs the park, unpark or replay command in batches and writes the result of every vehicle as a JSON line
+    :param parking_lot: the AutomatedParkingLot object
+    :param args: the parsed arguments
+    :param output: the file object to write to
+    :return: the number of commands that failed
+    """
+    if args.command == "replay":
+        with (nullcontext(sys.stdin) if args.file == "-" else open(args.file, newline="")) as lines:
+            return write_results(replay(parking_lot, lines, args.format, args.batch_size,
+                                        datetime.timedelta(seconds=args.max_delay)), output)
+
+    direction = Direction.IN if args.command == "park" else Direction.OUT
+    events = [parse_command(args.fields, direction)] if args.fields else read_commands(sys.stdin, direction)
+
+    return write_results(apply_events(parking_lot, events, args.batch_size), output)
+
+
+def main(argv=None):
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+
+    if args.command == "bench":
+        if args.slots is not None:
+            from benchmarks.synthetic import generate_parking_map
+
+            layout = generate_parking_map(args.slots, seed=args.seed)
+        else:
+            layout = load_parking_map(args.layout) if args.layout else parking_map
+
+        if isinstance(layout, CompiledParkingMap):
+            print("bench needs a JSON layout to generate its trace", file=sys.stderr)
+            return 2
+
+        sys.stdout.write(json.dumps(bench(layout, args.backend, args.visits, args.batch_size, args.seed)) + "\n")
+
+        return 0
+
+    parking_lot = create_parking_lot(load_parking_map(args.layout) if args.layout else parking_map, args.db,
+                                     args.journal)
+
+    try:
+        if args.command in (None, "interactive"):
+            interactive(parking_lot)
+        elif args.command == "serve":
+            from src.gate_service import GateService
+
+            service = GateService(parking_lot, args.host, args.port, args.coalesce_window,
+                                  max_pending=args.max_pending)
+
+            try:
+                asyncio.run(service.serve_forever())
+            except KeyboardInterrupt:
+                pass
+        elif args.command == "status":
+            try:
+                write_status(parking_lot, EntryPoint[args.zone] if args.zone else None, sys.stdout)
+            except InvalidEntryPoint:
+                print(f"the parking lot has no entrypoint {args.zone}", file=sys.stderr)
+                return 2
+        elif run_commands(parking_lot, args, sys.stdout):
+            return 1  # some of the commands failed, their errors are in the output
+    finally:
+        close_parking_lot(parking_lot)
+
+    return 0
 
 
 if __name__ == '__main__':
-    main()
+    sys.exit(main())
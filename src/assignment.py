@@ -0,0 +1,132 @@
+from src.slot_index import SlotIndex
+from src.slot_store import SlotStore
+from src.enums import Size, EntryPoint
+
+from abc import ABC, abstractmethod
+
+import numpy as np
+import weakref
+
+
+class AssignmentStrategy(ABC):
+    """
+    Abstract class of the policies that pick the slot of an arriving vehicle. A strategy only looks at the free
+    slots through the SlotIndex and at the counters of the SlotStore, so it takes a constant number of
+    O(log n) index lookups per arrival.
+    """
+    @abstractmethod
+    def find_slot(self, slot_index: SlotIndex, slot_store: SlotStore, vehicle_size: Size, entrypoint: EntryPoint):
+        raise NotImplementedError("You need to implement this method.")
+
+
+class NearestSlotStrategy(AssignmentStrategy):
+    """
+    Assigns the nearest free slot from the entrypoint that fits the vehicle, the smaller slot on a tie
+    """
+    def find_slot(self, slot_index: SlotIndex, slot_store: SlotStore, vehicle_size: Size, entrypoint: EntryPoint):
+        """
+        Finds the slot of an arriving vehicle
+        :param slot_index: the SlotIndex object of the free slots
+        :param slot_store: the SlotStore object of the slots
+        :param vehicle_size: the size of the vehicle
+        :param entrypoint: the entry point of the vehicle to the parking lot
+        :return: the id of the slot, or None if there is no slot available
+        """
+        return slot_index.find_nearest(vehicle_size, entrypoint)
+
+
+class SmallestFitStrategy(AssignmentStrategy):
+    """
+    Assigns the nearest free slot of the smallest size that fits the vehicle, so the larger slots are kept for
+    the larger vehicles until the smaller ones run out
+    """
+    def __init__(self, max_detour=None):
+        """
+        Constructor for the SmallestFitStrategy class
+
+        :param max_detour: how much farther than the nearest fitting slot the smaller slot can be, a larger
+        slot is assigned instead beyond it. Defaults to no limit.
+        """
+        self._max_detour = max_detour
+
+    def find_slot(self, slot_index: SlotIndex, slot_store: SlotStore, vehicle_size: Size, entrypoint: EntryPoint):
+        """
+        Finds the slot of an arriving vehicle
+        :param slot_index: the SlotIndex object of the free slots
+        :param slot_store: the SlotStore object of the slots
+        :param vehicle_size: the size of the vehicle
+        :param entrypoint: the entry point of the vehicle to the parking lot
+        :return: the id of the slot, or None if there is no slot available
+        """
+        candidates = [slot_index.peek(size, entrypoint) for size in Size if size.value >= vehicle_size.value]
+        candidates = [candidate for candidate in candidates if candidate is not None]  # from the smallest size
+
+        if not candidates:
+            return None
+
+        if self._max_detour is None:
+            return candidates[0][2]
+
+        max_distance = min(candidates)[0] + self._max_detour
+
+        return next(candidate[2] for candidate in candidates if candidate[0] <= max_distance)
+
+
+class ZoneBalancingStrategy(AssignmentStrategy):
+    """
+    Spreads the arrivals over the zones of the parking lot by their occupancy. The candidates are the nearest
+    fitting slot from every entrypoint, and each one costs its distance from the entrypoint of the vehicle plus
+    a penalty for the share of the slots of its zone that are taken, so the vehicles of a busy gate overflow to
+    the emptier zones before the slots around the gate run out. The penalty is scaled by the median distance of
+    the slots from the entrypoint, so the same weight works for small and large parking lots. The same strategy
+    can serve several parking lots, e.g. the shards of a ShardedParkingLot, as the medians are kept per SlotStore.
+    """
+    def __init__(self, load_weight=2.0):
+        """
+        Constructor for the ZoneBalancingStrategy class
+
+        :param load_weight: the penalty of a full zone, in median distances from the entrypoint. 0 assigns the
+        nearest slot.
+        """
+        self._load_weight = load_weight
+        # by SlotStore and entrypoint, computed once from the distances of the slots of every parking lot
+        self._median_distances = weakref.WeakKeyDictionary()
+
+    def find_slot(self, slot_index: SlotIndex, slot_store: SlotStore, vehicle_size: Size, entrypoint: EntryPoint):
+        """
+        Finds the slot of an arriving vehicle
+        :param slot_index: the SlotIndex object of the free slots
+        :param slot_store: the SlotStore object of the slots
+        :param vehicle_size: the size of the vehicle
+        :param entrypoint: the entry point of the vehicle to the parking lot
+        :return: the id of the slot, or None if there is no slot available
+        """
+        distances = slot_store.distances[entrypoint.value]
+        median_distances = self._median_distances.setdefault(slot_store, {})
+        median_distance = median_distances.get(entrypoint)
+
+        if median_distance is None:
+            median_distance = median_distances[entrypoint] = float(np.median(distances))
+
+        load_penalty = self._load_weight * median_distance
+        loads = {}
+        best = None
+
+        for candidate_entrypoint in slot_index.entrypoints:
+            slot_id = slot_index.find_nearest(vehicle_size, candidate_entrypoint)
+
+            if slot_id is None:
+                return None  # there is no slot available from any entrypoint
+
+            zone = int(slot_store.zones[slot_id])
+
+            if zone not in loads:
+                loads[zone] = slot_store.load(zone)
+
+            distance = distances[slot_id].item()
+            candidate = (distance + load_penalty * loads[zone], distance, slot_id)
+
+            if best is None or candidate < best:
+                best = candidate
+
+        return best[2]
@@ -0,0 +1,133 @@
+from src.parking_lot import AutomatedParkingLot
+from src.vehicles import Vehicle, ParkingVehicle
+from src.enums import EntryPoint
+
+from datetime import datetime
+
+import asyncio
+
+
+class AsyncParkingLot:
+    """
+    An asyncio front end of an AutomatedParkingLot that serves the park and unpark requests of many gates
+    at once. The slots are assigned in memory without awaiting, so two gates can never get the same slot, and
+    the changes are committed to the db by a single writer task that groups all the pending requests in one
+    commit.
+    """
+    def __init__(self, parking_lot: AutomatedParkingLot, max_batch_size=512):
+        """
+        Constructor for the AsyncParkingLot class
+
+        :param parking_lot: the AutomatedParkingLot object that assigns the slots
+        :param max_batch_size: the maximum number of requests committed together
+        """
+        self._parking_lot = parking_lot
+        self._max_batch_size = max_batch_size
+        self._pending_commits = None
+        self._writer = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    @property
+    def parking_lot(self):
+        return self._parking_lot
+
+    async def start(self):
+        """
+        Starts the writer task that commits the changes to the db
+        :return:
+        """
+        if self._writer is not None:
+            return
+
+        self._pending_commits = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write())
+
+    async def stop(self):
+        """
+        Commits the pending changes and stops the writer task
+        :return:
+        """
+        if self._writer is None:
+            return
+
+        self._pending_commits.put_nowait(None)
+        await self._writer
+        self._writer = None
+
+    async def _write(self):
+        """
+        The writer task. It waits for a request to commit, then commits it together with all the other requests
+        that are already waiting.
+        :return:
+        """
+        stopped = False
+
+        while not stopped:
+            waiters = [await self._pending_commits.get()]
+
+            while not self._pending_commits.empty() and len(waiters) < self._max_batch_size:
+                waiters.append(self._pending_commits.get_nowait())
+
+            if None in waiters:  # stop() was called, commit what is left and exit
+                stopped = True
+                waiters = [waiter for waiter in waiters if waiter is not None]
+
+            if not waiters:
+                continue
+
+            try:
+                self._parking_lot._commit()
+            except Exception as e:
+                self._parking_lot._rollback()
+
+                for waiter in waiters:
+                    waiter.set_exception(e)
+            else:
+                for waiter in waiters:
+                    waiter.set_result(None)
+
+    def _wait_for_commit(self):
+        """
+        Queues a request to commit the changes made so far
+        :return: the future that is done once the changes are committed
+        """
+        if self._writer is None:
+            raise RuntimeError("The AsyncParkingLot has not been started.")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._pending_commits.put_nowait(waiter)
+
+        return waiter
+
+    async def park_vehicle(self, vehicle: ParkingVehicle, entrypoint: EntryPoint, date_of_entry: datetime):
+        """
+        Parks a vehicle to the nearest parking spot and waits until it is committed to the db
+        :param vehicle: the ParkingVehicle object
+        :param entrypoint: the entrypoint where the vehicle came in
+        :param date_of_entry: the date the vehicle came into the parking lot
+        :return: the assigned ParkingSlot object for the vehicle
+        """
+        nearest_slot = self._parking_lot._park(vehicle, entrypoint, date_of_entry)
+
+        await self._wait_for_commit()
+
+        return nearest_slot
+
+    async def unpark_vehicle(self, vehicle: Vehicle, date_of_exit: datetime):
+        """
+        Unparks a vehicle from its parking slot and waits until it is committed to the db
+        :param vehicle: the Vehicle object
+        :param date_of_exit: the date the vehicle left the parking slot
+        :return: the total parking fee for the vehicle
+        """
+        total_fee = self._parking_lot._unpark(vehicle, date_of_exit)
+
+        await self._wait_for_commit()
+
+        return total_fee
@@ -0,0 +1,109 @@
+from src.enums import Size, Rates, Hours
+from src.exceptions import FeeCannotBeCalculated
+
+from collections import namedtuple
+
+import numpy as np
+
+MICROSECONDS_IN_A_SECOND = 1000000
+SECONDS_IN_AN_HOUR = 3600
+SECONDS_IN_A_DAY = 86400
+
+FeeBatch = namedtuple("FeeBatch", ["fees", "hour_paid", "charge_flat_rate", "total_hours_stayed"])
+
+
+class BatchParkingFeeCalculator:
+    """
+    A fee calculator that computes the parking fees of many vehicles at once from columnar arrays. It gives the
+    same fees and vehicle state as ParkingFeeCalculator.calculate_fee without using ParkingVehicle objects.
+    """
+    def __init__(self, flat_rate=40, hourly_rates: dict = None, day_over_rate=Rates.DAY_OVER.value):
+        """
+        Constructor for the BatchParkingFeeCalculator class
+
+        :param flat_rate: the flat rate for the first hours
+        :param hourly_rates: a dictionary of the hourly rate for each slot Size, defaults to the Rates enum
+        :param day_over_rate: the rate for every full day
+        """
+        if hourly_rates is None:
+            hourly_rates = {size: Rates[size.name].value for size in Size}
+
+        self._flat_rate = flat_rate
+        self._day_over_rate = day_over_rate
+        self._hourly_rates = np.zeros(max(size.value for size in Size) + 1, dtype=np.result_type(
+            *hourly_rates.values()))
+
+        for size, rate in hourly_rates.items():
+            self._hourly_rates[size.value] = rate
+
+    @staticmethod
+    def _to_size_values(slot_sizes):
+        """
+        Converts the slot sizes to an array of their Size values
+        :param slot_sizes: an array of Size members or of their values
+        :return: the int array of the Size values
+        """
+        slot_sizes = np.asarray(slot_sizes)
+
+        if slot_sizes.dtype == object:
+            slot_sizes = np.array([size.value for size in slot_sizes.ravel()]).reshape(slot_sizes.shape)
+
+        return slot_sizes.astype(np.int64)
+
+    def calculate_fees(self, date_of_entry, date_of_first_entry, date_of_exit, slot_sizes, hour_paid,
+                       charge_flat_rate):
+        """
+        A function that calculates the total parking fees of a batch of vehicles. The arguments are arrays
+        with one entry per vehicle, the same as the ParkingVehicle columns.
+        :param date_of_entry: the dates of entry of the vehicles
+        :param date_of_first_entry: the dates of first entry of the vehicles
+        :param date_of_exit: the dates of exit of the vehicles
+        :param slot_sizes: the sizes of the parking slots of the vehicles
+        :param hour_paid: the hours already paid by the vehicles
+        :param charge_flat_rate: whether the vehicles are still charged the flat rate
+        :return: a FeeBatch with the total parking fees and the updated hour_paid, charge_flat_rate and
+        total_hours_stayed of the vehicles
+        """
+        date_of_entry = np.asarray(date_of_entry, dtype="datetime64[us]")
+        date_of_first_entry = np.asarray(date_of_first_entry, dtype="datetime64[us]")
+        date_of_exit = np.asarray(date_of_exit, dtype="datetime64[us]")
+        rates = self._hourly_rates[self._to_size_values(slot_sizes)]
+        hour_paid = np.asarray(hour_paid, dtype=np.int64)
+        charge_flat_rate = np.asarray(charge_flat_rate, dtype=bool)
+
+        if np.isnat(date_of_entry).any() or np.isnat(date_of_first_entry).any() or np.isnat(date_of_exit).any():
+            raise FeeCannotBeCalculated("Parking fee cannot be calculated. The vehicles must contain a date of entry "
+                                        "and a date of exit.")
+
+        # split the time since the first entry into days and seconds the same way a timedelta does
+        time_diff = (date_of_exit - date_of_first_entry).astype(np.int64)
+        exceeding_days = time_diff // (SECONDS_IN_A_DAY * MICROSECONDS_IN_A_SECOND)
+        seconds = time_diff // MICROSECONDS_IN_A_SECOND - exceeding_days * SECONDS_IN_A_DAY
+
+        hours_stayed = exceeding_days * Hours.IN_A_DAY.value + seconds / SECONDS_IN_AN_HOUR
+        total_hours = exceeding_days * Hours.IN_A_DAY.value - (-seconds // SECONDS_IN_AN_HOUR)  # round up
+
+        to_charge = hours_stayed > hour_paid
+        day_over = to_charge & (exceeding_days > 0)
+        within_a_day = to_charge & ~day_over
+        flat_rate = within_a_day & charge_flat_rate
+
+        # vehicles that stayed for more than a day pay the unpaid days and lose the flat rate
+        unpaid_days = exceeding_days - hour_paid // Hours.IN_A_DAY.value
+        fees = np.where(day_over, self._day_over_rate * unpaid_days, 0)
+        fees = fees + np.where(flat_rate, self._flat_rate, 0)
+        new_hour_paid = np.where(day_over, unpaid_days * Hours.IN_A_DAY.value, hour_paid)
+        new_hour_paid = np.where(flat_rate, Hours.WITHIN_FLAT_RATE.value, new_hour_paid)
+
+        exceeding_hours = np.where(day_over, total_hours % Hours.IN_A_DAY.value, total_hours - new_hour_paid)
+        exceeded = to_charge & (exceeding_hours >= 0)
+
+        fees = fees + np.where(exceeded, rates * exceeding_hours, 0)
+        new_hour_paid = new_hour_paid + np.where(exceeded, exceeding_hours, 0)
+
+        return FeeBatch(
+            fees=fees,
+            hour_paid=new_hour_paid,
+            charge_flat_rate=charge_flat_rate & ~day_over,
+            total_hours_stayed=hours_stayed
+        )
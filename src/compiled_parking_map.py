@@ -0,0 +1,302 @@
+from src.enums import Size, EntryPoint
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+
+import numpy as np
+
+ARTIFACT_MAGIC = b"PLMAP\x00\x00\x01"
+ARTIFACT_SUFFIX = ".plmap"
+ARTIFACT_ALIGNMENT = 64
+SIZES = sorted(Size, key=lambda size: size.value)
+
+
+def validate_parking_map(parking_map: dict, num_of_entrypoints: int):
+    """
+    Validates a parking map
+    :param parking_map: the dictionary that contains the mapping of the parking lot
+    :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+    :return:
+    """
+    if type(parking_map) != dict:
+        raise TypeError("Parking map should be a dictionary.")
+
+    if not parking_map.get("slot_sizes") or not parking_map.get("distances") or not parking_map.get("entrypoints"):
+        raise ValueError("Parking map should contain the following fields: "
+                         "slot_sizes, distances, and entrypoints")
+
+    if any(type(field) != list for field in parking_map.values()):
+        raise ValueError("The values of the parking map should be a list")
+
+    slot_sizes = parking_map["slot_sizes"]
+    distances = parking_map["distances"]
+    entrypoints = sorted(parking_map["entrypoints"], key=lambda x: x.value)
+
+    if any(len(distance) != num_of_entrypoints for distance in distances):
+        raise ValueError("Invalid number of distances for number of entrypoints.")
+
+    if len(slot_sizes) != len(distances):
+        raise ValueError("Number of slot sizes and distances do not match.")
+
+    if len(entrypoints) < num_of_entrypoints:
+        raise ValueError(f"The number of entrypoints can't be less than {num_of_entrypoints}")
+
+    if any(entrypoints[i].value + 1 != entrypoints[i + 1].value for i in range(len(entrypoints) - 1)):
+        raise ValueError(f"The entrypoints must be in order.")
+
+    if entrypoints[-1].value >= num_of_entrypoints:
+        raise ValueError("Invalid number of distances for number of entrypoints.")
+
+
+def _align(num_of_bytes: int):
+    return -(-num_of_bytes // ARTIFACT_ALIGNMENT) * ARTIFACT_ALIGNMENT
+
+
+def _to_arrays(parking_map: dict):
+    """
+    Converts the slot sizes and distances of a parking map to arrays
+    :param parking_map: the dictionary that contains the mapping of the parking lot
+    :return: the int8 array of the Size values of the slots and the entrypoint x slot matrix of the distances
+    """
+    slot_sizes = parking_map["slot_sizes"]
+    sizes = np.fromiter((size.value for size in slot_sizes), dtype=np.int8, count=len(slot_sizes))
+    distances = np.ascontiguousarray(np.asarray(parking_map["distances"]).T)
+
+    return sizes, distances
+
+
+def _content_hash(sizes: np.ndarray, distances: np.ndarray, entrypoints: list):
+    """
+    Computes the hash of the content of a parking map
+    :param sizes: the array of the Size values of the slots
+    :param distances: the entrypoint x slot matrix of the distances
+    :param entrypoints: the list of the entrypoints
+    :return: the hex digest of the hash
+    """
+    content = hashlib.sha256(ARTIFACT_MAGIC)
+    content.update(json.dumps([[entrypoint.value for entrypoint in entrypoints], distances.dtype.str,
+                               list(distances.shape)]).encode())
+    content.update(sizes.tobytes())
+    content.update(distances.tobytes())
+
+    return content.hexdigest()
+
+
+class CompiledParkingMap:
+    """
+    A validated parking map compiled to arrays: the size of every slot, the entrypoint x slot matrix of the
+    distances, and for every entrypoint the slot ids grouped by size and ordered by distance. It can be saved
+    to a file that is memory-mapped when it is loaded again, so loading it doesn't depend on its size.
+    """
+    def __init__(self, entrypoints: list, sizes: np.ndarray, distances: np.ndarray, orderings: np.ndarray,
+                 size_offsets: np.ndarray, content_hash: str):
+        """
+        Constructor for the CompiledParkingMap class
+
+        :param entrypoints: the sorted list of the entrypoints
+        :param sizes: the int8 array of the Size values of the slots
+        :param distances: the entrypoint x slot matrix of the distances
+        :param orderings: the matrix of the slot ids ordered by size, distance and slot id for every entrypoint
+        :param size_offsets: the start of the slots of every size in the orderings, by Size value, and their end
+        :param content_hash: the hash of the content of the parking map
+        """
+        self.entrypoints = entrypoints
+        self.sizes = sizes
+        self.distances = distances
+        self.orderings = orderings
+        self.size_offsets = size_offsets
+        self.hash = content_hash
+        self._rows = {entrypoint: row for row, entrypoint in enumerate(entrypoints)}
+
+    @property
+    def num_of_slots(self):
+        return len(self.sizes)
+
+    @property
+    def num_of_distances(self):
+        return self.distances.shape[0]
+
+    def validate(self, num_of_entrypoints: int):
+        """
+        Validates the compiled parking map for a parking lot
+        :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+        :return:
+        """
+        if self.num_of_distances != num_of_entrypoints:
+            raise ValueError("Invalid number of distances for number of entrypoints.")
+
+        if len(self.entrypoints) < num_of_entrypoints:
+            raise ValueError(f"The number of entrypoints can't be less than {num_of_entrypoints}")
+
+    def slot_distances(self, slot_id: int):
+        """
+        Gets the distances of a slot from the entrypoints
+        :param slot_id: the id of the slot
+        :return: the tuple of the distances of the slot from every entrypoint
+        """
+        return tuple(self.distances[:, slot_id].tolist())
+
+    def ordering(self, entrypoint: EntryPoint, size: Size):
+        """
+        Gets the slots of a size ordered by their distance from an entrypoint
+        :param entrypoint: the entrypoint
+        :param size: the size of the slots
+        :return: the array of the slot ids ordered by distance, then slot id
+        """
+        return self.orderings[self._rows[entrypoint], self.size_offsets[size.value]:self.size_offsets[size.value + 1]]
+
+    @classmethod
+    def compile(cls, parking_map: dict, num_of_entrypoints=3):
+        """
+        Validates and compiles a parking map
+        :param parking_map: the dictionary that contains the mapping of the parking lot
+        :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+        :return: the CompiledParkingMap object
+        """
+        validate_parking_map(parking_map, num_of_entrypoints)
+
+        entrypoints = sorted(parking_map["entrypoints"], key=lambda x: x.value)
+        sizes, distances = _to_arrays(parking_map)
+        slot_ids = np.arange(len(sizes), dtype=np.int32)
+        orderings = np.empty((len(entrypoints), len(sizes)), dtype=np.int32)
+
+        for row, entrypoint in enumerate(entrypoints):
+            # sorted by size first, then by distance, then by slot id
+            orderings[row] = slot_ids[np.lexsort((slot_ids, distances[entrypoint.value], sizes))]
+
+        size_counts = np.bincount(sizes, minlength=SIZES[-1].value + 1)
+        size_offsets = np.concatenate(([0], np.cumsum(size_counts))).astype(np.int64)
+
+        return cls(entrypoints, sizes, distances, orderings, size_offsets,
+                   _content_hash(sizes, distances, entrypoints))
+
+    def save(self, path: str):
+        """
+        Saves the compiled parking map to a file. The file is replaced atomically.
+        :param path: the path of the file
+        :return:
+        """
+        arrays = {"sizes": self.sizes, "distances": self.distances, "orderings": self.orderings,
+                  "size_offsets": self.size_offsets}
+        header = {"hash": self.hash, "entrypoints": [entrypoint.value for entrypoint in self.entrypoints],
+                  "arrays": {}}
+        offset = 0
+
+        for name, array in arrays.items():  # every array starts at an aligned offset of the data
+            header["arrays"][name] = {"offset": offset, "dtype": array.dtype.str, "shape": list(array.shape)}
+            offset += _align(array.nbytes)
+
+        encoded_header = json.dumps(header).encode()
+        data_start = _align(len(ARTIFACT_MAGIC) + 8 + len(encoded_header))
+        directory = os.path.dirname(os.path.abspath(path))
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+        with os.fdopen(file_descriptor, "wb") as file:
+            file.write(ARTIFACT_MAGIC + len(encoded_header).to_bytes(8, "little") + encoded_header)
+
+            for name, array in arrays.items():
+                file.seek(data_start + header["arrays"][name]["offset"])
+                file.write(np.ascontiguousarray(array).tobytes())
+
+            file.truncate(data_start + offset)
+
+        os.chmod(temporary_path, 0o644)  # readable by other users like a file written with open()
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path: str, verify=False):
+        """
+        Loads a compiled parking map from a file. The arrays are memory-mapped from the file, not read.
+        :param path: the path of the file
+        :param verify: whether to check the content of the file against its hash
+        :return: the CompiledParkingMap object
+        """
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if buffer[:len(ARTIFACT_MAGIC)] != ARTIFACT_MAGIC:
+            raise ValueError(f"{path} is not a compiled parking map.")
+
+        header_start = len(ARTIFACT_MAGIC) + 8
+        header_length = int.from_bytes(buffer[len(ARTIFACT_MAGIC):header_start], "little")
+        header = json.loads(buffer[header_start:header_start + header_length])
+        data_start = _align(header_start + header_length)
+        arrays = {}
+
+        for name, array in header["arrays"].items():
+            dtype = np.dtype(array["dtype"])
+            count = int(np.prod(array["shape"]))
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count,
+                                         offset=data_start + array["offset"]).reshape(array["shape"])
+
+        entrypoints = [EntryPoint(value) for value in header["entrypoints"]]
+
+        if verify and _content_hash(arrays["sizes"], arrays["distances"], entrypoints) != header["hash"]:
+            raise ValueError(f"The content of {path} doesn't match its hash.")
+
+        return cls(entrypoints, arrays["sizes"], arrays["distances"], arrays["orderings"], arrays["size_offsets"],
+                   header["hash"])
+
+
+def compile_parking_map(parking_map: dict, num_of_entrypoints=3, cache_dir: str = None):
+    """
+    Compiles a parking map. With a cache directory, the compiled parking map is saved there under its content
+    hash, and a parking map with the same content is loaded from the cache instead of compiled again.
+    :param parking_map: the dictionary that contains the mapping of the parking lot
+    :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+    :param cache_dir: the directory of the compiled parking maps
+    :return: the CompiledParkingMap object
+    """
+    if cache_dir is None:
+        return CompiledParkingMap.compile(parking_map, num_of_entrypoints)
+
+    try:
+        entrypoints = sorted(parking_map["entrypoints"], key=lambda x: x.value)
+        sizes, distances = _to_arrays(parking_map)
+    except Exception:
+        distances = None
+
+    if distances is None or distances.ndim != 2 or distances.dtype.kind not in "iuf":
+        # not a valid parking map, compile it to raise the validation error
+        return CompiledParkingMap.compile(parking_map, num_of_entrypoints)
+
+    path = os.path.join(cache_dir, _content_hash(sizes, distances, entrypoints) + ARTIFACT_SUFFIX)
+
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        CompiledParkingMap.compile(parking_map, num_of_entrypoints).save(path)
+
+    compiled_parking_map = CompiledParkingMap.load(path)
+    compiled_parking_map.validate(num_of_entrypoints)
+
+    return compiled_parking_map
+
+
+def load_parking_map(path: str):
+    """
+    Loads the layout of a parking lot from a file, either a compiled parking map or a JSON object with the
+    "slot_sizes" of the slots by name, e.g. "SMALL", the "distances" of every slot from the entrypoints and the
+    "entrypoints" by name, e.g. "A"
+    :param path: the path of the file
+    :return: the CompiledParkingMap object, or the parking map dictionary of the JSON file
+    """
+    with open(path, "rb") as file:
+        compiled = file.read(len(ARTIFACT_MAGIC)) == ARTIFACT_MAGIC
+
+    if compiled:
+        return CompiledParkingMap.load(path)
+
+    with open(path) as file:
+        layout = json.load(file)
+
+    try:
+        return {
+            "slot_sizes": [Size[str(size).upper()] for size in layout["slot_sizes"]],
+            "distances": [tuple(distances) for distances in layout["distances"]],
+            "entrypoints": [EntryPoint[str(entrypoint).upper()] for entrypoint in layout["entrypoints"]]
+        }
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"{path} is not a valid parking lot layout: {e!r}") from None
@@ -1,12 +1,90 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
 
-engine = create_engine(
-    "sqlite:///parking_lot.db",
-)
+import os
+import threading
+
+DEFAULT_DB_URL = "sqlite:///parking_lot.db"
+
+
+def create_db_engine(url=DEFAULT_DB_URL, journal_mode=None, synchronous=None, cache_size=None, mmap_size=None,
+                     pool_size=None, pool_pre_ping=False, **kwargs):
+    """
+    Creates the engine of the parking lot db. The SQLite settings are applied to every new connection with
+    PRAGMA statements and are ignored for the other backends, and the pool settings are ignored for SQLite.
+    :param url: the url of the db
+    :param journal_mode: the SQLite journal mode, e.g. "WAL"
+    :param synchronous: the SQLite synchronous level, e.g. "NORMAL" or "FULL"
+    :param cache_size: the SQLite page cache size, in pages if positive or in KiB if negative
+    :param mmap_size: the maximum number of bytes of the SQLite db file that are memory-mapped
+    :param pool_size: the number of connections kept in the connection pool
+    :param pool_pre_ping: whether to test the connections of the pool before using them
+    :param kwargs: the other keyword arguments of sqlalchemy.create_engine
+    :return: the Engine object
+    """
+    url = make_url(url)
+
+    if url.get_backend_name() != "sqlite":
+        if pool_size is not None:
+            kwargs["pool_size"] = pool_size
+
+        return create_engine(url, pool_pre_ping=pool_pre_ping, **kwargs)
+
+    engine = create_engine(url, **kwargs)
+    pragmas = {
+        "journal_mode": journal_mode,
+        "synchronous": synchronous,
+        "cache_size": cache_size,
+        "mmap_size": mmap_size
+    }
+    pragmas = {name: value for name, value in pragmas.items() if value is not None}
+
+    if pragmas:
+        @event.listens_for(engine, "connect")
+        def set_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+
+            cursor.close()
+
+    return engine
+
+
+def environment_settings():
+    """
+    Gets the SQLite settings of the PARKING_LOT_DB_JOURNAL_MODE and PARKING_LOT_DB_SYNCHRONOUS environment
+    variables, e.g. WAL and NORMAL to trade the durability of the last commits for faster commits
+    :return: the dictionary of the journal_mode and synchronous arguments of create_db_engine, None for an unset
+    variable, so SQLite keeps its default
+    """
+    return {"journal_mode": os.environ.get("PARKING_LOT_DB_JOURNAL_MODE") or None,
+            "synchronous": os.environ.get("PARKING_LOT_DB_SYNCHRONOUS") or None}
 
-Session = sessionmaker(bind=engine)
-session = Session()
 
 Base = declarative_base()
+
+DEFAULT_ATTRIBUTES = {"engine", "Session", "session"}  # created on first use
+_default_lock = threading.Lock()
+
+
+def __getattr__(name: str):
+    """
+    Creates the default engine of the parking lot db, its session factory and the module-level session the first
+    time one of them is used, so importing the models doesn't open the db
+    :param name: the name of the attribute of the module
+    :return: the Engine, sessionmaker or Session object
+    """
+    if name not in DEFAULT_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    with _default_lock:
+        if "engine" not in globals():
+            engine = create_db_engine(os.environ.get("PARKING_LOT_DB_URL", DEFAULT_DB_URL), **environment_settings())
+            Session = sessionmaker(bind=engine, expire_on_commit=False)
+            globals().update(Session=Session, session=Session(), engine=engine)
+
+    return globals()[name]
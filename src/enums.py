@@ -12,13 +12,14 @@ class Size(Enum):
 
 class EntryPoint(Enum):
     """
-    Enum class for the entrypoints
+    Enum class for the entrypoints. The value of an entrypoint is the index of its distance in the distances of
+    a slot, so the values are consecutive from 0.
     """
     A = 0
     B = 1
     C = 2
-    D = 4
-    E = 5
+    D = 3
+    E = 4
 
 
 class Rates(Enum):
@@ -38,3 +39,11 @@ class Hours(Enum):
     WITHIN_FLAT_RATE = 3
     WITHIN_CONTINUOUS = 1
     IN_A_DAY = 24
+
+
+class Direction(Enum):
+    """
+    Enum class for the directions of the vehicles passing a gate
+    """
+    IN = "in"
+    OUT = "out"
@@ -0,0 +1,273 @@
+from src.parking_lot import AutomatedParkingLot
+from src.parking_slot import ParkingSlot
+from src.vehicles import Vehicle, ParkingVehicle
+from src.enums import Size, EntryPoint, Direction
+from src.exceptions import *
+
+from collections import namedtuple
+from datetime import datetime, timezone, timedelta
+from itertools import islice
+
+import csv
+import heapq
+import json
+import re
+
+GateEvent = namedtuple("GateEvent", ["license_plate", "size", "entrypoint", "timestamp", "direction"])
+EventResult = namedtuple("EventResult", ["event", "result"])  # the result is a ParkingSlot, a fee or an exception
+
+EVENT_FIELDS = GateEvent._fields
+SIZES_BY_NAME = {size.name: size for size in Size}
+ENTRYPOINTS_BY_NAME = {entrypoint.name: entrypoint for entrypoint in EntryPoint}
+DIRECTIONS_BY_VALUE = {direction.value: direction for direction in Direction}
+EPOCH_SECONDS = re.compile(r"[+-]?\d+(\.\d*)?")  # a timestamp string that is a number, not an ISO 8601 date
+
+
+def _parse_timestamp(timestamp):
+    """
+    Parses the timestamp of a gate event
+    :param timestamp: an ISO 8601 string, or the number of seconds since the epoch, also as a string as in CSV
+    :return: the naive datetime of the timestamp, in UTC if the timestamp has a timezone or is a number
+    """
+    if isinstance(timestamp, str) and EPOCH_SECONDS.fullmatch(timestamp.strip()):
+        timestamp = float(timestamp)
+
+    if isinstance(timestamp, (int, float)):
+        return datetime.fromtimestamp(timestamp, timezone.utc).replace(tzinfo=None)
+
+    timestamp = datetime.fromisoformat(timestamp)
+
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+    return timestamp
+
+
+def parse_event(record: dict):
+    """
+    Parses a gate event
+    :param record: the dictionary of the fields of the event: license_plate, size, entrypoint, timestamp and
+    direction. The size and the entrypoint are only needed by the vehicles coming in.
+    :return: the GateEvent object
+    """
+    try:
+        direction = DIRECTIONS_BY_VALUE[str(record["direction"]).lower()]
+        license_plate = record["license_plate"]
+
+        if not license_plate:
+            raise ValueError("missing license plate")
+
+        if direction == Direction.IN:
+            size = SIZES_BY_NAME[str(record["size"]).upper()]
+            entrypoint = ENTRYPOINTS_BY_NAME[str(record["entrypoint"]).upper()]
+        else:
+            size = entrypoint = None
+
+        return GateEvent(license_plate, size, entrypoint, _parse_timestamp(record["timestamp"]), direction)
+    except (KeyError, TypeError, ValueError) as e:
+        raise InvalidGateEvent(f"Invalid gate event {record!r}: {e!r}") from None
+
+
+def read_ndjson_events(lines):
+    """
+    Reads the gate events of newline-delimited JSON lines. The lines are read one at a time, so a file or stdin
+    is streamed.
+    :param lines: the iterable of the lines, e.g. a file object
+    :return: the generator of the GateEvent objects, and of the InvalidGateEvent exceptions of the invalid lines
+    """
+    for line in lines:
+        if not line.strip():
+            continue
+
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield InvalidGateEvent(f"Invalid gate event {line.strip()!r}: {e}")
+            continue
+
+        try:
+            yield parse_event(record)
+        except InvalidGateEvent as e:
+            yield e
+
+
+def read_csv_events(lines):
+    """
+    Reads the gate events of CSV lines with a header row. The lines are read one at a time, so a file or stdin
+    is streamed.
+    :param lines: the iterable of the lines, e.g. a file object opened with newline=""
+    :return: the generator of the GateEvent objects, and of the InvalidGateEvent exceptions of the invalid rows
+    """
+    rows = csv.reader(lines)
+    header = next(rows, None)
+
+    if header is None:
+        return
+
+    header = [field.strip().lower() for field in header]
+
+    for row in rows:
+        if not row:
+            continue
+
+        try:
+            yield parse_event(dict(zip(header, row)))
+        except InvalidGateEvent as e:
+            yield e
+
+
+def read_events(lines, event_format: str = "ndjson"):
+    """
+    Reads the gate events of a file or stdin
+    :param lines: the iterable of the lines, e.g. a file object
+    :param event_format: the format of the events, ndjson or csv
+    :return: the generator of the GateEvent objects and of the InvalidGateEvent exceptions
+    """
+    if event_format == "ndjson":
+        return read_ndjson_events(lines)
+
+    if event_format == "csv":
+        return read_csv_events(lines)
+
+    raise ValueError(f"Unknown event format {event_format!r}, expected ndjson or csv.")
+
+
+def order_events(events, max_delay: timedelta = timedelta(minutes=5), max_buffered=100000):
+    """
+    Puts gate events that arrive a little out of order back in timestamp order. The events are held back until
+    an event newer by max_delay has been read, so the buffer only holds the events of the last max_delay.
+    :param events: the iterable of the GateEvent objects, and of the exceptions that are passed through at once
+    :param max_delay: how late an event can arrive and still be put in order
+    :param max_buffered: the maximum number of events held back, whatever their timestamps
+    :return: the generator of the GateEvent objects in timestamp order, and of the exceptions. An event older
+    than an event that was already yielded is yielded as an InvalidGateEvent exception.
+    """
+    buffered = []  # min-heap of (timestamp, sequence number, event), the sequence keeps the ties in order
+    last_timestamp = None
+
+    for sequence, event in enumerate(events):
+        if isinstance(event, Exception):
+            yield event
+            continue
+
+        if last_timestamp is not None and event.timestamp < last_timestamp:
+            yield InvalidGateEvent(f"The gate event {event!r} arrived more than {max_delay} late.")
+            continue
+
+        heapq.heappush(buffered, (event.timestamp, sequence, event))
+        watermark = event.timestamp - max_delay
+
+        while buffered and (buffered[0][0] <= watermark or len(buffered) > max_buffered):
+            last_timestamp, _, ordered_event = heapq.heappop(buffered)
+            yield ordered_event
+
+    while buffered:
+        yield heapq.heappop(buffered)[2]
+
+
+def _apply_event(parking_lot: AutomatedParkingLot, event: GateEvent):
+    """
+    Parks or unparks the vehicle of a gate event without committing the changes
+    :param parking_lot: the AutomatedParkingLot object
+    :param event: the GateEvent object
+    :return: the assigned ParkingSlot object, or the total parking fee
+    """
+    if event.direction == Direction.IN:
+        return parking_lot._park(ParkingVehicle(event.size, event.license_plate), event.entrypoint,
+                                 event.timestamp)
+
+    return parking_lot._unpark(Vehicle(license_plate=event.license_plate), event.timestamp)
+
+
+def apply_events(parking_lot: AutomatedParkingLot, events, batch_size=1000):
+    """
+    Applies a stream of gate events to a parking lot in order, committing the changes of every batch of events
+    in a single transaction
+    :param parking_lot: the AutomatedParkingLot object
+    :param events: the iterable of the GateEvent objects, and of the exceptions that are passed through
+    :param batch_size: the number of events committed together
+    :return: the generator of the EventResult objects of the events, yielded once their batch is committed.
+    The events that fail, or whose batch fails to commit, have the raised exception as their result.
+    """
+    events = iter(events)
+
+    while True:
+        batch = list(islice(events, batch_size))
+
+        if not batch:
+            return
+
+        results = []
+
+        for event in batch:
+            if isinstance(event, Exception):
+                results.append(EventResult(None, event))
+                continue
+
+            try:
+                results.append(EventResult(event, _apply_event(parking_lot, event)))
+            except (ParkingLotException, ValueError) as e:
+                results.append(EventResult(event, e))
+
+        try:
+            parking_lot._commit()
+        except Exception as e:
+            parking_lot._rollback()
+            results = [EventResult(result.event, e) if not isinstance(result.result, Exception) else result
+                       for result in results]
+
+        yield from results
+
+
+def replay(parking_lot: AutomatedParkingLot, lines, event_format: str = "ndjson", batch_size=1000,
+           max_delay: timedelta = timedelta(minutes=5)):
+    """
+    Reads the gate events of a file or stdin, puts them in timestamp order and applies them to a parking lot
+    :param parking_lot: the AutomatedParkingLot object
+    :param lines: the iterable of the lines, e.g. a file object
+    :param event_format: the format of the events, ndjson or csv
+    :param batch_size: the number of events committed together
+    :param max_delay: how late an event can arrive and still be put in order
+    :return: the generator of the EventResult objects of the events
+    """
+    return apply_events(parking_lot, order_events(read_events(lines, event_format), max_delay), batch_size)
+
+
+def format_result(event_result: EventResult):
+    """
+    Formats the result of a gate event as a JSON line
+    :param event_result: the EventResult object
+    :return: the JSON string of the event and of its slot, fee or error
+    """
+    event, result = event_result
+    record = {}
+
+    if event is not None:
+        record = {"license_plate": event.license_plate, "timestamp": event.timestamp.isoformat(),
+                  "direction": event.direction.value}
+
+    if isinstance(result, Exception):
+        record["error"] = type(result).__name__
+        record["message"] = str(result)
+    elif isinstance(result, ParkingSlot):
+        record["slot_id"] = result.slot_id
+    else:
+        record["fee"] = result
+
+    return json.dumps(record)
+
+
+def write_results(results, output):
+    """
+    Writes the results of gate events as newline-delimited JSON
+    :param results: the iterable of the EventResult objects
+    :param output: the file object to write to, e.g. stdout
+    :return: the number of events that failed
+    """
+    num_of_errors = 0
+
+    for event_result in results:
+        num_of_errors += isinstance(event_result.result, Exception)
+        output.write(format_result(event_result) + "\n")
+
+    return num_of_errors
@@ -1,28 +1,38 @@
-class NoMoreAvailableSpot(Exception):
+class ParkingLotException(Exception):
+    """Base class for the exceptions raised by the parking lot"""
+    pass
+
+
+class NoMoreAvailableSpot(ParkingLotException):
     """Raised when there are no more available spots in the parking lot"""
     pass
 
 
-class VehicleNotParked(Exception):
+class VehicleNotParked(ParkingLotException):
     """Raised when unparking a vehicle that is not parked"""
     pass
 
 
-class InvalidEntryPoint(Exception):
+class InvalidEntryPoint(ParkingLotException):
     """Raised when a vehicle enters in an invalid entrypoint"""
     pass
 
 
-class VehicleAlreadyParked(Exception):
+class VehicleAlreadyParked(ParkingLotException):
     """Raised when parking a vehicle that is already parked"""
     pass
 
 
-class FeeCannotBeCalculated(Exception):
+class FeeCannotBeCalculated(ParkingLotException):
     """Raised when a fee cannot be calculated"""
     pass
 
 
-class VehicleIsNotAParkingVehicleObject(Exception):
+class VehicleIsNotAParkingVehicleObject(ParkingLotException):
     """Raised when a vehicle is not an instance of ParkingVehicleObject"""
-    pass
\ No newline at end of file
+    pass
+
+
+class InvalidGateEvent(ParkingLotException):
+    """Raised when a gate event can't be read or arrives too late to be applied in order"""
+    pass
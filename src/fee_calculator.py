@@ -1,9 +1,18 @@
 from abc import ABC, abstractmethod
-from src.vehicles import ParkingVehicle
-from src.enums import Rates, Hours
+from src.enums import Size, Rates, Hours
 from src.exceptions import FeeCannotBeCalculated
 
+from collections import namedtuple
+from datetime import datetime
 from math import ceil, floor
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:  # the models import SQLAlchemy, the fees only read the attributes of the vehicles
+    from src.vehicles import ParkingVehicle
+
+# everything the fee of a parked vehicle depends on besides its date of exit
+TariffSchedule = namedtuple("TariffSchedule", ["date_of_first_entry", "hour_paid", "charge_flat_rate", "flat_rate",
+                                               "hourly_rate", "day_over_rate"])
 
 
 class FeeCalculator(ABC):
@@ -13,51 +22,101 @@ class FeeCalculator(ABC):
 
 
 class ParkingFeeCalculator(FeeCalculator):
-    def __init__(self, flat_rate=40):
+    def __init__(self, flat_rate=40, hourly_rates: dict = None, day_over_rate=Rates.DAY_OVER.value):
+        """
+        Constructor for the ParkingFeeCalculator class
+
+        :param flat_rate: the flat rate for the first hours
+        :param hourly_rates: a dictionary of the hourly rate for each slot Size, defaults to the Rates enum
+        :param day_over_rate: the rate for every full day
+        """
+        if hourly_rates is None:
+            hourly_rates = {size: Rates[size.name].value for size in Size}
+
         self._flat_rate = flat_rate
+        self._hourly_rates = hourly_rates
+        self._day_over_rate = day_over_rate
 
-    def calculate_fee(self, vehicle: ParkingVehicle):
+    def tariff_schedule(self, vehicle: "ParkingVehicle"):
         """
-        A function that calculates the total parking fee of the vehicle object
-        :param vehicle: the Vehicle object
-        :return: the total parking fee of the vehicle object
+        Gets the tariff schedule of a parked vehicle, everything its fee depends on besides the date of exit
+        :param vehicle: the parked ParkingVehicle object
+        :return: the TariffSchedule object of the vehicle
         """
-        total_fee = 0
+        return TariffSchedule(vehicle.date_of_first_entry, vehicle.hour_paid, vehicle.charge_flat_rate,
+                              self._flat_rate, self._hourly_rates[vehicle.slot.size], self._day_over_rate)
 
-        if vehicle.date_of_entry is None or vehicle.date_of_exit is None:
-            raise FeeCannotBeCalculated("Parking fee cannot be calculated. The vehicle must contain a date of entry "
-                                        "and a date of exit.")
+    @staticmethod
+    def billed_hours(schedule: TariffSchedule, date_of_exit: datetime):
+        """
+        Gets the billed hours of a stay, the fee of a vehicle only changes when they change
+        :param schedule: the TariffSchedule object of the vehicle
+        :param date_of_exit: the date the vehicle leaves
+        :return: the tuple of the number of full days and of the started hours of the last day
+        """
+        time_diff_from_first_entry = date_of_exit - schedule.date_of_first_entry
+
+        return time_diff_from_first_entry.days, ceil(time_diff_from_first_entry.seconds/3600)
 
-        time_diff_from_first_entry = vehicle.date_of_exit - vehicle.date_of_first_entry
+    @staticmethod
+    def settle(schedule: TariffSchedule, date_of_exit: datetime):
+        """
+        Calculates the fee of a vehicle from its tariff schedule without changing the vehicle
+        :param schedule: the TariffSchedule object of the vehicle
+        :param date_of_exit: the date the vehicle leaves
+        :return: the tuple of the total fee, the hours stayed, and the hour paid and charge flat rate the vehicle
+        has after paying the fee
+        """
+        total_fee = 0
+        hour_paid = schedule.hour_paid
+        charge_flat_rate = schedule.charge_flat_rate
+
+        time_diff_from_first_entry = date_of_exit - schedule.date_of_first_entry
         exceeding_days = time_diff_from_first_entry.days
         hours_stayed = exceeding_days * 24 + time_diff_from_first_entry.seconds/3600
         total_hours = exceeding_days * 24 + ceil(time_diff_from_first_entry.seconds/3600)  # round up the total hours parked
 
-        vehicle.total_hours_stayed = hours_stayed
-
-        if hours_stayed <= vehicle.hour_paid:
-            return 0
+        if hours_stayed <= hour_paid:
+            return 0, hours_stayed, hour_paid, charge_flat_rate
 
         # check if the vehicle stayed in the parking lot for more than a day and do the calculation
         if exceeding_days > 0:
             exceeding_hours = total_hours % Hours.IN_A_DAY.value  # get remainder of total_hours/hours_in_a_day(24)
-            vehicle.charge_flat_rate = False  # a vehicle that stayed for more than a day will not have a flat rate
-            total_days_paid = floor(vehicle.hour_paid/24)
+            charge_flat_rate = False  # a vehicle that stayed for more than a day will not have a flat rate
+            total_days_paid = floor(hour_paid/24)
             unpaid_days = exceeding_days - total_days_paid
-            total_fee = (Rates.DAY_OVER.value * unpaid_days)
-            vehicle.hour_paid = unpaid_days * 24
+            total_fee = (schedule.day_over_rate * unpaid_days)
+            hour_paid = unpaid_days * 24
         else:
             exceeding_hours = total_hours
 
-            if vehicle.charge_flat_rate:
-                total_fee += self._flat_rate
-                vehicle.hour_paid = Hours.WITHIN_FLAT_RATE.value
+            if charge_flat_rate:
+                total_fee += schedule.flat_rate
+                hour_paid = Hours.WITHIN_FLAT_RATE.value
 
-            exceeding_hours -= vehicle.hour_paid
+            exceeding_hours -= hour_paid
 
         if exceeding_hours >= 0:  # calculation if vehicle has exceeded hours
-            total_fee += (
-                    Rates[vehicle.slot.size.name].value * exceeding_hours)
-            vehicle.hour_paid += exceeding_hours
+            total_fee += schedule.hourly_rate * exceeding_hours
+            hour_paid += exceeding_hours
+
+        return total_fee, hours_stayed, hour_paid, charge_flat_rate
+
+    def calculate_fee(self, vehicle: "ParkingVehicle"):
+        """
+        A function that calculates the total parking fee of the vehicle object
+        :param vehicle: the Vehicle object
+        :return: the total parking fee of the vehicle object
+        """
+        if vehicle.date_of_entry is None or vehicle.date_of_exit is None:
+            raise FeeCannotBeCalculated("Parking fee cannot be calculated. The vehicle must contain a date of entry "
+                                        "and a date of exit.")
+
+        total_fee, hours_stayed, hour_paid, charge_flat_rate = self.settle(self.tariff_schedule(vehicle),
+                                                                          vehicle.date_of_exit)
+
+        vehicle.total_hours_stayed = hours_stayed
+        vehicle.hour_paid = hour_paid
+        vehicle.charge_flat_rate = charge_flat_rate
 
         return total_fee
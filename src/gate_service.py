@@ -0,0 +1,392 @@
+from src.parking_lot import AutomatedParkingLot
+from src.event_stream import EventResult, parse_event, apply_events, format_result, _parse_timestamp, \
+    SIZES_BY_NAME, ENTRYPOINTS_BY_NAME
+from src.enums import Size, Direction
+from src.exceptions import *
+
+from datetime import datetime
+from http import HTTPStatus
+from urllib.parse import urlsplit, parse_qsl
+
+import asyncio
+import json
+import logging
+
+ERROR_STATUSES = {
+    InvalidGateEvent: HTTPStatus.BAD_REQUEST,
+    InvalidEntryPoint: HTTPStatus.BAD_REQUEST,
+    VehicleNotParked: HTTPStatus.NOT_FOUND,
+    VehicleAlreadyParked: HTTPStatus.CONFLICT,
+    NoMoreAvailableSpot: HTTPStatus.CONFLICT
+}
+
+DIRECTIONS_BY_PATH = {"/park": Direction.IN, "/unpark": Direction.OUT}
+
+logger = logging.getLogger(__name__)
+
+
+class HTTPError(Exception):
+    """Raised by the request handlers to answer with an error status"""
+    def __init__(self, status: HTTPStatus, message: str = None, headers: dict = None, body: str = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.headers = headers or {}
+        self.body = body or json.dumps({"error": status.phrase, "message": str(self)})
+
+
+def error_status(error: Exception):
+    """
+    Maps the exception of a request to its HTTP status
+    :param error: the raised exception
+    :return: the HTTPStatus of the response
+    """
+    for error_class in type(error).__mro__:
+        if error_class in ERROR_STATUSES:
+            return ERROR_STATUSES[error_class]
+
+    if isinstance(error, (ParkingLotException, ValueError)):
+        return HTTPStatus.BAD_REQUEST
+
+    return HTTPStatus.INTERNAL_SERVER_ERROR  # e.g. the commit of the batch failed
+
+
+class GateService:
+    """
+    A local HTTP/JSON service of the gates of an AutomatedParkingLot, served by asyncio:
+
+        POST /park          {"license_plate", "size", "entrypoint", "timestamp"}  ->  {"slot_id", ...}
+        POST /unpark        {"license_plate", "timestamp"}                        ->  {"fee", ...}
+        GET  /quote         ?license_plate=&timestamp=                            ->  {"fee", ...}
+        GET  /availability  ?size=&zone=                                          ->  {"SMALL": {...}, ...}
+
+    The timestamps default to now. The park and unpark requests are put in a bounded queue, and a single writer
+    task waits a short coalescing window after the first request, unless it comes from the only open connection,
+    then applies all the queued requests in one pass over the slots and commits them in one transaction, like the
+    batches of a gate event stream. A request that finds the queue full is answered 503 right away, so a burst
+    can't grow the queue without bound. The connections are kept alive between requests.
+    """
+    def __init__(self, parking_lot: AutomatedParkingLot, host="127.0.0.1", port=8080, coalesce_window=0.002,
+                 max_batch_size=512, max_pending=4096, keep_alive_timeout=5.0, max_body_size=65536):
+        """
+        Constructor for the GateService class
+
+        :param parking_lot: the AutomatedParkingLot object that assigns the slots
+        :param host: the host the service listens on
+        :param port: the port the service listens on, 0 for any free port
+        :param coalesce_window: the number of seconds the writer waits for more requests after the first one
+        :param max_batch_size: the maximum number of requests committed together
+        :param max_pending: the maximum number of park and unpark requests waiting for the writer
+        :param keep_alive_timeout: the number of seconds an idle connection is kept open
+        :param max_body_size: the maximum size of the body of a request, in bytes
+        """
+        self._parking_lot = parking_lot
+        self._host = host
+        self._port = port
+        self._coalesce_window = coalesce_window
+        self._max_batch_size = max_batch_size
+        self._max_pending = max_pending
+        self._keep_alive_timeout = keep_alive_timeout
+        self._max_body_size = max_body_size
+        self._pending_requests = None
+        self._writer = None
+        self._server = None
+        self._connections = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.stop()
+
+    @property
+    def parking_lot(self):
+        return self._parking_lot
+
+    @property
+    def port(self):
+        """
+        The port the service listens on, e.g. the free port it got for port 0
+        """
+        return self._server.sockets[0].getsockname()[1] if self._server is not None else self._port
+
+    async def start(self):
+        """
+        Starts the writer task and listens for connections
+        :return:
+        """
+        if self._server is not None:
+            return
+
+        self._pending_requests = asyncio.Queue(self._max_pending)
+        self._writer = asyncio.create_task(self._write())
+        self._server = await asyncio.start_server(self._serve_connection, self._host, self._port)
+
+    async def stop(self):
+        """
+        Stops listening, answers the queued requests and closes the connections
+        :return:
+        """
+        if self._server is None:
+            return
+
+        self._server.close()
+        await self._pending_requests.put(None)  # waits for room in the queue, the queued requests go first
+        await self._writer
+
+        for connection in list(self._connections):
+            connection.close()
+
+        await self._server.wait_closed()
+        self._server = self._writer = None
+
+    async def serve_forever(self):
+        """
+        Starts the service and serves until it is cancelled
+        :return:
+        """
+        await self.start()
+
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+    async def _write(self):
+        """
+        The writer task. It waits for a request, lets more requests queue up for the coalescing window, then
+        applies them together and commits them in one transaction.
+        :return:
+        """
+        stopped = False
+
+        while not stopped:
+            batch = [await self._pending_requests.get()]
+
+            # a single client waits for its response, so only the other connections can add to the batch
+            if self._coalesce_window > 0 and batch[0] is not None and len(self._connections) > 1:
+                await asyncio.sleep(self._coalesce_window)
+
+            while not self._pending_requests.empty() and len(batch) < self._max_batch_size:
+                batch.append(self._pending_requests.get_nowait())
+
+            if None in batch:  # stop() was called, answer what is left and exit
+                stopped = True
+                batch = [request for request in batch if request is not None]
+
+            if not batch:
+                continue
+
+            try:
+                results = list(apply_events(self._parking_lot, [event for event, _ in batch], len(batch)))
+            except Exception as e:  # the batch failed before its commit, the requests get the error
+                self._parking_lot._rollback()
+                results = [EventResult(event, e) for event, _ in batch]
+
+            for (_, waiter), event_result in zip(batch, results):
+                if not waiter.done():  # the client may have gone away
+                    waiter.set_result(event_result)
+
+    async def _queue_event(self, event):
+        """
+        Queues a park or unpark request for the writer
+        :param event: the GateEvent object of the request
+        :return: the EventResult object of the request, once its batch is committed
+        """
+        waiter = asyncio.get_running_loop().create_future()
+
+        try:
+            self._pending_requests.put_nowait((event, waiter))
+        except asyncio.QueueFull:
+            raise HTTPError(HTTPStatus.SERVICE_UNAVAILABLE, "Too many pending requests", {"Retry-After": "1"}) \
+                from None
+
+        return await waiter
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """
+        Reads an HTTP/1.x request
+        :param reader: the StreamReader of the connection
+        :return: the (method, target, headers, body, keep alive) tuple, or None if the connection was closed
+        """
+        request_line = await asyncio.wait_for(self._read_line(reader), self._keep_alive_timeout)
+
+        if not request_line.strip():
+            return None
+
+        try:
+            method, target, version = request_line.decode("latin-1").split()
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid request line") from None
+
+        headers = {}
+
+        while True:
+            line = await self._read_line(reader)
+
+            if line in (b"\r\n", b"\n", b""):
+                break
+
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+        if "transfer-encoding" in headers:
+            raise HTTPError(HTTPStatus.LENGTH_REQUIRED, "Chunked bodies are not supported")
+
+        try:
+            content_length = int(headers.get("content-length", 0))
+        except ValueError:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length") from None
+
+        if content_length < 0:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+
+        if content_length > self._max_body_size:
+            raise HTTPError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+
+        body = await reader.readexactly(content_length) if content_length else b""
+
+        return method.upper(), target, headers, body, keep_alive
+
+    @staticmethod
+    async def _read_line(reader: asyncio.StreamReader):
+        """
+        Reads a line of the request line or headers of a request
+        :param reader: the StreamReader of the connection
+        :return: the bytes of the line, empty if the connection was closed
+        """
+        try:
+            return await reader.readline()
+        except (ValueError, asyncio.LimitOverrunError):  # longer than the limit of the reader
+            raise HTTPError(HTTPStatus.BAD_REQUEST, "Line too long") from None
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: HTTPStatus, body: str, keep_alive: bool,
+                        headers: dict = None):
+        payload = body.encode()
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}", "Content-Type: application/json",
+                 f"Content-Length: {len(payload)}", f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+
+    async def _serve_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Serves the requests of a connection one after the other until the client or the service closes it
+        :param reader: the StreamReader of the connection
+        :param writer: the StreamWriter of the connection
+        :return:
+        """
+        self._connections.add(writer)
+
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader)
+                except HTTPError as e:
+                    self._write_response(writer, e.status, e.body, False, e.headers)
+                    break
+
+                if request is None:
+                    break
+
+                method, target, headers, body, keep_alive = request
+
+                try:
+                    response = await self._handle(method, target, body)
+                except HTTPError as e:
+                    self._write_response(writer, e.status, e.body, keep_alive, e.headers)
+                except Exception as e:  # a bug or a failure of the parking lot, the client still gets an answer
+                    logger.error("The request %s %s failed", method, target, exc_info=e)
+                    error = HTTPError(HTTPStatus.INTERNAL_SERVER_ERROR)
+                    self._write_response(writer, error.status, error.body, keep_alive)
+                else:
+                    self._write_response(writer, HTTPStatus.OK, response, keep_alive)
+
+                await writer.drain()
+
+                if not keep_alive or self._server is None:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass  # the connection was idle for too long, or the client went away
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _handle(self, method: str, target: str, body: bytes):
+        """
+        Handles a request
+        :param method: the method of the request
+        :param target: the path and query of the request
+        :param body: the body of the request
+        :return: the JSON string of the response
+        """
+        url = urlsplit(target)
+        query = dict(parse_qsl(url.query))
+
+        if url.path in DIRECTIONS_BY_PATH:
+            if method != "POST":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+            return await self._handle_gate_event(DIRECTIONS_BY_PATH[url.path], body)
+
+        if url.path in ("/quote", "/availability"):
+            if method != "GET":
+                raise HTTPError(HTTPStatus.METHOD_NOT_ALLOWED)
+
+            try:
+                return self._quote(query) if url.path == "/quote" else self._availability(query)
+            except KeyError as e:
+                raise HTTPError(HTTPStatus.BAD_REQUEST, f"Missing or invalid parameter {e}") from None
+            except (ParkingLotException, ValueError) as e:
+                raise HTTPError(error_status(e), body=json.dumps({"error": type(e).__name__, "message": str(e)})) \
+                    from None
+
+        raise HTTPError(HTTPStatus.NOT_FOUND)
+
+    async def _handle_gate_event(self, direction: Direction, body: bytes):
+        """
+        Parks or unparks the vehicle of a request
+        :param direction: Direction.IN for park, Direction.OUT for unpark
+        :param body: the JSON body of the request
+        :return: the JSON string of the slot or fee of the vehicle
+        """
+        try:
+            record = json.loads(body or b"{}")
+            event = parse_event({"timestamp": datetime.now().isoformat(), **record, "direction": direction.value})
+        except (ValueError, TypeError, InvalidGateEvent) as e:
+            raise HTTPError(HTTPStatus.BAD_REQUEST, f"Invalid request: {e}") from None
+
+        event_result = await self._queue_event(event)
+
+        if isinstance(event_result.result, Exception):
+            raise HTTPError(error_status(event_result.result), body=format_result(event_result))
+
+        return format_result(event_result)
+
+    def _quote(self, query: dict):
+        """
+        Quotes the fee of a parked vehicle
+        :param query: the license_plate of the vehicle, and the timestamp it would leave at, defaults to now
+        :return: the JSON string of the fee
+        """
+        at_time = _parse_timestamp(query["timestamp"]) if "timestamp" in query else datetime.now()
+        fee = self._parking_lot.quote_fee(query["license_plate"], at_time)
+
+        return json.dumps({"license_plate": query["license_plate"], "timestamp": at_time.isoformat(), "fee": fee})
+
+    def _availability(self, query: dict):
+        """
+        Counts the slots, occupied slots and available slots of every size
+        :param query: the size of the vehicle and the zone, both optional
+        :return: the JSON string of the counters of every size
+        """
+        zone = ENTRYPOINTS_BY_NAME[query["zone"].upper()] if "zone" in query else None
+        sizes = [SIZES_BY_NAME[query["size"].upper()]] if "size" in query else list(Size)
+        occupancy = self._parking_lot.occupancy(zone)
+
+        return json.dumps({size.name: {"slots": occupancy[size][0], "occupied": occupancy[size][1],
+                                       "available": self._parking_lot.available_slots(size, zone)}
+                           for size in sizes})
@@ -0,0 +1,427 @@
+from src.fee_calculator import FeeCalculator
+
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+
+import math
+import os
+import tempfile
+import threading
+import time
+
+OPERATION_SECONDS = "parking_lot_operation_seconds"
+OPERATIONS_TOTAL = "parking_lot_operations_total"
+QUERIES_PER_OPERATION = "parking_lot_queries_per_operation"
+QUERIES_PER_COMMIT = "parking_lot_queries_per_commit"
+PHASE_SECONDS = "parking_lot_phase_seconds"
+OCCUPIED_SLOTS = "parking_lot_occupied_slots"
+SLOTS = "parking_lot_slots"
+
+DEFAULT_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100)
+
+_NULL_CONTEXT = nullcontext()
+
+
+class MetricsSink(ABC):
+    """
+    Abstract class of the destination of the metrics recorded by an Instrumentation
+    """
+    @abstractmethod
+    def observe(self, name: str, labels: tuple, value: float):
+        raise NotImplementedError("You need to implement this method.")
+
+    @abstractmethod
+    def increment(self, name: str, labels: tuple, value: float):
+        raise NotImplementedError("You need to implement this method.")
+
+    @abstractmethod
+    def set_gauge(self, name: str, labels: tuple, value: float):
+        raise NotImplementedError("You need to implement this method.")
+
+
+class Histogram:
+    """
+    A histogram of observed values with fixed bucket upper bounds
+    """
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Constructor for the Histogram class
+
+        :param buckets: the sorted upper bounds of the buckets, the last bucket has no upper bound
+        """
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+    def quantile(self, q: float):
+        """
+        Estimates a quantile of the observed values
+        :param q: the quantile, from 0 to 1
+        :return: the upper bound of the bucket the quantile falls in, or None if nothing was observed
+        """
+        if not self.count:
+            return None
+
+        rank = math.ceil(q * self.count)
+        cumulative = 0
+
+        for i, bucket_count in enumerate(self.bucket_counts):
+            cumulative += bucket_count
+
+            if cumulative >= rank:
+                return self.buckets[i] if i < len(self.buckets) else math.inf
+
+        return math.inf
+
+
+class InMemorySink(MetricsSink):
+    """
+    A sink that keeps the metrics in memory, as histograms, counters and gauges keyed by name and labels
+    """
+    def __init__(self, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Constructor for the InMemorySink class
+
+        :param buckets: the bucket upper bounds of the histograms
+        """
+        self._buckets = buckets
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+        self.gauges = {}
+
+    def observe(self, name: str, labels: tuple, value: float):
+        with self._lock:
+            histogram = self.histograms.get((name, labels))
+
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = Histogram(self._buckets)
+
+            histogram.observe(value)
+
+    def increment(self, name: str, labels: tuple, value: float):
+        with self._lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def set_gauge(self, name: str, labels: tuple, value: float):
+        with self._lock:
+            self.gauges[(name, labels)] = value
+
+    def histogram(self, name: str, **labels):
+        """
+        Gets a histogram of the sink
+        :param name: the name of the metric
+        :param labels: the labels of the metric
+        :return: the Histogram object, or None if nothing was observed
+        """
+        return self.histograms.get((name, tuple(sorted(labels.items()))))
+
+    def counter(self, name: str, **labels):
+        return self.counters.get((name, tuple(sorted(labels.items()))), 0)
+
+    def gauge(self, name: str, **labels):
+        return self.gauges.get((name, tuple(sorted(labels.items()))))
+
+
+class PrometheusTextFileSink(InMemorySink):
+    """
+    An InMemorySink that can write its metrics to a file in the Prometheus text format, e.g. for the textfile
+    collector of the node exporter
+    """
+    def __init__(self, path: str, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Constructor for the PrometheusTextFileSink class
+
+        :param path: the path of the file the metrics are written to
+        :param buckets: the bucket upper bounds of the histograms
+        """
+        super().__init__(buckets)
+        self._path = path
+
+    @staticmethod
+    def _format_labels(labels: tuple, *extra_labels):
+        labels = labels + extra_labels
+
+        if not labels:
+            return ""
+
+        return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+    def render(self):
+        """
+        Renders the metrics in the Prometheus text format
+        :return: the text of the metrics
+        """
+        lines = []
+
+        with self._lock:
+            for metric_type, metrics in (("counter", self.counters), ("gauge", self.gauges)):
+                for name in sorted({name for name, _ in metrics}):
+                    lines.append(f"# TYPE {name} {metric_type}")
+                    lines.extend(f"{name}{self._format_labels(labels)} {value}"
+                                 for (metric_name, labels), value in sorted(metrics.items()) if metric_name == name)
+
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+
+                for (metric_name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+                    if metric_name != name:
+                        continue
+
+                    cumulative = 0
+
+                    for bound, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.bucket_counts):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{self._format_labels(labels, ('le', bound))} {cumulative}")
+
+                    lines.append(f"{name}_sum{self._format_labels(labels)} {histogram.sum}")
+                    lines.append(f"{name}_count{self._format_labels(labels)} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def write(self):
+        """
+        Writes the metrics to the file. The file is replaced atomically so a reader never sees a partial file.
+        :return:
+        """
+        directory = os.path.dirname(os.path.abspath(self._path))
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+
+        with os.fdopen(file_descriptor, "w") as file:
+            file.write(self.render())
+
+        os.chmod(temporary_path, 0o644)  # readable by other users like a file written with open()
+        os.replace(temporary_path, self._path)
+
+
+class CallbackSink(MetricsSink):
+    """
+    A sink that passes every metric to a callback, called as callback(kind, name, labels, value) where kind is
+    "observe", "increment" or "set_gauge" and labels is a dictionary
+    """
+    def __init__(self, callback):
+        self._callback = callback
+
+    def observe(self, name: str, labels: tuple, value: float):
+        self._callback("observe", name, dict(labels), value)
+
+    def increment(self, name: str, labels: tuple, value: float):
+        self._callback("increment", name, dict(labels), value)
+
+    def set_gauge(self, name: str, labels: tuple, value: float):
+        self._callback("set_gauge", name, dict(labels), value)
+
+
+class Instrumentation:
+    """
+    Records the timings and counters of a parking lot to one or more MetricsSink objects
+    """
+    enabled = True
+
+    def __init__(self, *sinks: MetricsSink):
+        """
+        Constructor for the Instrumentation class
+
+        :param sinks: the MetricsSink objects the metrics are recorded to
+        """
+        self._sinks = list(sinks)
+        self._queries = threading.local()
+        self._gauges = {}
+        self._gauges_lock = threading.Lock()
+        self._instrumented_binds = set()
+
+    def observe(self, name: str, value: float, **labels):
+        labels = tuple(sorted(labels.items()))
+
+        for sink in self._sinks:
+            sink.observe(name, labels, value)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        labels = tuple(sorted(labels.items()))
+
+        for sink in self._sinks:
+            sink.increment(name, labels, value)
+
+    def set_gauge(self, name: str, value: float, **labels):
+        labels = tuple(sorted(labels.items()))
+
+        with self._gauges_lock:
+            self._gauges[(name, labels)] = value
+
+        for sink in self._sinks:
+            sink.set_gauge(name, labels, value)
+
+    def add_to_gauge(self, name: str, value: float, **labels):
+        """
+        Adds a value to a gauge, which is safe to do from many threads
+        :param name: the name of the gauge
+        :param value: the value added to the gauge
+        :param labels: the labels of the gauge
+        :return:
+        """
+        labels = tuple(sorted(labels.items()))
+
+        with self._gauges_lock:
+            total = self._gauges[(name, labels)] = self._gauges.get((name, labels), 0) + value
+
+        for sink in self._sinks:
+            sink.set_gauge(name, labels, total)
+
+    @contextmanager
+    def _timer(self, name: str, labels: dict):
+        start = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timer(self, name: str, **labels):
+        """
+        Times the block of a with statement
+        :param name: the name of the histogram of the timings
+        :param labels: the labels of the histogram
+        :return: the context manager
+        """
+        return self._timer(name, labels)
+
+    def phase(self, phase: str):
+        """
+        Times a phase of an operation, e.g. the slot search or the commit
+        :param phase: the name of the phase
+        :return: the context manager
+        """
+        return self._timer(PHASE_SECONDS, {"phase": phase})
+
+    @property
+    def queries(self):
+        """
+        The number of db queries executed by the current thread so far
+        """
+        return getattr(self._queries, "count", 0)
+
+    def _count_query(self, *args):
+        self._queries.count = self.queries + 1
+
+    def instrument_bind(self, bind):
+        """
+        Counts the db queries executed on an engine or connection
+        :param bind: the Engine or Connection object
+        :return:
+        """
+        from sqlalchemy import event  # only the parking lots with a db have a bind to instrument
+
+        if bind in self._instrumented_binds:
+            return
+
+        event.listen(bind, "before_cursor_execute", self._count_query)
+        self._instrumented_binds.add(bind)
+
+    @contextmanager
+    def operation(self, operation: str):
+        """
+        Records the latency, the number of db queries and the outcome of an operation. The outcome is "ok" or
+        the name of the exception the operation raised, e.g. "NoMoreAvailableSpot".
+        :param operation: the name of the operation
+        :return: the context manager
+        """
+        queries = self.queries
+        start = time.perf_counter()
+        outcome = "ok"
+
+        try:
+            yield
+        except Exception as e:
+            outcome = type(e).__name__
+            raise
+        finally:
+            self.observe(OPERATION_SECONDS, time.perf_counter() - start, operation=operation)
+            self.observe(QUERIES_PER_OPERATION, self.queries - queries, operation=operation)
+            self.increment(OPERATIONS_TOTAL, operation=operation, outcome=outcome)
+
+
+class NullInstrumentation(Instrumentation):
+    """
+    The Instrumentation of a parking lot that is not instrumented. It records nothing and its context managers
+    do nothing.
+    """
+    enabled = False
+
+    def observe(self, name: str, value: float, **labels):
+        pass
+
+    def increment(self, name: str, value: float = 1, **labels):
+        pass
+
+    def set_gauge(self, name: str, value: float, **labels):
+        pass
+
+    def add_to_gauge(self, name: str, value: float, **labels):
+        pass
+
+    def timer(self, name: str, **labels):
+        return _NULL_CONTEXT
+
+    def phase(self, phase: str):
+        return _NULL_CONTEXT
+
+    def instrument_bind(self, bind):
+        pass
+
+    def operation(self, operation: str):
+        return _NULL_CONTEXT
+
+
+class InstrumentedFeeCalculator(FeeCalculator):
+    """
+    A FeeCalculator that times the fee calculations of another FeeCalculator
+    """
+    def __init__(self, fee_calculator: FeeCalculator, instrumentation: Instrumentation):
+        """
+        Constructor for the InstrumentedFeeCalculator class
+
+        :param fee_calculator: the FeeCalculator object that calculates the fees
+        :param instrumentation: the Instrumentation object the timings are recorded to
+        """
+        self._fee_calculator = fee_calculator
+        self._instrumentation = instrumentation
+
+    def __getattr__(self, name):
+        return getattr(self._fee_calculator, name)
+
+    def calculate_fee(self, obj: object):
+        with self._instrumentation.phase("fee"):
+            return self._fee_calculator.calculate_fee(obj)
+
+
+def instrumented(operation: str):
+    """
+    Decorates a method of a parking lot so its calls are recorded as an operation of its instrumentation
+    :param operation: the name of the operation
+    :return: the decorator
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not self._instrumentation.enabled:
+                return method(self, *args, **kwargs)
+
+            with self._instrumentation.operation(operation):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
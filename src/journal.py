@@ -0,0 +1,480 @@
+from src.vehicles import Vehicle
+from src.parking_slot import ParkingSlot
+from src.visits import Visit, VisitStatistics
+from src.enums import Size
+
+from sqlalchemy import insert, update, delete
+from sqlalchemy.orm import sessionmaker
+from collections import namedtuple
+from datetime import datetime
+from enum import Enum
+
+import csv
+import logging
+import os
+import queue
+import threading
+import time
+
+SNAPSHOT = "snapshot"
+WAL = "wal"
+
+logger = logging.getLogger(__name__)
+
+ParkRecord = namedtuple("ParkRecord", ["license_plate", "size", "slot_id", "slot_size", "date_of_entry",
+                                       "date_of_first_entry", "charge_flat_rate", "hour_paid", "total_hours_stayed"])
+UnparkRecord = namedtuple("UnparkRecord", ["license_plate", "slot_id", "slot_size", "date_of_entry", "date_of_exit",
+                                           "fee", "charge_flat_rate", "hour_paid", "total_hours_stayed"])
+VehicleState = namedtuple("VehicleState", ["license_plate", "size", "slot_id", "date_of_first_entry",
+                                           "date_of_entry", "date_of_exit", "charge_flat_rate", "hour_paid",
+                                           "total_hours_stayed"])
+
+RECORD_TAGS = {ParkRecord: "P", UnparkRecord: "U"}
+RECORD_TYPES = {tag: record_type for record_type, tag in RECORD_TAGS.items()}
+
+
+def _optional(parse):
+    return lambda value: parse(value) if value else None
+
+
+FIELD_PARSERS = {
+    "license_plate": str,
+    "size": Size.__getitem__,
+    "slot_size": Size.__getitem__,
+    "slot_id": _optional(int),
+    "date_of_entry": _optional(datetime.fromisoformat),
+    "date_of_first_entry": _optional(datetime.fromisoformat),
+    "date_of_exit": _optional(datetime.fromisoformat),
+    "fee": float,
+    "charge_flat_rate": lambda value: value == "1",
+    "hour_paid": int,
+    "total_hours_stayed": float
+}
+
+
+def _encode(value):
+    """
+    Converts a field of a record to its text in the journal
+    :param value: the value of the field
+    :return: the string of the value
+    """
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.name
+
+    return str(value)
+
+
+def _decode(record_type, fields: list):
+    """
+    Converts the text fields of a row of the journal to a record
+    :param record_type: the namedtuple class of the record
+    :param fields: the list of the strings of the fields
+    :return: the record
+    """
+    return record_type(*[FIELD_PARSERS[name](value) for name, value in zip(record_type._fields, fields)])
+
+
+def vehicle_state(vehicle):
+    """
+    Gets the state of a vehicle that is kept in the snapshots
+    :param vehicle: the ParkingVehicle object
+    :return: the VehicleState tuple
+    """
+    return VehicleState(vehicle.license_plate, vehicle.size, vehicle.slot.slot_id if vehicle.slot else None,
+                        vehicle.date_of_first_entry, vehicle.date_of_entry, vehicle.date_of_exit,
+                        vehicle.charge_flat_rate, vehicle.hour_paid, vehicle.total_hours_stayed)
+
+
+def apply_record(states: dict, record):
+    """
+    Applies a record of the journal to the states of the vehicles
+    :param states: the dictionary of the VehicleState tuples by license plate
+    :param record: the ParkRecord or UnparkRecord tuple
+    :return:
+    """
+    if isinstance(record, ParkRecord):
+        states[record.license_plate] = VehicleState(
+            record.license_plate, record.size, record.slot_id, record.date_of_first_entry, record.date_of_entry,
+            None, record.charge_flat_rate, record.hour_paid, record.total_hours_stayed)
+    else:
+        states[record.license_plate] = states[record.license_plate]._replace(
+            slot_id=None, date_of_exit=record.date_of_exit, charge_flat_rate=record.charge_flat_rate,
+            hour_paid=record.hour_paid, total_hours_stayed=record.total_hours_stayed)
+
+
+class Journal:
+    """
+    A write-ahead log of the parks and unparks of a parking lot, with periodic snapshots of its vehicles. Every
+    commit appends one CSV row per record to the log, and the log is fsynced at most once per fsync interval, so
+    the commits of the interval share one fsync. The records left unsynced by the last commits of an interval are
+    fsynced by a timer at its end. A commit whose records can't be written is cut from the log. A checkpoint writes a snapshot of the vehicles and starts a new
+    log, and the older snapshots and logs are deleted. The parking lot is recovered from the latest snapshot and
+    the log written after it.
+    """
+    def __init__(self, directory: str, fsync_interval=0.01):
+        """
+        Constructor for the Journal class
+
+        :param directory: the directory of the snapshots and logs, created if it doesn't exist
+        :param fsync_interval: the number of seconds the appended records can wait for an fsync. 0 fsyncs every
+        commit, and None leaves it to the OS. The records are written to the OS on every commit, so only a crash
+        of the machine can lose the records of the last interval.
+        """
+        os.makedirs(directory, exist_ok=True)
+        self._directory = directory
+        self._fsync_interval = fsync_interval
+        self._generation = 0
+        self._file = None
+        self._writer = None
+        self._last_fsync = 0
+        self._unsynced = False
+        self._timer = None
+        self._lock = threading.RLock()  # the timer fsyncs in its own thread
+
+    @property
+    def directory(self):
+        return self._directory
+
+    def _path(self, kind: str, generation: int):
+        return os.path.join(self._directory, f"{kind}_{generation:08d}.csv")
+
+    def _generations(self, kind: str):
+        """
+        Lists the generations of the snapshots or logs in the directory
+        :param kind: SNAPSHOT or WAL
+        :return: the sorted list of the generations
+        """
+        generations = []
+
+        for name in os.listdir(self._directory):
+            stem, extension = os.path.splitext(name)
+
+            if extension == ".csv" and stem.startswith(kind + "_") and stem[len(kind) + 1:].isdigit():
+                generations.append(int(stem[len(kind) + 1:]))
+
+        return sorted(generations)
+
+    @staticmethod
+    def _read_rows(path: str):
+        """
+        Reads the CSV rows of a file, without the last line if it was not completely written
+        :param path: the path of the file
+        :return: the list of the rows
+        """
+        with open(path, newline="") as file:
+            text = file.read()
+
+        if not text.endswith("\n"):  # a torn write of a crash
+            text = text[:text.rfind("\n") + 1]
+
+        return list(csv.reader(text.splitlines()))
+
+    def read_snapshot(self, generation: int):
+        """
+        Reads the states of the vehicles of a snapshot
+        :param generation: the generation of the snapshot
+        :return: the dictionary of the VehicleState tuples by license plate
+        """
+        rows = self._read_rows(self._path(SNAPSHOT, generation))
+
+        return {state.license_plate: state for state in (_decode(VehicleState, row) for row in rows[1:])}
+
+    def read_log(self, generation: int):
+        """
+        Reads the records of a log
+        :param generation: the generation of the log
+        :return: the generator of the ParkRecord and UnparkRecord tuples
+        """
+        for row in self._read_rows(self._path(WAL, generation)):
+            yield _decode(RECORD_TYPES[row[0]], row[1:])
+
+    def recover(self):
+        """
+        Rebuilds the states of the vehicles from the latest snapshot and the logs written after it
+        :return: the dictionary of the VehicleState tuples by license plate, the parked vehicles have a slot id
+        """
+        snapshots = self._generations(SNAPSHOT)
+        logs = self._generations(WAL)
+        generation = snapshots[-1] if snapshots else 0
+        states = self.read_snapshot(generation) if snapshots else {}
+
+        for log_generation in logs:
+            if log_generation >= generation:
+                for record in self.read_log(log_generation):
+                    apply_record(states, record)
+
+        self._generation = max(snapshots + logs, default=0)
+
+        return states
+
+    def checkpoint(self, states):
+        """
+        Writes a snapshot of the vehicles, then starts a new log and deletes the older snapshots and logs. The
+        snapshot must hold every record appended so far.
+        :param states: the iterable of the VehicleState tuples of the vehicles
+        :return: the generation of the snapshot
+        """
+        self._close_log()
+        generation = self._generation + 1
+        path = self._path(SNAPSHOT, generation)
+
+        with open(path + ".tmp", "w", newline="") as file:
+            writer = csv.writer(file, lineterminator="\n")
+            writer.writerow(VehicleState._fields)
+            writer.writerows([_encode(value) for value in state] for state in states)
+            file.flush()
+            os.fsync(file.fileno())
+
+        os.replace(path + ".tmp", path)  # the snapshot only counts once it is complete
+        self._sync_directory()
+        self._generation = generation
+        self._file = open(self._path(WAL, generation), "a", newline="")
+        self._writer = csv.writer(self._file, lineterminator="\n")
+
+        for kind in (SNAPSHOT, WAL):
+            for old_generation in self._generations(kind):
+                if old_generation < generation:
+                    os.remove(self._path(kind, old_generation))
+
+        return generation
+
+    def append(self, records: list):
+        """
+        Appends the records of a commit to the log
+        :param records: the list of the ParkRecord and UnparkRecord tuples
+        :return:
+        """
+        with self._lock:
+            if self._writer is None:
+                raise RuntimeError("The journal has no open log, recover it and write a checkpoint first.")
+
+            offset = self._file.tell()
+
+            try:
+                self._writer.writerows([RECORD_TAGS[type(record)], *map(_encode, record)] for record in records)
+                self._file.flush()
+                self._unsynced = True
+
+                if self._fsync_interval is not None:
+                    wait = self._last_fsync + self._fsync_interval - time.monotonic()
+
+                    if wait <= 0:
+                        self.sync()
+                    elif self._timer is None:
+                        self._timer = threading.Timer(wait, self._sync_later)
+                        self._timer.daemon = True
+                        self._timer.start()
+            except BaseException:
+                self._truncate(offset)
+                raise
+
+    def _truncate(self, offset: int):
+        """
+        Cuts the log back to the end of the last commit, so the records of a failed commit are not recovered
+        :param offset: the size of the log before the failed commit
+        :return:
+        """
+        path = self._file.name
+
+        try:
+            self._file.close()  # drops the records that are still buffered
+        except OSError:
+            pass
+
+        self._file = None
+        self._writer = None
+        os.truncate(path, offset)  # if it fails, the log stays closed and the next appends raise
+        self._file = open(path, "a", newline="")
+        self._writer = csv.writer(self._file, lineterminator="\n")
+
+    def sync(self):
+        """
+        Fsyncs the records appended since the last fsync
+        :return:
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+            if self._file is not None and self._unsynced:
+                os.fsync(self._file.fileno())
+                self._unsynced = False
+
+            self._last_fsync = time.monotonic()
+
+    def _sync_later(self):
+        """
+        The timer of the fsync interval, it fsyncs the records of the last commits of the interval
+        :return:
+        """
+        try:
+            self.sync()
+        except OSError as e:  # the next commit or fsync tries again
+            logger.error("The journal could not be fsynced", exc_info=e)
+
+    def _sync_directory(self):
+        if hasattr(os, "O_DIRECTORY"):  # the renames are durable once the directory is fsynced, on POSIX only
+            descriptor = os.open(self._directory, os.O_RDONLY | os.O_DIRECTORY)
+
+            try:
+                os.fsync(descriptor)
+            finally:
+                os.close(descriptor)
+
+    def _close_log(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
+            self._writer = None
+
+    def close(self):
+        """
+        Fsyncs and closes the log
+        :return:
+        """
+        self._close_log()
+
+
+class ReportingSink:
+    """
+    Writes the records of a journal to the tables of the db in a background thread, so the vehicles, slots,
+    visits and visit aggregates the reports read are kept up to date a little behind the journal. The journal
+    stays the source of truth of the parking lot: the records that were not written yet when the process stops
+    are missing from the db. Once a batch can't be written the sink stops, as the next records would be written
+    on top of the missing ones, and flush and close raise the error.
+    """
+    def __init__(self, engine, max_batch_size=1000):
+        """
+        Constructor for the ReportingSink class
+
+        :param engine: the Engine of the db the records are written to, its tables must exist
+        :param max_batch_size: the maximum number of commits of the journal written in one transaction
+        """
+        self._session_factory = sessionmaker(bind=engine)
+        self._max_batch_size = max_batch_size
+        self._visit_statistics = VisitStatistics()
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="reporting-sink", daemon=True)
+        self._thread.start()
+
+    @property
+    def error(self):
+        """
+        The exception of the last batch that could not be written, or None
+        """
+        return self._error
+
+    def put(self, records: list):
+        """
+        Queues the records of a commit of the journal to be written to the db, they are dropped if the sink
+        has stopped
+        :param records: the list of the ParkRecord and UnparkRecord tuples
+        :return:
+        """
+        if self._error is None:
+            self._queue.put(records)
+
+    def flush(self):
+        """
+        Waits until the queued records are written to the db
+        :return:
+        """
+        self._queue.join()
+        self._raise_error()
+
+    def close(self):
+        """
+        Writes the queued records to the db and stops the background thread
+        :return:
+        """
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+        self._raise_error()
+
+    def _raise_error(self):
+        """
+        Raises the exception of the batch that could not be written, if the sink has stopped
+        :return:
+        """
+        if self._error is not None:
+            raise self._error
+
+    def _run(self):
+        """
+        The background thread. It waits for a commit of the journal, then writes it together with all the other
+        commits that are already queued.
+        :return:
+        """
+        stopped = False
+
+        while not stopped:
+            batches = [self._queue.get()]
+
+            while len(batches) < self._max_batch_size:
+                try:
+                    batches.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stopped = None in batches
+            records = [record for batch in batches if batch is not None for record in batch]
+
+            try:
+                if self._error is None:
+                    self._write(records)
+            except Exception as e:
+                self._error = e
+                logger.error("The reporting sink stopped, %d records could not be written to the db", len(records),
+                             exc_info=e)
+            finally:
+                for _ in batches:
+                    self._queue.task_done()
+
+    def _write(self, records: list):
+        """
+        Writes records to the db in one transaction, in the order they were appended to the journal
+        :param records: the list of the ParkRecord and UnparkRecord tuples
+        :return:
+        """
+        if not records:
+            return
+
+        vehicles = Vehicle.__table__
+        slots = ParkingSlot.__table__
+        visits = []
+
+        with self._session_factory.begin() as session:
+            for record in records:
+                if isinstance(record, ParkRecord):
+                    session.execute(delete(vehicles).where(vehicles.c.license_plate == record.license_plate))
+                    session.execute(insert(vehicles).values(
+                        license_plate=record.license_plate, type="parking_vehicle", size=record.size,
+                        date_of_first_entry=record.date_of_first_entry, date_of_entry=record.date_of_entry,
+                        date_of_exit=None, charge_flat_rate=record.charge_flat_rate, hour_paid=record.hour_paid,
+                        total_hours_stayed=record.total_hours_stayed))
+                    session.execute(insert(slots).values(slot_id=record.slot_id, vehicle_plate=record.license_plate,
+                                                         size=record.slot_size))
+                else:
+                    session.execute(update(vehicles).where(vehicles.c.license_plate == record.license_plate).values(
+                        date_of_exit=record.date_of_exit, charge_flat_rate=record.charge_flat_rate,
+                        hour_paid=record.hour_paid, total_hours_stayed=record.total_hours_stayed))
+                    session.execute(delete(slots).where(slots.c.slot_id == record.slot_id))
+                    visit = Visit(license_plate=record.license_plate, slot_id=record.slot_id, size=record.slot_size,
+                                  date_of_entry=record.date_of_entry, date_of_exit=record.date_of_exit,
+                                  fee=record.fee)
+                    session.add(visit)
+                    visits.append(visit)
+
+            if visits:
+                self._visit_statistics.record(session, visits)
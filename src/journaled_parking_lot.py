@@ -0,0 +1,199 @@
+from src.parking_lot import AutomatedParkingLot
+from src.parking_slot import ParkingSlot
+from src.slot_store import SIZES_BY_VALUE
+from src.journal import Journal, ReportingSink, ParkRecord, UnparkRecord, vehicle_state
+from src.assignment import AssignmentStrategy
+from src.vehicles import ParkingVehicle
+from src.fee_calculator import ParkingFeeCalculator
+from src.instrumentation import Instrumentation
+from src.enums import Hours
+
+from datetime import datetime, timedelta
+
+
+class JournaledParkingLot(AutomatedParkingLot):
+    """
+    An automated parking lot that persists its changes to a Journal instead of committing them to the db. A park
+    or unpark appends one compact record to the write-ahead log of the journal, and the vehicles are snapshotted
+    every snapshot interval records. On start the parking lot is rebuilt from the latest snapshot and the log
+    written after it. The db is only written by an optional ReportingSink in the background, for the visits and
+    reports.
+    """
+    def __init__(self, parking_map: dict, journal: Journal, num_of_entrypoints=3,
+                 fee_calculator=ParkingFeeCalculator(flat_rate=40), reporting_sink: ReportingSink = None,
+                 snapshot_interval=10000, instrumentation: Instrumentation = None,
+                 assignment_strategy: AssignmentStrategy = None):
+        """
+        Constructor for the JournaledParkingLot class
+
+        :param parking_map: a dictionary that contains the mapping of the parking lot, or its CompiledParkingMap
+        :param journal: the Journal object the parking lot is recovered from and written to
+        :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+        :param fee_calculator: the FeeCalculator object that will be used to calculate fees
+        :param reporting_sink: the ReportingSink object the records are also written to, the db is not written
+        by default
+        :param snapshot_interval: the number of records appended to the log between two snapshots
+        :param instrumentation: the Instrumentation object that records the timings and counters of the parking
+        lot, the parking lot is not instrumented by default
+        :param assignment_strategy: the AssignmentStrategy object that picks the slots of the arriving vehicles,
+        defaults to the nearest slot from the entrypoint
+        """
+        self._journal = journal
+        self._reporting_sink = reporting_sink
+        self._snapshot_interval = snapshot_interval
+        self._pending_records = []
+        self._num_of_records = 0  # appended to the log since the last snapshot
+        self._exited_vehicles = []  # recovered from the journal until the registry is initialized
+        super().__init__(parking_map, num_of_entrypoints, fee_calculator, instrumentation=instrumentation,
+                         assignment_strategy=assignment_strategy)
+        self._checkpoint()  # the recovered log is compacted into a new snapshot
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _create_session(self):
+        return None  # the parking lot never reads or writes the db
+
+    def _load_occupied_slots(self):
+        """
+        Recovers the vehicles from the journal
+        :return: the list of the occupied ParkingSlot objects, with their vehicles
+        """
+        occupied_slots = []
+
+        for state in self._journal.recover().values():
+            vehicle = ParkingVehicle(state.size, state.license_plate)
+            vehicle.date_of_first_entry = state.date_of_first_entry
+            vehicle.date_of_entry = state.date_of_entry
+            vehicle.date_of_exit = state.date_of_exit
+            vehicle.charge_flat_rate = state.charge_flat_rate
+            vehicle.hour_paid = state.hour_paid
+            vehicle.total_hours_stayed = state.total_hours_stayed
+
+            if state.slot_id is None:
+                self._exited_vehicles.append(vehicle)
+            else:
+                slot_size = SIZES_BY_VALUE[int(self._parking_map.sizes[state.slot_id])]
+                slot_distances = self._parking_map.slot_distances(state.slot_id)
+                slot = ParkingSlot(state.slot_id, slot_size, slot_distances, vehicle)
+                slot.vehicle_plate = state.license_plate  # the slot is never flushed to set it
+                occupied_slots.append(slot)
+
+        return occupied_slots
+
+    def _initialize_vehicle_registry(self, occupied_slots: list):
+        """
+        Initializes the registry of the vehicles with the parked vehicles and the recovered vehicles that exited
+        within the continuous window of the last exit
+        :param occupied_slots: the list of the occupied ParkingSlot objects from the journal
+        :return: the initialized VehicleRegistry object
+        """
+        vehicle_registry = self._vehicle_registry_class()
+        exited_vehicles, self._exited_vehicles = self._exited_vehicles, []
+
+        for slot in occupied_slots:
+            vehicle_registry.add(slot.vehicle)
+
+        if not exited_vehicles:
+            return vehicle_registry
+
+        cutoff = max(vehicle.date_of_exit for vehicle in exited_vehicles) - timedelta(
+            hours=Hours.WITHIN_CONTINUOUS.value)
+
+        for vehicle in sorted(exited_vehicles, key=lambda exited_vehicle: exited_vehicle.date_of_exit):
+            if vehicle.date_of_exit >= cutoff:
+                vehicle_registry.add(vehicle)
+                vehicle_registry.exit(vehicle)
+
+        return vehicle_registry
+
+    def _store_evictions(self, evicted_vehicles: list, now: datetime):
+        pass  # the evicted vehicles are left out of the next snapshot
+
+    def _store_park(self, vehicle: ParkingVehicle, vehicle_parked_before: ParkingVehicle, slot: ParkingSlot):
+        """
+        Appends the record of a parked vehicle to the pending records
+        :param vehicle: the ParkingVehicle object
+        :param vehicle_parked_before: the ParkingVehicle object of the previous stay of the vehicle, the record
+        holds the fee state the vehicle carries over from it
+        :param slot: the ParkingSlot object assigned to the vehicle
+        :return:
+        """
+        self._pending_records.append(ParkRecord(
+            vehicle.license_plate, vehicle.size, slot.slot_id, slot.size, vehicle.date_of_entry,
+            vehicle.date_of_first_entry, vehicle.charge_flat_rate, vehicle.hour_paid, vehicle.total_hours_stayed))
+
+    def _store_unpark(self, vehicle: ParkingVehicle, slot: ParkingSlot, total_fee):
+        """
+        Appends the record of an unparked vehicle to the pending records
+        :param vehicle: the ParkingVehicle object with its date of exit
+        :param slot: the ParkingSlot object the vehicle was parked in
+        :param total_fee: the fee of the visit
+        :return:
+        """
+        self._pending_records.append(UnparkRecord(
+            vehicle.license_plate, slot.slot_id, slot.size, vehicle.date_of_entry, vehicle.date_of_exit, total_fee,
+            vehicle.charge_flat_rate, vehicle.hour_paid, vehicle.total_hours_stayed))
+
+    def _commit(self):
+        """
+        Appends the pending records to the log of the journal, and writes a snapshot once the snapshot interval
+        is reached
+        :return:
+        """
+        records, self._pending_records = self._pending_records, []
+
+        try:
+            if records:
+                with self._instrumentation.phase("commit"):
+                    self._journal.append(records)
+        except Exception:
+            self._undo_changes()
+            raise
+
+        self._forget_changes()
+
+        if not records:
+            return
+
+        if self._reporting_sink is not None:
+            self._reporting_sink.put(records)
+
+        self._num_of_records += len(records)
+
+        if self._num_of_records >= self._snapshot_interval:
+            self._checkpoint()
+
+    def _rollback(self):
+        self._pending_records = []
+        self._undo_changes()
+
+    def _checkpoint(self):
+        """
+        Writes a snapshot of the vehicles of the registry and starts a new log
+        :return:
+        """
+        self._journal.checkpoint(map(vehicle_state, self._vehicle_registry.vehicles()))
+        self._num_of_records = 0
+
+    def checkpoint(self):
+        """
+        Writes a snapshot of the parking lot, so the next start doesn't replay the log written so far
+        :return:
+        """
+        self._commit()
+        self._checkpoint()
+
+    def close(self):
+        """
+        Fsyncs and closes the journal, and waits for the reporting sink to write the records to the db
+        :return:
+        """
+        self._commit()
+        self._journal.close()
+
+        if self._reporting_sink is not None:
+            self._reporting_sink.close()
@@ -1,13 +1,33 @@
 from src.parking_slot import ParkingSlot
+from src.slot_store import SlotStore, SynchronizedSlotStore, ParkingSlotsView
+from src.compiled_parking_map import CompiledParkingMap, compile_parking_map
+from src.slot_index import SlotIndex, SynchronizedSlotIndex
+from src.vehicle_registry import VehicleRegistry, SynchronizedVehicleRegistry
+from src.reservations import Reservation, ReservationBook, SynchronizedReservationBook
+from src.vehicle_archive import VehicleArchive
+from src.visits import Visit, VisitStatistics
+from src.assignment import AssignmentStrategy, NearestSlotStrategy
 from src.vehicles import Vehicle, ParkingVehicle
 from src.fee_calculator import ParkingFeeCalculator
-from src.db import session
+from src.instrumentation import (Instrumentation, NullInstrumentation, InstrumentedFeeCalculator, instrumented,
+                                 OCCUPIED_SLOTS, SLOTS, QUERIES_PER_COMMIT)
+from src import db
 from src.exceptions import *
 from src.enums import Size, EntryPoint, Hours
 
-from sqlalchemy.orm import make_transient, with_polymorphic
+from sqlalchemy import func, inspect
+from sqlalchemy.orm import with_polymorphic, scoped_session, sessionmaker, joinedload
+from sqlalchemy.orm.attributes import set_committed_value, flag_modified
+from sqlalchemy.orm.session import make_transient, make_transient_to_detached
 from abc import ABC, abstractmethod
-from datetime import datetime
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+
+import threading
+
+PENDING_VISITS = "pending_visits"  # the key of the visits that are not committed yet in the info of the db session
+VEHICLE_STATE = ("date_of_first_entry", "date_of_entry", "date_of_exit", "charge_flat_rate", "hour_paid",
+                 "total_hours_stayed", "slot")  # the attributes of a vehicle changed by a park or an unpark
 
 
 class ParkingLot(ABC):
@@ -28,111 +48,707 @@ class AutomatedParkingLot(ParkingLot):
     A class for an automated parking lot that automatically assigns the nearest possible and
     available spot to a vehicle based on the entrypoint.
     """
-    def __init__(self, parking_map: dict, num_of_entrypoints=3, fee_calculator=ParkingFeeCalculator(flat_rate=40)):
+    _slot_store_class = SlotStore
+    _slot_index_class = SlotIndex
+    _vehicle_registry_class = VehicleRegistry
+    _reservation_book_class = ReservationBook
+
+    def __init__(self, parking_map: dict, num_of_entrypoints=3, fee_calculator=ParkingFeeCalculator(flat_rate=40),
+                 engine=None, session_factory=None, instrumentation: Instrumentation = None,
+                 vehicle_archive: VehicleArchive = None, assignment_strategy: AssignmentStrategy = None):
         """
         Constructor for the AutomatedParkingLot class
 
         :param parking_map: a dictionary that contains the mapping of the parking lot. Must contain a list
         of slot_sizes, a list of tuples where the entries in the tuple correspond to the distance from entrypoints,
-        and a list of the possible entrypoints.
+        and a list of the possible entrypoints. It can also be a CompiledParkingMap of the dictionary.
         :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
         :param fee_calculator: the FeeCalculator object that will be used to calculate fees
+        :param engine: the Engine of the db the parking lot is stored in, defaults to the engine of src.db
+        :param session_factory: the callable that creates the db session of the parking lot, takes precedence
+        over the engine
+        :param instrumentation: the Instrumentation object that records the timings and counters of the parking
+        lot, the parking lot is not instrumented by default
+        :param vehicle_archive: the VehicleArchive object the vehicles that left before the continuous window are
+        moved to, they are kept in the vehicles table by default
+        :param assignment_strategy: the AssignmentStrategy object that picks the slots of the arriving vehicles,
+        defaults to the nearest slot from the entrypoint
         """
+        if session_factory is None and engine is not None:
+            session_factory = sessionmaker(bind=engine, expire_on_commit=False)
+
+        if instrumentation is None:
+            instrumentation = NullInstrumentation()
+        elif instrumentation.enabled:
+            fee_calculator = InstrumentedFeeCalculator(fee_calculator, instrumentation)
+
+        self._instrumentation = instrumentation
+        self._session_factory = session_factory
+        self._session = self._create_session()
+
+        if self._session is not None:
+            self._instrumentation.instrument_bind(self._session.get_bind())
+
         self._num_of_entrypoints = num_of_entrypoints
         self._parking_map = parking_map
         self._fee_calculator = fee_calculator
-        self._parking_slots = self._initialize_parking_slots()
+        self._vehicle_archive = vehicle_archive
+        self._assignment_strategy = assignment_strategy or NearestSlotStrategy()
+        self._visit_statistics = VisitStatistics()
+        occupied_slots = self._load_occupied_slots()
+        self._slot_store = self._initialize_slot_store(occupied_slots)
+        self._slot_index = self._initialize_slot_index()
+        self._reservations = self._reservation_book_class()
+        self._fee_quotes = {}  # the (date of entry, tariff schedule, fees by billed hours) of the quoted vehicles
+        self._undo_log = []  # the (undo, arguments) of the in-memory changes that are not committed yet
+        self._record_occupancy()
         self._polymorphic_vehicle = with_polymorphic(Vehicle, '*')
+        self._vehicle_registry = self._initialize_vehicle_registry(occupied_slots)
+        self._parking_slots = ParkingSlotsView(self._slot_store, self._get_occupied_slot)
+
+    def _create_session(self):
+        """
+        Creates the db session used by the parking lot
+        :return: the Session object, or None if the parking lot is not stored through a db session
+        """
+        if self._session_factory is None:
+            # a session of its own from the default engine of src.db, so the objects another parking lot left in
+            # a shared session can't clash with the rows of this one
+            return db.Session()
+
+        return self._session_factory()
 
     @property
     def parking_slots(self):
+        """
+        The parking slots of the parking lot, as a read-only sequence of ParkingSlot objects
+        """
         return self._parking_slots
 
+    def occupancy(self, zone: EntryPoint = None):
+        """
+        Gets the number of slots and of occupied slots of every size. The counters are updated as vehicles park
+        and unpark, so reading them doesn't scan the parking slots.
+        :param zone: the entrypoint whose zone is counted, the slots that are nearest to it. Defaults to the
+        whole parking lot.
+        :return: a dictionary of the (number of slots, number of occupied slots) tuple of every Size
+        """
+        if zone is not None and zone not in self._parking_map.entrypoints:
+            raise InvalidEntryPoint("Invalid entrypoint")
+
+        return self._slot_store.occupancy(zone.value if zone is not None else None)
+
+    def available_slots(self, vehicle_size: Size, zone: EntryPoint = None):
+        """
+        Counts the free slots that can fit a vehicle of the given size
+        :param vehicle_size: the size of the vehicle
+        :param zone: the entrypoint whose zone is counted, defaults to the whole parking lot
+        :return: the number of free slots of the size of the vehicle or larger that are not reserved
+        """
+        occupancy = self.occupancy(zone)  # also checks the zone
+        reserved = self._slot_store.reserved(zone.value if zone is not None else None)
+
+        return sum(slots - occupied - reserved[size] for size, (slots, occupied) in occupancy.items()
+                   if size.value >= vehicle_size.value)
+
+    def find_slot(self, vehicle_size: Size, entrypoint: EntryPoint):
+        """
+        Finds the slot a vehicle of the given size would be assigned if it came in now, without reserving it
+        :param vehicle_size: the size of the vehicle
+        :param entrypoint: the entrypoint where the vehicle would come in
+        :return: the empty ParkingSlot object, or None if the vehicle doesn't fit
+        """
+        slot_id = self._find_nearest_slot(vehicle_size, entrypoint)
+
+        return self._parking_slots[slot_id] if slot_id is not None else None
+
+    def reserve_slot(self, vehicle: ParkingVehicle, entrypoint: EntryPoint, date_of_reservation: datetime,
+                     deadline: datetime):
+        """
+        Holds the nearest available slot from the entrypoint for a vehicle until a deadline. When the vehicle
+        parks before the deadline it gets the held slot. A new reservation of the same vehicle replaces the old one,
+        which is kept if no slot is available.
+        :param vehicle: the ParkingVehicle object
+        :param entrypoint: the entrypoint where the vehicle will come in
+        :param date_of_reservation: the date of the reservation
+        :param deadline: the date the slot is released if the vehicle hasn't parked
+        :return: the Reservation object
+        """
+        if not isinstance(vehicle, ParkingVehicle):
+            raise VehicleIsNotAParkingVehicleObject("The vehicle is not a ParkingVehicle object.")
+
+        if deadline <= date_of_reservation:
+            raise ValueError("The deadline of the reservation must be after the date of the reservation.")
+
+        parked_vehicle = self._vehicle_registry.get(vehicle.license_plate)
+
+        if parked_vehicle is not None and parked_vehicle.date_of_exit is None:
+            raise VehicleAlreadyParked("The vehicle is already in the parking lot.")
+
+        self.expire_reservations(date_of_reservation)
+        replaced_reservation = self.cancel_reservation(vehicle.license_plate)  # its slot can be held again
+
+        try:
+            slot_id = self._find_nearest_slot(vehicle.size, entrypoint)
+
+            while slot_id is not None and not self._slot_index.claim(slot_id):  # taken by another thread
+                slot_id = self._find_nearest_slot(vehicle.size, entrypoint)
+
+            if slot_id is None:
+                raise NoMoreAvailableSpot("No more available parking slot for the vehicle.")
+        except (ParkingLotException, ValueError):
+            if replaced_reservation is not None:
+                self._restore_reservation(replaced_reservation)
+
+            raise
+
+        reservation = Reservation(vehicle.license_plate, slot_id, deadline)
+        self._slot_store.reserve(slot_id)
+        self._reservations.add(reservation)
+
+        return reservation
+
+    def cancel_reservation(self, license_plate: str):
+        """
+        Cancels the reservation of a vehicle and frees its slot
+        :param license_plate: the license plate of the vehicle
+        :return: the cancelled Reservation object, or None if the vehicle had no reservation
+        """
+        reservation = self._reservations.remove(license_plate)
+
+        if reservation is not None:
+            self._release_reservation(reservation)
+
+        return reservation
+
+    def expire_reservations(self, now: datetime):
+        """
+        Frees the slots of the reservations whose deadline has passed. Only the due reservations are looked at.
+        :param now: the current date of the parking lot
+        :return: the list of the expired Reservation objects
+        """
+        expired = self._reservations.expire(now)
+
+        for reservation in expired:
+            self._release_reservation(reservation)
+
+        return expired
+
+    def quote_fee(self, license_plate: str, at_time: datetime):
+        """
+        Quotes the fee a parked vehicle would pay if it left at the given date, without changing the vehicle. The
+        tariff schedule of the vehicle is computed once per stay and the fee once per billed hour, so pay stations
+        can ask again and again.
+        :param license_plate: the license plate of the vehicle
+        :param at_time: the date the vehicle would leave
+        :return: the total parking fee the vehicle would pay
+        """
+        quotes = self._fee_quotes.get(license_plate)
+
+        if quotes is None:
+            vehicle = self._vehicle_registry.get(license_plate)
+
+            if vehicle is None or vehicle.slot is None:
+                raise VehicleNotParked("The vehicle being quoted is currently not parked in a parking slot.")
+
+            quotes = (vehicle.date_of_entry, self._fee_calculator.tariff_schedule(vehicle), {})
+            self._fee_quotes[license_plate] = quotes
+
+        date_of_entry, schedule, fees = quotes
+
+        if at_time < date_of_entry:  # check for proper date values
+            raise ValueError("Date of exit can't be lower than the date of entry.")
+
+        billed_hours = self._fee_calculator.billed_hours(schedule, at_time)
+        fee = fees.get(billed_hours)
+
+        if fee is None:
+            fee = fees[billed_hours] = self._fee_calculator.settle(schedule, at_time)[0]
+
+        return fee
+
     @property
     def _parking_map(self):
         return self.__parking_map
 
     @_parking_map.setter
-    def _parking_map(self, parking_map: dict):
+    def _parking_map(self, parking_map):
         """
-        A private setter method that validates the input parking map
-        :param parking_map: the dictionary the contains the mapping of the parking lot
+        A private setter method that validates and compiles the input parking map
+        :param parking_map: the dictionary the contains the mapping of the parking lot, or an already compiled
+        CompiledParkingMap object
         :return:
         """
-        if type(parking_map) != dict:
-            raise TypeError("Parking map should be a dictionary.")
+        if isinstance(parking_map, CompiledParkingMap):
+            parking_map.validate(self._num_of_entrypoints)
+        else:
+            parking_map = compile_parking_map(parking_map, self._num_of_entrypoints)
 
-        if not parking_map.get("slot_sizes") or not parking_map.get("distances") or not parking_map.get("entrypoints"):
-            raise ValueError("Parking map should contain the following fields: "
-                             "slot_sizes, distances, and entrypoints")
+        self.__parking_map = parking_map
 
-        if any(type(field) != list for field in parking_map.values()):
-            raise ValueError("The values of the parking map should be a list")
+    def _load_occupied_slots(self):
+        """
+        Loads the occupied slots from the db, together with their vehicles
+        :return: the list of the occupied ParkingSlot objects
+        """
+        occupied_slots = self._session.query(ParkingSlot).options(joinedload(ParkingSlot.vehicle)).all()
 
-        slot_sizes = parking_map["slot_sizes"]
-        distances = parking_map["distances"]
-        entrypoints = sorted(parking_map["entrypoints"], key=lambda x: x.value)
+        for slot in occupied_slots:
+            slot.distances = self._parking_map.slot_distances(slot.slot_id)
+            set_committed_value(slot.vehicle, "slot", slot)  # so unparking the vehicle doesn't load its slot again
 
-        if any(len(distance) != self._num_of_entrypoints for distance in distances):
-            raise ValueError("Invalid number of distances for number of entrypoints.")
+        return occupied_slots
 
-        if len(slot_sizes) != len(distances):
-            raise ValueError("Number of slot sizes and distances do not match.")
+    def _initialize_slot_store(self, occupied_slots: list):
+        """
+        Initializes the store of the parking slots from the parking map and the occupied slots
+        :param occupied_slots: the list of the occupied ParkingSlot objects from the db
+        :return: the initialized SlotStore object
+        """
+        slot_store = self._slot_store_class(self._parking_map)
 
-        if len(entrypoints) < self._num_of_entrypoints:
-            raise ValueError(f"The number of entrypoints can't be less than {self._num_of_entrypoints}")
+        for slot in occupied_slots:
+            slot_store.occupy(slot.slot_id, slot.vehicle_plate)
 
-        if any(entrypoints[i].value + 1 != entrypoints[i + 1].value for i in range(len(entrypoints) - 1)):
-            raise ValueError(f"The entrypoints must be in order.")
+        return slot_store
 
-        self.__parking_map = parking_map
+    def _initialize_slot_index(self):
+        """
+        Initializes the index of the free parking slots from the parking map and the occupied slots
+        :return: the initialized SlotIndex object
+        """
+        slot_index = self._slot_index_class(self._parking_map)
+
+        for slot_id in self._slot_store.occupied_slot_ids().tolist():
+            slot_index.occupy(slot_id)
 
-    def _initialize_parking_slots(self):
+        return slot_index
+
+    def _initialize_vehicle_registry(self, occupied_slots: list):
         """
-        Initializes the parking slots of the parking lot with ParkingSlot objects
-        :return: the list of initialized ParkingSlot objects
+        Initializes the registry of the vehicles with the parked vehicles and the vehicles from the db that
+        exited within the continuous window of the last exit
+        :param occupied_slots: the list of the occupied ParkingSlot objects from the db
+        :return: the initialized VehicleRegistry object
         """
-        num_of_spots = len(self._parking_map["slot_sizes"])
-        slot_sizes = self._parking_map["slot_sizes"]
-        distances = self._parking_map["distances"]
-        occupied_slots = session.query(ParkingSlot).all()  # check if there are occupied slots from the db
+        vehicle_registry = self._vehicle_registry_class()
+
+        for slot in occupied_slots:
+            vehicle_registry.add(slot.vehicle)
 
-        slots = [ParkingSlot(i, slot_sizes[i], distances[i]) for i in range(num_of_spots)]
+        last_exit = self._session.query(func.max(ParkingVehicle.date_of_exit)).scalar()
 
-        if len(occupied_slots) == 0:  # if no occupied slots from the db, return the initialized slots
-            return slots
+        if last_exit is None:
+            return vehicle_registry
 
-        for slot in occupied_slots:  # if occupied slots exist from the db, modify the parking slot objects
-            slots[slot.slot_id].vehicle = slot.vehicle
-            slots[slot.slot_id].isempty = False
+        cutoff = last_exit - timedelta(hours=Hours.WITHIN_CONTINUOUS.value)
 
-        return slots
+        if self._vehicle_archive is not None:
+            self._vehicle_archive.archive_before(self._session, cutoff)
+
+        exited_vehicles = self._session.query(self._polymorphic_vehicle).filter(ParkingVehicle.date_of_exit >= cutoff)
+
+        for vehicle in exited_vehicles:
+            if vehicle.license_plate not in vehicle_registry:
+                vehicle_registry.add(vehicle)
+                vehicle_registry.exit(vehicle)
+
+        return vehicle_registry
+
+    def _record_occupancy(self):
+        """
+        Records the number of slots and of occupied slots of every size to the instrumentation
+        :return:
+        """
+        if not self._instrumentation.enabled:
+            return
+
+        for size, (slots, occupied_slots) in self._slot_store.occupancy().items():
+            self._instrumentation.set_gauge(SLOTS, slots, size=size.name)
+            self._instrumentation.set_gauge(OCCUPIED_SLOTS, occupied_slots, size=size.name)
+
+    def _get_occupied_slot(self, slot_id: int):
+        """
+        Gets the ParkingSlot row of an occupied slot from the vehicle parked in it
+        :param slot_id: the id of the slot
+        :return: the ParkingSlot object, or None if the slot is empty
+        """
+        vehicle = self._vehicle_registry.get(self._slot_store.plate(slot_id))
+
+        return vehicle.slot if vehicle is not None else None
+
+    def _evict_vehicles(self, now: datetime):
+        """
+        Evicts the vehicles that left before the continuous window from the registry and the db session
+        :param now: the current date of the parking lot
+        :return:
+        """
+        evicted_vehicles = self._vehicle_registry.evict(now)
+
+        if evicted_vehicles:
+            self._log_change(self._restore_evicted_vehicles, evicted_vehicles)
+
+        self._store_evictions(evicted_vehicles, now)
+
+    def _store_evictions(self, evicted_vehicles: list, now: datetime):
+        """
+        Removes the vehicles evicted from the registry from the db session, and archives them if the parking lot
+        has a vehicle archive
+        :param evicted_vehicles: the list of the evicted ParkingVehicle objects
+        :param now: the current date of the parking lot
+        :return:
+        """
+        vehicles_in_session = [vehicle for vehicle in evicted_vehicles if vehicle in self._session]
+
+        # write the changes of the evicted vehicles that are not in the db yet, or expunging them would drop them
+        if any(inspect(vehicle).pending or inspect(vehicle).modified for vehicle in vehicles_in_session):
+            self._session.flush()
+
+        for vehicle in vehicles_in_session:
+            self._session.expunge(vehicle)
+
+        if self._vehicle_archive is not None and evicted_vehicles:
+            self._vehicle_archive.archive_vehicles(self._session, evicted_vehicles,
+                                                   now - timedelta(hours=Hours.WITHIN_CONTINUOUS.value))
 
     def _find_nearest_slot(self, vehicle_size: Size, entrypoint: EntryPoint):
         """
-        This function finds the nearest available slot based on the vehicle size and
-        the entrypoint
+        This function finds the available slot for the vehicle size and the entrypoint, the nearest one
+        unless another assignment strategy is used
         :param vehicle_size: the size of the vehicle
         :param entrypoint: the entry point of the vehicle to the parking lot
-        :return: the nearest available ParkingSlot object
+        :return: the id of the assigned slot, or None if there is no slot available
         """
-        if entrypoint not in self._parking_map["entrypoints"]:
+        if entrypoint not in self._parking_map.entrypoints:
             raise InvalidEntryPoint("Invalid entrypoint")
 
-        # sort parking slots by distance from entrypoint and their size
-        sorted_slots = sorted(self._parking_slots, key=lambda x: (x.distances[entrypoint.value], x.size.value))
+        # the strategy picks from the index of the free slots ordered by distance from every entrypoint
+        with self._instrumentation.phase("slot_search"):
+            return self._assignment_strategy.find_slot(self._slot_index, self._slot_store, vehicle_size, entrypoint)
 
-        for slot in sorted_slots:
-            if slot.isempty and vehicle_size.value <= slot.size.value:
-                return slot
+    def _occupy_slot(self, slot_id: int, vehicle: ParkingVehicle, entrypoint: EntryPoint):
+        """
+        Marks the nearest available slot as occupied by the vehicle
+        :param slot_id: the id of the nearest available slot
+        :param vehicle: the ParkingVehicle object
+        :param entrypoint: the entry point of the vehicle to the parking lot
+        :return: the id of the occupied slot
+        """
+        reservation = self._reservations.remove(vehicle.license_plate)
 
-        return None
+        if reservation is not None:
+            self._log_change(self._restore_reservation, reservation)
 
-    def park_vehicle(self, vehicle: ParkingVehicle, entrypoint: EntryPoint = EntryPoint.A,
-                     date_of_entry: datetime = datetime.now()):
+        if reservation is not None and reservation.slot_id == slot_id:  # the slot is already held for the vehicle
+            self._slot_store.unreserve(slot_id)
+        else:
+            if reservation is not None:  # the vehicle parks somewhere else, its reserved slot isn't needed
+                self._release_reservation(reservation)
+
+            while not self._slot_index.claim(slot_id):  # the slot was taken by another thread, find the next one
+                slot_id = self._find_nearest_slot(vehicle.size, entrypoint)
+
+                if slot_id is None:
+                    raise NoMoreAvailableSpot("No more available parking slot for the vehicle.")
+
+        self._slot_store.occupy(slot_id, vehicle.license_plate)
+        self._instrumentation.add_to_gauge(OCCUPIED_SLOTS, 1, size=self._slot_store.size(slot_id).name)
+        self._log_change(self._free_slot, slot_id)
+
+        return slot_id
+
+    def _release_reservation(self, reservation: Reservation):
         """
-        A function that parks a vehicle object to the nearest parking spot and adds the vehicle to the
-        db
+        Frees the slot held by a reservation that was removed from the reservations
+        :param reservation: the Reservation object
+        :return:
+        """
+        self._slot_store.unreserve(reservation.slot_id)
+        self._slot_index.release(reservation.slot_id)  # there is no slot row to protect, so it is freed at once
+
+    def _release_slot(self, slot_id: int):
+        """
+        Marks a slot as empty so it can be assigned again
+        :param slot_id: the id of the slot
+        :return:
+        """
+        self._free_slot(slot_id)
+
+    def _free_slot(self, slot_id: int):
+        """
+        Marks a slot as empty at once
+        :param slot_id: the id of the slot
+        :return:
+        """
+        self._slot_store.release(slot_id)  # empty the parking slot
+        self._slot_index.release(slot_id)
+        self._instrumentation.add_to_gauge(OCCUPIED_SLOTS, -1, size=self._slot_store.size(slot_id).name)
+
+    def _store_park(self, vehicle: ParkingVehicle, vehicle_parked_before: ParkingVehicle, slot: ParkingSlot):
+        """
+        Adds a parked vehicle and its slot to the db session
+        :param vehicle: the ParkingVehicle object
+        :param vehicle_parked_before: the ParkingVehicle object of the previous stay of the vehicle in the registry,
+        or None if the vehicle is not in the registry
+        :param slot: the ParkingSlot object assigned to the vehicle
+        :return:
+        """
+        if vehicle_parked_before is None:
+            # the vehicle may still have a row from a visit that was evicted from the registry. The evicted
+            # vehicles are written before they leave the session, so there is nothing to flush for it first.
+            with self._session.no_autoflush:
+                self._session.query(Vehicle).filter(Vehicle.license_plate == vehicle.license_plate).delete(
+                    synchronize_session=False)
+        elif vehicle_parked_before is not vehicle:
+            self._replace_vehicle(vehicle_parked_before, vehicle)  # the vehicle from the parameter updates its row
+
+        self._session.add(vehicle)  # add the vehicle to the db
+        self._session.add(slot)  # add parking slot with the assigned vehicle to the db
+
+    def _store_unpark(self, vehicle: ParkingVehicle, slot: ParkingSlot, total_fee):
+        """
+        Adds the exit of a vehicle to the db session: its updated row, the deletion of its slot row and its visit
+        :param vehicle: the ParkingVehicle object with its date of exit
+        :param slot: the ParkingSlot object the vehicle was parked in
+        :param total_fee: the fee of the visit
+        :return:
+        """
+        self._session.add(vehicle)  # update the date of exit and remaining flat rate hours of the vehicle in the db
+        self._discard(slot)
+        self._record_visit(vehicle, slot, total_fee)
+
+    def _commit(self):
+        """
+        Commits the changes of the parked and unparked vehicles to the db
+        :return:
+        """
+        queries = self._instrumentation.queries
+        visits = self._session.info.pop(PENDING_VISITS, None)
+
+        try:
+            with self._instrumentation.phase("flush"):
+                if visits:
+                    self._visit_statistics.record(self._session, visits)
+
+                self._session.flush()
+
+            with self._instrumentation.phase("commit"):
+                self._session.commit()
+        except Exception:
+            self._rollback()
+            raise
+
+        self._forget_changes()
+        self._instrumentation.observe(QUERIES_PER_COMMIT, self._instrumentation.queries - queries)
+
+    def _rollback(self):
+        """
+        Rolls back the changes that were not committed to the db, and undoes them in memory
+        :return:
+        """
+        self._undo_changes()
+        self._session.rollback()
+        self._session.info.pop(PENDING_VISITS, None)
+
+        if self._vehicle_archive is not None:
+            self._vehicle_archive.forget_partitions()  # their creation may have been rolled back
+
+    def _pending_changes(self):
+        """
+        Gets the undo log of the in-memory changes that are not committed yet
+        :return: the list of the (undo, arguments) tuples, in the order of the changes
+        """
+        return self._undo_log
+
+    def _log_change(self, undo, *args):
+        """
+        Appends an in-memory change to the undo log, so it can be undone if its commit fails
+        :param undo: the callable that undoes the change
+        :param args: the arguments of the callable
+        :return:
+        """
+        self._pending_changes().append((undo, args))
+
+    def _undo_changes(self):
+        """
+        Undoes the in-memory changes of the undo log, the latest one first
+        :return:
+        """
+        changes = self._pending_changes()
+
+        while changes:
+            undo, args = changes.pop()
+            undo(*args)
+
+    def _forget_changes(self):
+        """
+        Empties the undo log once its changes are committed
+        :return:
+        """
+        self._pending_changes().clear()
+
+    @staticmethod
+    def _vehicle_state(vehicle: ParkingVehicle):
+        """
+        Gets the attributes of a vehicle that a park or an unpark changes
+        :param vehicle: the ParkingVehicle object
+        :return: the dictionary of the attributes
+        """
+        return {key: getattr(vehicle, key) for key in VEHICLE_STATE}
+
+    @staticmethod
+    def _restore_vehicle(vehicle: ParkingVehicle, state: dict):
+        """
+        Sets back the attributes of a vehicle and puts it back in its slot, without making them changes to write
+        :param vehicle: the ParkingVehicle object
+        :param state: the dictionary of the attributes from _vehicle_state
+        :return:
+        """
+        for key, value in state.items():
+            set_committed_value(vehicle, key, value)
+
+        if vehicle.slot is not None:
+            set_committed_value(vehicle.slot, "vehicle", vehicle)
+            vehicle.slot.isempty = False
+
+    def _restore_registry_entry(self, license_plate: str, vehicle: ParkingVehicle):
+        """
+        Puts back the vehicle that was in the registry under a license plate
+        :param license_plate: the license plate of the vehicle
+        :param vehicle: the ParkingVehicle object, or None if the license plate was not in the registry
+        :return:
+        """
+        if vehicle is None:
+            self._vehicle_registry.remove(license_plate)
+            return
+
+        self._vehicle_registry.add(vehicle)
+
+        if vehicle.date_of_exit is not None:
+            self._vehicle_registry.exit(vehicle)
+
+    def _restore_evicted_vehicles(self, vehicles: list):
+        """
+        Puts back the vehicles evicted from the registry
+        :param vehicles: the list of the evicted ParkingVehicle objects
+        :return:
+        """
+        for vehicle in vehicles:
+            self._vehicle_registry.add(vehicle)
+            self._vehicle_registry.exit(vehicle)
+
+    def _restore_reservation(self, reservation: Reservation):
+        """
+        Puts back a reservation used by a vehicle that parked, unless its slot was taken by another thread
+        :param reservation: the Reservation object
+        :return:
+        """
+        if self._slot_index.claim(reservation.slot_id):
+            self._slot_store.reserve(reservation.slot_id)
+            self._reservations.add(reservation)
+
+    def _reoccupy_slot(self, slot_id: int, license_plate: str):
+        """
+        Marks a slot released by an unpark as occupied by the vehicle again
+        :param slot_id: the id of the slot
+        :param license_plate: the license plate of the vehicle
+        :return:
+        """
+        self._slot_index.claim(slot_id)
+        self._slot_store.occupy(slot_id, license_plate)
+        self._instrumentation.add_to_gauge(OCCUPIED_SLOTS, 1, size=self._slot_store.size(slot_id).name)
+
+    def _restore_replaced_vehicle(self, vehicle_parked_before: ParkingVehicle, vehicle: ParkingVehicle,
+                                  in_session: bool):
+        """
+        Puts back the previous object of a vehicle that came back in the db session, in place of the new one
+        :param vehicle_parked_before: the ParkingVehicle object of the previous stay of the vehicle
+        :param vehicle: the ParkingVehicle object that took its place
+        :param in_session: whether the previous object was in the db session
+        :return:
+        """
+        if vehicle in self._session:
+            self._session.expunge(vehicle)
+
+        make_transient(vehicle)  # the new object can be parked again
+
+        if in_session:
+            self._session.add(vehicle_parked_before)
+
+    def _discard(self, instance):
+        """
+        Deletes an object from the db, or only removes it from the db session if it was added in the current
+        transaction and not written to the db yet
+        :param instance: the ParkingSlot or ParkingVehicle object
+        :return:
+        """
+        if inspect(instance).pending:
+            self._session.expunge(instance)
+        else:
+            self._session.delete(instance)
+
+    def _replace_vehicle(self, vehicle_parked_before: ParkingVehicle, vehicle: ParkingVehicle):
+        """
+        Makes a vehicle that came back take the place of its previous object, so its row in the db is updated
+        instead of deleted and inserted again
+        :param vehicle_parked_before: the ParkingVehicle object of the previous stay of the vehicle
+        :param vehicle: the ParkingVehicle object of the vehicle that came back with its new slot, added to the db
+        session after
+        :return:
+        """
+        if not inspect(vehicle_parked_before).has_identity:  # it was not written to the db
+            if vehicle_parked_before in self._session:
+                self._session.expunge(vehicle_parked_before)
+
+            return
+
+        in_session = vehicle_parked_before in self._session
+        self._log_change(self._restore_replaced_vehicle, vehicle_parked_before, vehicle, in_session)
+
+        if in_session:
+            self._session.expunge(vehicle_parked_before)  # its changes are overwritten by the new object
+
+        slot = vehicle.slot
+        make_transient_to_detached(vehicle)
+        set_committed_value(vehicle, "slot", None)
+        vehicle.slot = slot  # the new slot is a change of the vehicle, not a slot it already had in the db
+
+        # the values of the new object were set before it had an identity, so they have to be written again
+        for attribute in inspect(vehicle).mapper.column_attrs:
+            if attribute.key != "license_plate" and attribute.key in vehicle.__dict__:
+                flag_modified(vehicle, attribute.key)
+
+    def _record_visit(self, vehicle: ParkingVehicle, slot: ParkingSlot, total_fee):
+        """
+        Appends the visit of a vehicle that left to the db session, it is added to the aggregates on commit
+        :param vehicle: the ParkingVehicle object
+        :param slot: the ParkingSlot object the vehicle was parked in
+        :param total_fee: the fee of the visit
+        :return:
+        """
+        visit = Visit(license_plate=vehicle.license_plate, slot_id=slot.slot_id, size=slot.size,
+                      date_of_entry=vehicle.date_of_entry, date_of_exit=vehicle.date_of_exit, fee=total_fee)
+        self._session.add(visit)
+        self._session.info.setdefault(PENDING_VISITS, []).append(visit)
+
+    @staticmethod
+    def _start_new_visit(vehicle: ParkingVehicle, date_of_entry: datetime):
+        """
+        Resets the fee state of a vehicle that is not charged the continuous rate
+        :param vehicle: the ParkingVehicle object
+        :param date_of_entry: the date the vehicle came into the parking lot
+        :return:
+        """
+        vehicle.date_of_first_entry = date_of_entry
+        vehicle.charge_flat_rate = True
+        vehicle.hour_paid = 0
+        vehicle.total_hours_stayed = 0
+
+    @instrumented("park")
+    def _park(self, vehicle: ParkingVehicle, entrypoint: EntryPoint, date_of_entry: datetime):
+        """
+        Assigns the nearest parking slot to the vehicle and adds the changes to the db session without
+        committing them
         :param vehicle: the ParkingVehicle object
         :param entrypoint: the entrypoint where the vehicle came in
         :param date_of_entry: the date the vehicle came into the parking lot
@@ -141,13 +757,27 @@ class AutomatedParkingLot(ParkingLot):
         if not isinstance(vehicle, ParkingVehicle):
             raise VehicleIsNotAParkingVehicleObject("The vehicle is not a ParkingVehicle object.")
 
-        nearest_slot = self._find_nearest_slot(vehicle.size, entrypoint)
+        self.expire_reservations(date_of_entry)
+        reservation = self._reservations.get(vehicle.license_plate)
 
-        if nearest_slot is None:
+        if reservation is not None and self._slot_store.size(reservation.slot_id).value >= vehicle.size.value:
+            if entrypoint not in self._parking_map.entrypoints:
+                raise InvalidEntryPoint("Invalid entrypoint")
+
+            slot_id = reservation.slot_id  # the vehicle gets the slot held for it, whatever its entrypoint
+        else:
+            slot_id = self._find_nearest_slot(vehicle.size, entrypoint)
+
+        if slot_id is None:
             raise NoMoreAvailableSpot("No more available parking slot for the vehicle.")
 
-        vehicle_query = session.query(self._polymorphic_vehicle).filter(Vehicle.license_plate == vehicle.license_plate)
-        vehicle_parked_before = vehicle_query.one_or_none()
+        self._evict_vehicles(date_of_entry)
+
+        vehicle_parked_before = self._vehicle_registry.get(vehicle.license_plate)
+        self._log_change(self._restore_registry_entry, vehicle.license_plate, vehicle_parked_before)
+
+        if vehicle_parked_before is vehicle:  # the same object parks again, its previous stay is changed in place
+            self._log_change(self._restore_vehicle, vehicle, self._vehicle_state(vehicle))
 
         if vehicle_parked_before:  # checks if the vehicle has parked before and if it came back within an hour
             if vehicle_parked_before.date_of_exit is None:
@@ -165,61 +795,308 @@ class AutomatedParkingLot(ParkingLot):
                 vehicle.charge_flat_rate = False
                 vehicle.hour_paid = vehicle_parked_before.hour_paid
                 vehicle.total_hours_stayed = vehicle_parked_before.total_hours_stayed
+                vehicle.date_of_first_entry = vehicle_parked_before.date_of_first_entry
                 #vehicle.flat_rate_hours = vehicle_parked_before.flat_rate_hours
+            else:
+                self._start_new_visit(vehicle, date_of_entry)
+        else:
+            self._start_new_visit(vehicle, date_of_entry)
+
+        slot_id = self._occupy_slot(slot_id, vehicle, entrypoint)
 
+        if vehicle_parked_before is not None and vehicle_parked_before is not vehicle:
             vehicle_parked_before.slot = None
-            session.delete(vehicle_parked_before)  # delete the existing vehicle from the db so we can add the vehicle from the parameter
-        else:
-            vehicle.date_of_first_entry = date_of_entry
 
         vehicle.date_of_entry = date_of_entry
+        vehicle.date_of_exit = None
 
-        make_transient(nearest_slot)
-        nearest_slot.vehicle = vehicle  # assign vehicle to the parking slot
-        nearest_slot.isempty = False
+        # the ParkingSlot row of the slot only exists while a vehicle is parked in it
+        nearest_slot = ParkingSlot(slot_id, self._slot_store.size(slot_id), self._slot_store.slot_distances(slot_id),
+                                   vehicle)
 
-        session.add(vehicle)  # add the vehicle to the db
-        session.add(nearest_slot)  # add parking slot with the assigned vehicle to the db
-
-        session.commit()
+        self._store_park(vehicle, vehicle_parked_before, nearest_slot)
+        self._vehicle_registry.add(vehicle)
+        self._fee_quotes.pop(vehicle.license_plate, None)  # the quotes of the previous stay are void
 
         return nearest_slot
 
-    def unpark_vehicle(self, vehicle: Vehicle, date_of_exit: datetime = datetime.now()):
+    @instrumented("unpark")
+    def _unpark(self, vehicle: Vehicle, date_of_exit: datetime):
         """
-        A function that unparks a vehicle object from it's parking slot and modifies the vehicle entry
-        within the db.
-        :param vehicle: the ParkingVehicle object
+        Removes the vehicle from its parking slot, calculates its fee and adds the changes to the db
+        session without committing them
+        :param vehicle: the Vehicle object
         :param date_of_exit: the date the vehicle left the parking slot
         :return: the total parking fee for the vehicle
         """
-        vehicle_query = session.query(self._polymorphic_vehicle).filter(self._polymorphic_vehicle.license_plate
-                                                                        == vehicle.license_plate)
-        parked_vehicle = vehicle_query.one()
+        self._evict_vehicles(date_of_exit)
 
-        if parked_vehicle.slot is None:  # makes sure that a vehicle being unparked has a parking slot
+        parked_vehicle = self._vehicle_registry.get(vehicle.license_plate)
+
+        # makes sure that a vehicle being unparked has a parking slot
+        if parked_vehicle is None or parked_vehicle.slot is None:
             raise VehicleNotParked("The vehicle being unparked is currently not parked in a parking slot.")
 
         if date_of_exit < parked_vehicle.date_of_entry:  # check for proper date values
             raise ValueError("Date of exit can't be lower than the date of entry.")
 
+        self._log_change(self._restore_vehicle, parked_vehicle, self._vehicle_state(parked_vehicle))
         parked_vehicle.date_of_exit = date_of_exit
 
         total_fee = self._fee_calculator.calculate_fee(parked_vehicle)  # get the total fee
 
-        slot_id = parked_vehicle.slot.slot_id
+        parked_slot = parked_vehicle.slot
+        slot_id = parked_slot.slot_id
 
-        session.delete(parked_vehicle.slot)
+        self._store_unpark(parked_vehicle, parked_slot, total_fee)
+        parked_slot.isempty = True  # also removes the vehicle from the slot
 
-        self._parking_slots[slot_id].isempty = True  # empty the parking slot
+        self._release_slot(slot_id)
+        self._log_change(self._reoccupy_slot, slot_id, parked_vehicle.license_plate)
+        self._vehicle_registry.exit(parked_vehicle)
+        self._fee_quotes.pop(parked_vehicle.license_plate, None)
         #self._parking_slots[slot_id].vehicle = None
 
-        vehicle_query.update({
-            ParkingVehicle.date_of_exit: date_of_exit,
-            ParkingVehicle.hour_paid: parked_vehicle.hour_paid,
-            ParkingVehicle.total_hours_stayed: parked_vehicle.total_hours_stayed
-        })  # update the date of exit and remaining flat rate hours of the vehicle in the db
+        return total_fee
+
+    def park_vehicle(self, vehicle: ParkingVehicle, entrypoint: EntryPoint = EntryPoint.A,
+                     date_of_entry: datetime = datetime.now()):
+        """
+        A function that parks a vehicle object to the nearest parking spot and adds the vehicle to the
+        db
+        :param vehicle: the ParkingVehicle object
+        :param entrypoint: the entrypoint where the vehicle came in
+        :param date_of_entry: the date the vehicle came into the parking lot
+        :return: the assigned ParkingSlot object for the vehicle
+        """
+        try:
+            nearest_slot = self._park(vehicle, entrypoint, date_of_entry)
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+
+        return nearest_slot
 
-        session.commit()
+    def unpark_vehicle(self, vehicle: Vehicle, date_of_exit: datetime = datetime.now()):
+        """
+        A function that unparks a vehicle object from it's parking slot and modifies the vehicle entry
+        within the db.
+        :param vehicle: the ParkingVehicle object
+        :param date_of_exit: the date the vehicle left the parking slot
+        :return: the total parking fee for the vehicle
+        """
+        try:
+            total_fee = self._unpark(vehicle, date_of_exit)
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
 
         return total_fee
+
+    def park_vehicles(self, batch: list):
+        """
+        A function that parks a batch of vehicles in order and commits all the changes in a single
+        transaction
+        :param batch: a list of (ParkingVehicle object, entrypoint, date of entry) tuples
+        :return: a list with the assigned ParkingSlot object, or the raised exception, for every item of
+        the batch. Any other exception rolls back the whole batch and is raised.
+        """
+        results = []
+
+        try:
+            for vehicle, entrypoint, date_of_entry in batch:
+                try:
+                    results.append(self._park(vehicle, entrypoint, date_of_entry))
+                except (ParkingLotException, ValueError) as e:
+                    results.append(e)
+
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+
+        return results
+
+    def unpark_vehicles(self, batch: list):
+        """
+        A function that unparks a batch of vehicles in order and commits all the changes in a single
+        transaction
+        :param batch: a list of (Vehicle object, date of exit) tuples
+        :return: a list with the total parking fee, or the raised exception, for every item of the batch. Any
+        other exception rolls back the whole batch and is raised.
+        """
+        results = []
+
+        try:
+            for vehicle, date_of_exit in batch:
+                try:
+                    results.append(self._unpark(vehicle, date_of_exit))
+                except (ParkingLotException, ValueError) as e:
+                    results.append(e)
+
+            self._commit()
+        except Exception:
+            self._rollback()
+            raise
+
+        return results
+
+
+class ThreadSafeParkingLot(AutomatedParkingLot):
+    """
+    An automated parking lot that can be used by many threads at once, e.g. behind a threaded WSGI server.
+    Every thread uses its own db session, the requests for the same license plate are serialized, and the
+    slots are reserved atomically under a lock per slot size so arrivals of different sizes don't block
+    each other.
+    """
+    _slot_store_class = SynchronizedSlotStore
+    _slot_index_class = SynchronizedSlotIndex
+    _vehicle_registry_class = SynchronizedVehicleRegistry
+    _reservation_book_class = SynchronizedReservationBook
+
+    def __init__(self, parking_map: dict, num_of_entrypoints=3, fee_calculator=ParkingFeeCalculator(flat_rate=40),
+                 engine=None, session_factory=None, instrumentation: Instrumentation = None,
+                 vehicle_archive: VehicleArchive = None, assignment_strategy: AssignmentStrategy = None,
+                 num_of_plate_locks=64):
+        """
+        Constructor for the ThreadSafeParkingLot class
+
+        :param parking_map: a dictionary that contains the mapping of the parking lot
+        :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+        :param fee_calculator: the FeeCalculator object that will be used to calculate fees
+        :param engine: the Engine of the db the parking lot is stored in, defaults to the engine of src.db
+        :param session_factory: the callable that creates the db sessions of the threads, takes precedence
+        over the engine
+        :param instrumentation: the Instrumentation object that records the timings and counters of the parking
+        lot, the parking lot is not instrumented by default
+        :param vehicle_archive: the VehicleArchive object the vehicles that left before the continuous window are
+        moved to, they are kept in the vehicles table by default
+        :param assignment_strategy: the AssignmentStrategy object that picks the slots of the arriving vehicles,
+        defaults to the nearest slot from the entrypoint
+        :param num_of_plate_locks: the number of locks the license plates are spread over
+        """
+        self._plate_locks = [threading.Lock() for _ in range(num_of_plate_locks)]
+        self._released_slots = threading.local()
+        self._undo_logs = threading.local()
+        super().__init__(parking_map, num_of_entrypoints, fee_calculator, engine, session_factory, instrumentation,
+                         vehicle_archive, assignment_strategy)
+        self._commit()  # detach the restored vehicles and slots from the session of this thread
+
+    def _create_session(self):
+        return scoped_session(self._session_factory or db.Session)
+
+    def _lock_plates(self, vehicles: list):
+        """
+        Acquires the locks of the license plates of the vehicles, always in the same order to avoid deadlocks
+        :param vehicles: the list of Vehicle objects
+        :return: the ExitStack that releases the locks
+        """
+        lock_ids = sorted({hash(vehicle.license_plate) % len(self._plate_locks) for vehicle in vehicles
+                           if isinstance(vehicle, Vehicle)})
+        stack = ExitStack()
+
+        for lock_id in lock_ids:
+            stack.enter_context(self._plate_locks[lock_id])
+
+        return stack
+
+    def _release_slot(self, slot_id: int):
+        """
+        Defers the release of a slot until the changes of this thread are committed, so no other thread can
+        write the same slot row in the meantime
+        :param slot_id: the id of the slot
+        :return:
+        """
+        if not hasattr(self._released_slots, "slot_ids"):
+            self._released_slots.slot_ids = []
+
+        self._released_slots.slot_ids.append(slot_id)
+
+    def _reoccupy_slot(self, slot_id: int, license_plate: str):
+        """
+        Cancels the deferred release of a slot of this thread
+        :param slot_id: the id of the slot
+        :param license_plate: the license plate of the vehicle
+        :return:
+        """
+        self._released_slots.slot_ids.remove(slot_id)  # the slot was never freed
+
+    def _discard(self, instance):
+        """
+        Deletes an object from the db, and detaches it if the changes of this thread are rolled back, as the
+        rollback would put the deleted object back in the db session expired
+        :param instance: the ParkingSlot or ParkingVehicle object
+        :return:
+        """
+        super()._discard(instance)
+        self._log_change(self._detach, instance)
+
+    def _detach(self, instance):
+        """
+        Removes an object from the db session of this thread if it is still in it, and drops its deletion
+        :param instance: the ParkingSlot or ParkingVehicle object
+        :return:
+        """
+        if inspect(instance).session is not None:
+            make_transient(instance)
+            make_transient_to_detached(instance)
+
+    def _pending_changes(self):
+        if not hasattr(self._undo_logs, "changes"):
+            self._undo_logs.changes = []
+
+        return self._undo_logs.changes
+
+    def _rollback(self):
+        """
+        Rolls back the changes of this thread. Its objects are detached before the db session is rolled back,
+        so they keep the values restored in memory instead of being expired.
+        :return:
+        """
+        self._undo_changes()
+        self._session.expunge_all()
+        super()._rollback()
+
+    def _commit(self):
+        """
+        Commits the changes of this thread and detaches its objects from its session, so the next request for
+        the same vehicle can be served by any thread
+        :return:
+        """
+        try:
+            super()._commit()
+        finally:
+            self._session.expunge_all()
+
+            for slot_id in getattr(self._released_slots, "slot_ids", []):
+                self._free_slot(slot_id)
+
+            self._released_slots.slot_ids = []
+
+    def park_vehicle(self, vehicle: ParkingVehicle, entrypoint: EntryPoint = EntryPoint.A,
+                     date_of_entry: datetime = datetime.now()):
+        with self._lock_plates([vehicle]):
+            return super().park_vehicle(vehicle, entrypoint, date_of_entry)
+
+    def unpark_vehicle(self, vehicle: Vehicle, date_of_exit: datetime = datetime.now()):
+        with self._lock_plates([vehicle]):
+            return super().unpark_vehicle(vehicle, date_of_exit)
+
+    def quote_fee(self, license_plate: str, at_time: datetime):
+        with self._lock_plates([Vehicle(license_plate=license_plate)]):
+            return super().quote_fee(license_plate, at_time)
+
+    def reserve_slot(self, vehicle: ParkingVehicle, entrypoint: EntryPoint, date_of_reservation: datetime,
+                     deadline: datetime):
+        with self._lock_plates([vehicle]):
+            return super().reserve_slot(vehicle, entrypoint, date_of_reservation, deadline)
+
+    def park_vehicles(self, batch: list):
+        with self._lock_plates([vehicle for vehicle, _, _ in batch]):
+            return super().park_vehicles(batch)
+
+    def unpark_vehicles(self, batch: list):
+        with self._lock_plates([vehicle for vehicle, _ in batch]):
+            return super().unpark_vehicles(batch)
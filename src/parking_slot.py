@@ -3,7 +3,7 @@ from src.enums import Size
 from src.db import Base
 
 from sqlalchemy import Column, Integer, String, ForeignKey, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, reconstructor
 
 
 class ParkingSlot(Base):
@@ -14,7 +14,7 @@ class ParkingSlot(Base):
 
     __tablename__ = "slots"
     slot_id = Column(Integer, primary_key=True)
-    vehicle_plate = Column(String, ForeignKey(Vehicle.license_plate))
+    vehicle_plate = Column(String, ForeignKey(Vehicle.license_plate), index=True)
     size = Column(Enum(Size))
     vehicle = relationship("ParkingVehicle", back_populates="slot")
 
@@ -27,10 +27,23 @@ class ParkingSlot(Base):
         else:
             self._isempty = True
 
+    @reconstructor
+    def _init_on_load(self):
+        """
+        Initializes the attributes that are not stored in the db when a slot is loaded from the db. Only the
+        occupied slots are stored in the db.
+        """
+        self._distances = None
+        self._isempty = self.vehicle_plate is None
+
     @property
     def distances(self):
         return self._distances
 
+    @distances.setter
+    def distances(self, distances: tuple):
+        self._distances = distances
+
     @property
     def isempty(self):
         return self._isempty
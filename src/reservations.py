@@ -0,0 +1,142 @@
+from datetime import datetime
+from itertools import count
+
+import heapq
+import threading
+
+
+class Reservation:
+    """
+    A parking slot held for a vehicle until a deadline
+    """
+    def __init__(self, license_plate: str, slot_id: int, deadline: datetime):
+        """
+        Constructor for the Reservation class
+
+        :param license_plate: the license plate of the vehicle the slot is held for
+        :param slot_id: the id of the held slot
+        :param deadline: the date the slot is released if the vehicle hasn't parked
+        """
+        self.license_plate = license_plate
+        self.slot_id = slot_id
+        self.deadline = deadline
+
+    def __repr__(self):
+        return f"Reservation({self.license_plate!r}, {self.slot_id}, {self.deadline!r})"
+
+
+class ReservationBook:
+    """
+    The open reservations of a parking lot keyed by license plate. Their deadlines are kept in a min-heap, so
+    expiring them only looks at the reservations that are due. The heap entries of the reservations that were
+    used or cancelled are dropped when they come up.
+    """
+    def __init__(self):
+        self._reservations = {}
+        self._deadlines = []  # min-heap of (deadline, sequence number, Reservation object)
+        self._sequence = count()
+
+    def __len__(self):
+        return len(self._reservations)
+
+    def get(self, license_plate: str):
+        """
+        Gets the open reservation of a vehicle
+        :param license_plate: the license plate of the vehicle
+        :return: the Reservation object, or None if the vehicle has no reservation
+        """
+        return self._reservations.get(license_plate)
+
+    def add(self, reservation: Reservation):
+        """
+        Adds a reservation, replacing the reservation of the same vehicle
+        :param reservation: the Reservation object
+        :return: the replaced Reservation object, or None
+        """
+        replaced_reservation = self._reservations.get(reservation.license_plate)
+        self._reservations[reservation.license_plate] = reservation
+        heapq.heappush(self._deadlines, (reservation.deadline, next(self._sequence), reservation))
+
+        return replaced_reservation
+
+    def remove(self, license_plate: str):
+        """
+        Removes the reservation of a vehicle
+        :param license_plate: the license plate of the vehicle
+        :return: the removed Reservation object, or None if the vehicle has no reservation
+        """
+        return self._reservations.pop(license_plate, None)
+
+    def expire(self, now: datetime):
+        """
+        Removes the reservations whose deadline has passed
+        :param now: the current date of the parking lot
+        :return: the list of the expired Reservation objects
+        """
+        expired = []
+
+        while self._deadlines and self._deadlines[0][0] <= now:
+            reservation = heapq.heappop(self._deadlines)[2]
+
+            if self._reservations.get(reservation.license_plate) is reservation:
+                del self._reservations[reservation.license_plate]
+                expired.append(reservation)
+
+        return expired
+
+
+class SynchronizedReservationBook(ReservationBook):
+    """
+    A ReservationBook that can be shared by many threads
+    """
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def get(self, license_plate: str):
+        with self._lock:
+            return super().get(license_plate)
+
+    def add(self, reservation: Reservation):
+        with self._lock:
+            return super().add(reservation)
+
+    def remove(self, license_plate: str):
+        with self._lock:
+            return super().remove(license_plate)
+
+    def expire(self, now: datetime):
+        with self._lock:
+            return super().expire(now)
+
+
+class ReservationExpiryTimer(threading.Thread):
+    """
+    A background thread that expires the reservations of a parking lot on every tick. The parking lot is also
+    called from the thread, so it must be a ThreadSafeParkingLot.
+    """
+    def __init__(self, parking_lot, interval=1.0, clock=datetime.now):
+        """
+        Constructor for the ReservationExpiryTimer class
+
+        :param parking_lot: the ThreadSafeParkingLot object
+        :param interval: the number of seconds between two ticks
+        :param clock: the callable that gets the current date
+        """
+        super().__init__(name="reservation-expiry", daemon=True)
+        self._parking_lot = parking_lot
+        self._interval = interval
+        self._clock = clock
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self._interval):
+            self._parking_lot.expire_reservations(self._clock())
+
+    def stop(self):
+        """
+        Stops the thread and waits for its last tick
+        :return:
+        """
+        self._stopped.set()
+        self.join()
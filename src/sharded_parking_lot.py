@@ -0,0 +1,466 @@
+from src.parking_lot import ParkingLot, AutomatedParkingLot
+from src.parking_slot import ParkingSlot
+from src.compiled_parking_map import CompiledParkingMap, compile_parking_map
+from src.slot_index import SlotIndex
+from src.vehicle_registry import VehicleRegistry
+from src.vehicles import Base, Vehicle, ParkingVehicle
+from src.db import create_db_engine
+from src.exceptions import *
+from src.enums import EntryPoint
+
+from datetime import datetime
+
+import multiprocessing
+
+
+class LocalShard:
+    """
+    A shard of a ShardedParkingLot that runs an AutomatedParkingLot in the current process
+    """
+    def __init__(self, parking_lot: AutomatedParkingLot):
+        """
+        Constructor for the LocalShard class
+
+        :param parking_lot: the AutomatedParkingLot object of the shard
+        """
+        self._parking_lot = parking_lot
+
+    @property
+    def parking_map(self):
+        return self._parking_lot._parking_map
+
+    def occupied_slots(self):
+        """
+        Gets the occupied slots of the shard
+        :return: the list of the (slot id, license plate) tuples of the occupied slots
+        """
+        slot_store = self._parking_lot._slot_store
+
+        return [(slot_id, slot_store.plate(slot_id)) for slot_id in slot_store.occupied_slot_ids().tolist()]
+
+    def park_vehicles(self, batch: list):
+        return self._parking_lot.park_vehicles(batch)
+
+    def unpark_vehicles(self, batch: list):
+        return self._parking_lot.unpark_vehicles(batch)
+
+    def send(self, method: str, *args):
+        """
+        Starts a call of a method of the shard. The call of a LocalShard is done when its result is received.
+        :param method: the name of the method, e.g. park_vehicles
+        :param args: the arguments of the method
+        :return:
+        """
+        self._pending = (method, args)
+
+    def receive(self):
+        """
+        Gets the result of the pending call of the shard
+        :return: the result of the call, or the exception it raised
+        """
+        method, args = self._pending
+        self._pending = None
+
+        try:
+            return getattr(self, method)(*args)
+        except Exception as e:
+            return e
+
+    def close(self):
+        pass
+
+
+def _serve_shard(connection, parking_map: CompiledParkingMap, db_url: str, num_of_entrypoints: int):
+    """
+    The main function of the process of a ProcessShard. It serves the calls of the shard until it is closed.
+    :param connection: the Connection object to the ShardedParkingLot
+    :param parking_map: the CompiledParkingMap object of the shard
+    :param db_url: the url of the db of the shard
+    :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+    :return:
+    """
+    engine = create_db_engine(db_url, journal_mode="WAL", synchronous="NORMAL")
+    Base.metadata.create_all(engine)
+    shard = LocalShard(AutomatedParkingLot(parking_map, num_of_entrypoints, engine=engine))
+
+    while True:
+        method, args = connection.recv()
+
+        if method == "close":
+            break
+
+        shard.send(method, *args)
+        results = shard.receive()  # the exception of a failed call is sent back as its result
+
+        # send copies of the slots without their vehicles, which stay in the shard
+        if method == "park_vehicles" and not isinstance(results, Exception):
+            results = [ParkingSlot(result.slot_id, result.size, result.distances)
+                       if isinstance(result, ParkingSlot) else result for result in results]
+
+        try:
+            connection.send(results)
+        except Exception as e:  # e.g. an exception that can't be pickled, nothing was sent yet
+            connection.send(RuntimeError(f"The result of {method} can't be sent: {results!r} ({e})"))
+
+    engine.dispose()
+    connection.close()
+
+
+class ProcessShard:
+    """
+    A shard of a ShardedParkingLot that runs an AutomatedParkingLot in its own process, with its own db. The
+    parked vehicles stay in the process of the shard, and the slots it returns are detached copies.
+    """
+    def __init__(self, parking_map, db_url: str, num_of_entrypoints=3):
+        """
+        Constructor for the ProcessShard class
+
+        :param parking_map: the parking map dictionary or the CompiledParkingMap object of the shard
+        :param db_url: the url of the db of the shard, e.g. sqlite:///level_1.db
+        :param num_of_entrypoints: the minimum number of entrypoints for the parking lot
+        """
+        if not isinstance(parking_map, CompiledParkingMap):
+            parking_map = compile_parking_map(parking_map, num_of_entrypoints)
+
+        self.parking_map = parking_map
+
+        context = multiprocessing.get_context("spawn")
+        self._connection, child_connection = context.Pipe()
+        self._process = context.Process(target=_serve_shard,
+                                        args=(child_connection, parking_map, db_url, num_of_entrypoints),
+                                        daemon=True)
+        self._process.start()
+        child_connection.close()
+
+    def send(self, method: str, *args):
+        self._connection.send((method, args))
+
+    def receive(self):
+        return self._connection.recv()
+
+    def _call(self, method: str, *args):
+        """
+        Calls a method of the shard and waits for its result
+        :param method: the name of the method
+        :param args: the arguments of the method
+        :return: the result of the method, whose exception is raised again here
+        """
+        self.send(method, *args)
+        result = self.receive()
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def occupied_slots(self):
+        return self._call("occupied_slots")
+
+    def park_vehicles(self, batch: list):
+        return self._call("park_vehicles", batch)
+
+    def unpark_vehicles(self, batch: list):
+        return self._call("unpark_vehicles", batch)
+
+    def close(self):
+        """
+        Stops the process of the shard
+        :return:
+        """
+        if not self._process.is_alive():
+            return
+
+        self._connection.send(("close", ()))
+        self._process.join()
+        self._connection.close()
+
+
+class PlateLocation:
+    """
+    The shard and slot of a vehicle of a ShardedParkingLot, kept while the vehicle is parked and within the
+    continuous window after it exits
+    """
+    def __init__(self, license_plate: str, shard_id: int, slot_id: int):
+        self.license_plate = license_plate
+        self.shard_id = shard_id
+        self.slot_id = slot_id
+        self.date_of_exit = None
+
+
+class ShardedParkingLot(ParkingLot):
+    """
+    A parking lot made of several shards, e.g. the levels or zones of a garage, that are AutomatedParkingLot
+    objects with their own slots and db. An arriving vehicle is routed to the shard with the nearest available
+    slot from its entrypoint, and a leaving vehicle to the shard it is parked in. The shards can run in their own
+    processes, in which case the batches of vehicles are served by all the shards at once.
+
+    The coordinator keeps a SlotIndex of the free slots of every shard, so it can route a vehicle without asking
+    the shards, and a plate -> shard index of the vehicles. A vehicle that comes back within the continuous window
+    is routed to its previous shard when it has a slot for it, so it keeps the continuous rate.
+    """
+    def __init__(self, shards: list, shard_distances: list = None):
+        """
+        Constructor for the ShardedParkingLot class
+
+        :param shards: the list of the LocalShard or ProcessShard objects, all with the same entrypoints
+        :param shard_distances: the list of tuples of the distance from every entrypoint to every shard that is
+        added to the distances of its slots, e.g. the ramps to the upper levels. Defaults to 0.
+        """
+        if not shards:
+            raise ValueError("A sharded parking lot needs at least one shard.")
+
+        entrypoints = shards[0].parking_map.entrypoints
+
+        if any(shard.parking_map.entrypoints != entrypoints for shard in shards):
+            raise ValueError("The shards must have the same entrypoints.")
+
+        if shard_distances is None:
+            shard_distances = [(0,) * shards[0].parking_map.num_of_distances] * len(shards)
+
+        if len(shard_distances) != len(shards):
+            raise ValueError("Number of shards and shard distances do not match.")
+
+        self._shards = shards
+        self._shard_distances = shard_distances
+        self._entrypoints = entrypoints
+        self._slot_indexes = [SlotIndex(shard.parking_map) for shard in shards]
+        self._locations = VehicleRegistry()
+
+        for shard_id, shard in enumerate(shards):
+            for slot_id, license_plate in shard.occupied_slots():
+                self._slot_indexes[shard_id].occupy(slot_id)
+                self._locations.add(PlateLocation(license_plate, shard_id, slot_id))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def shards(self):
+        return self._shards
+
+    def close(self):
+        """
+        Stops the shards that run in their own processes
+        :return:
+        """
+        for shard in self._shards:
+            shard.close()
+
+    def _find_nearest_slot(self, vehicle: ParkingVehicle, entrypoint: EntryPoint, date_of_entry: datetime):
+        """
+        Finds the shard and the slot for an arriving vehicle
+        :param vehicle: the ParkingVehicle object
+        :param entrypoint: the entrypoint where the vehicle came in
+        :param date_of_entry: the date the vehicle came into the parking lot
+        :return: the (shard id, slot id) tuple of the nearest available slot
+        """
+        if not isinstance(vehicle, ParkingVehicle):
+            raise VehicleIsNotAParkingVehicleObject("The vehicle is not a ParkingVehicle object.")
+
+        if entrypoint not in self._entrypoints:
+            raise InvalidEntryPoint("Invalid entrypoint")
+
+        self._locations.evict(date_of_entry)
+        location = self._locations.get(vehicle.license_plate)
+
+        if location is not None and location.date_of_exit is None:
+            raise VehicleAlreadyParked("The vehicle is already in the parking lot.")
+
+        if location is not None:  # came back within the continuous window, try its previous shard first
+            slot_id = self._slot_indexes[location.shard_id].find_nearest(vehicle.size, entrypoint)
+
+            if slot_id is not None:
+                return location.shard_id, slot_id
+
+        nearest = None
+
+        for shard_id, slot_index in enumerate(self._slot_indexes):
+            slot_id = slot_index.find_nearest(vehicle.size, entrypoint)
+
+            if slot_id is None:
+                continue
+
+            distance = (self._shard_distances[shard_id][entrypoint.value] +
+                        self._shards[shard_id].parking_map.distances[entrypoint.value, slot_id].item())
+
+            if nearest is None or (distance, shard_id) < nearest[0]:
+                nearest = ((distance, shard_id), slot_id)
+
+        if nearest is None:
+            raise NoMoreAvailableSpot("No more available parking slot for the vehicle.")
+
+        return nearest[0][1], nearest[1]
+
+    def _route_parks(self, batch: list):
+        """
+        Routes a batch of arriving vehicles to the shards and reserves their slots in the coordinator
+        :param batch: a list of (ParkingVehicle object, entrypoint, date of entry) tuples
+        :return: the list of the (shard id, slot id, previous PlateLocation object) tuple, or the raised
+        exception, of every item of the batch
+        """
+        routes = []
+
+        for vehicle, entrypoint, date_of_entry in batch:
+            try:
+                shard_id, slot_id = self._find_nearest_slot(vehicle, entrypoint, date_of_entry)
+            except (ParkingLotException, ValueError) as e:
+                routes.append(e)
+                continue
+
+            previous_location = self._locations.get(vehicle.license_plate)
+            self._slot_indexes[shard_id].occupy(slot_id)
+            self._locations.add(PlateLocation(vehicle.license_plate, shard_id, slot_id))
+            routes.append((shard_id, slot_id, previous_location))
+
+        return routes
+
+    def _call_shards(self, method: str, routes: list, batch: list):
+        """
+        Sends the items of a batch to their shards, all the shards at once, and collects their results
+        :param method: the name of the method of the shards, park_vehicles or unpark_vehicles
+        :param routes: the list of the route, starting with the shard id, or the exception of every item of the
+        batch
+        :param batch: the batch
+        :return: the list of the result, or the exception, of every item of the batch, and the first exception
+        raised by a shard, or None. The items of a shard that raised an exception get that exception, as the shard
+        rolled back all of them.
+        """
+        shard_batches = {}
+
+        for i, route in enumerate(routes):
+            if not isinstance(route, Exception):
+                shard_batches.setdefault(route[0], []).append(i)
+
+        for shard_id, items in shard_batches.items():
+            self._shards[shard_id].send(method, [batch[i] for i in items])
+
+        results = list(routes)
+        error = None
+
+        for shard_id, items in shard_batches.items():  # receive from every shard, even after one has failed
+            shard_results = self._shards[shard_id].receive()
+
+            if isinstance(shard_results, Exception):
+                error = error or shard_results
+                shard_results = [shard_results] * len(items)
+
+            for i, result in zip(items, shard_results):
+                results[i] = result
+
+        return results, error
+
+    def park_vehicles(self, batch: list):
+        """
+        A function that parks a batch of vehicles in order. Every shard commits its vehicles in a single
+        transaction, and the shards serve their vehicles at the same time.
+        :param batch: a list of (ParkingVehicle object, entrypoint, date of entry) tuples
+        :return: a list with the assigned ParkingSlot object, or the raised exception, for every item of
+        the batch. An exception raised by a shard itself, e.g. a db error, is raised once the reservations of the
+        vehicles of that shard are undone.
+        """
+        routes = self._route_parks(batch)
+        results, error = self._call_shards("park_vehicles", routes, batch)
+
+        for (vehicle, _, _), route, result in zip(batch, routes, results):
+            if isinstance(route, Exception):
+                continue
+
+            shard_id, slot_id, previous_location = route
+
+            if isinstance(result, Exception):  # the shard didn't park the vehicle, undo the reservation
+                self._slot_indexes[shard_id].release(slot_id)
+
+                if previous_location is None:
+                    self._locations.remove(vehicle.license_plate)
+                else:
+                    self._locations.add(previous_location)
+            elif result.slot_id != slot_id:  # the shard chose another slot, follow it
+                self._slot_indexes[shard_id].release(slot_id)
+                self._slot_indexes[shard_id].occupy(result.slot_id)
+                self._locations.get(vehicle.license_plate).slot_id = result.slot_id
+
+        if error is not None:
+            raise error
+
+        return results
+
+    def unpark_vehicles(self, batch: list):
+        """
+        A function that unparks a batch of vehicles in order. Every shard commits its vehicles in a single
+        transaction, and the shards serve their vehicles at the same time.
+        :param batch: a list of (Vehicle object, date of exit) tuples
+        :return: a list with the total parking fee, or the raised exception, for every item of the batch. An
+        exception raised by a shard itself, e.g. a db error, is raised once the vehicles of the other shards are
+        unparked.
+        """
+        routes = []
+
+        for vehicle, date_of_exit in batch:
+            self._locations.evict(date_of_exit)
+            location = self._locations.get(vehicle.license_plate)
+
+            if location is None or location.date_of_exit is not None:
+                routes.append(VehicleNotParked("The vehicle being unparked is currently not parked in a "
+                                               "parking slot."))
+            else:
+                routes.append((location.shard_id, location.slot_id))
+
+        results, error = self._call_shards("unpark_vehicles", routes, batch)
+
+        for (vehicle, date_of_exit), route, result in zip(batch, routes, results):
+            if isinstance(route, Exception) or isinstance(result, Exception):
+                continue
+
+            shard_id, slot_id = route
+            location = self._locations.get(vehicle.license_plate)
+            location.date_of_exit = date_of_exit
+            self._locations.exit(location)
+            self._slot_indexes[shard_id].release(slot_id)
+
+        if error is not None:
+            raise error
+
+        return results
+
+    def park_vehicle(self, vehicle: ParkingVehicle, entrypoint: EntryPoint = EntryPoint.A,
+                     date_of_entry: datetime = datetime.now()):
+        """
+        A function that parks a vehicle object to the nearest parking spot of all the shards
+        :param vehicle: the ParkingVehicle object
+        :param entrypoint: the entrypoint where the vehicle came in
+        :param date_of_entry: the date the vehicle came into the parking lot
+        :return: the assigned ParkingSlot object for the vehicle
+        """
+        result = self.park_vehicles([(vehicle, entrypoint, date_of_entry)])[0]
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def unpark_vehicle(self, vehicle: Vehicle, date_of_exit: datetime = datetime.now()):
+        """
+        A function that unparks a vehicle object from the shard it is parked in
+        :param vehicle: the Vehicle object
+        :param date_of_exit: the date the vehicle left the parking slot
+        :return: the total parking fee for the vehicle
+        """
+        result = self.unpark_vehicles([(vehicle, date_of_exit)])[0]
+
+        if isinstance(result, Exception):
+            raise result
+
+        return result
+
+    def shard_of(self, license_plate: str):
+        """
+        Gets the shard a vehicle is parked in
+        :param license_plate: the license plate of the vehicle
+        :return: the id of the shard, or None if the vehicle is not parked
+        """
+        location = self._locations.get(license_plate)
+
+        return location.shard_id if location is not None and location.date_of_exit is None else None
@@ -0,0 +1,134 @@
+from src.parking_lot import AutomatedParkingLot
+from src.parking_slot import ParkingSlot
+from src.compiled_parking_map import CompiledParkingMap
+from src.fee_calculator import ParkingFeeCalculator
+from src.event_stream import apply_events
+from src.db import Base, create_db_engine
+from src.exceptions import *
+from src.enums import Rates, Direction
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from itertools import product, repeat
+
+import multiprocessing
+import os
+
+Scenario = namedtuple("Scenario", ["name", "parking_map", "flat_rate", "hourly_rates", "day_over_rate"],
+                      defaults=[40, None, Rates.DAY_OVER.value])
+SimulationResult = namedtuple("SimulationResult", ["scenario", "revenue", "num_of_parked", "num_of_rejections",
+                                                   "num_of_errors", "mean_distances", "occupancy"])
+
+IN_MEMORY_DB_URL = "sqlite://"
+
+_trace = None  # the trace of the worker processes of run_scenarios
+
+
+def scenario_grid(parking_maps: dict, flat_rates: list = (40,), rate_tables: dict = None):
+    """
+    Makes the scenarios of every combination of parking map, flat rate and rate table
+    :param parking_maps: a dictionary of the parking maps by name
+    :param flat_rates: the list of the flat rates
+    :param rate_tables: a dictionary of the hourly rates for each slot Size by name, defaults to the Rates enum
+    :return: the list of the Scenario objects, named after their parking map, flat rate and rate table
+    """
+    if rate_tables is None:
+        rate_tables = {"default": None}
+
+    return [Scenario(f"{map_name}/flat_rate={flat_rate}/{rates_name}", parking_map, flat_rate, hourly_rates)
+            for (map_name, parking_map), flat_rate, (rates_name, hourly_rates)
+            in product(parking_maps.items(), flat_rates, rate_tables.items())]
+
+
+def simulate(scenario: Scenario, trace, occupancy_interval: timedelta = timedelta(hours=1), batch_size=10000):
+    """
+    Replays a trace of gate events in an empty parking lot with the layout and rates of a scenario. The parking
+    lot uses its own in-memory db.
+    :param scenario: the Scenario object
+    :param trace: the iterable of the GateEvent objects in timestamp order
+    :param occupancy_interval: the time between the samples of the number of parked vehicles
+    :param batch_size: the number of events committed together
+    :return: the SimulationResult object of the scenario
+    """
+    if isinstance(scenario.parking_map, CompiledParkingMap):
+        num_of_entrypoints = scenario.parking_map.num_of_distances
+    else:
+        num_of_entrypoints = len(scenario.parking_map["distances"][0])
+
+    engine = create_db_engine(IN_MEMORY_DB_URL)
+    Base.metadata.create_all(engine)
+
+    fee_calculator = ParkingFeeCalculator(scenario.flat_rate, scenario.hourly_rates, scenario.day_over_rate)
+    parking_lot = AutomatedParkingLot(scenario.parking_map, num_of_entrypoints, fee_calculator=fee_calculator,
+                                      engine=engine)
+
+    revenue = num_of_parked = num_of_rejections = num_of_errors = occupied = 0
+    total_distances = {}
+    num_of_arrivals = {}
+    occupancy = []
+    next_sample = None
+
+    for event, result in apply_events(parking_lot, trace, batch_size):
+        if event is None:
+            num_of_errors += 1
+            continue
+
+        if next_sample is None:
+            next_sample = event.timestamp
+
+        while event.timestamp >= next_sample:  # the samples are taken before the events at their time
+            occupancy.append((next_sample, occupied))
+            next_sample += occupancy_interval
+
+        if isinstance(result, NoMoreAvailableSpot):
+            num_of_rejections += 1
+        elif isinstance(result, Exception):
+            num_of_errors += 1
+        elif isinstance(result, ParkingSlot):
+            entrypoint = event.entrypoint.name
+            total_distances[entrypoint] = total_distances.get(entrypoint, 0) + result.distances[event.entrypoint.value]
+            num_of_arrivals[entrypoint] = num_of_arrivals.get(entrypoint, 0) + 1
+            num_of_parked += 1
+            occupied += 1
+        elif event.direction == Direction.OUT:
+            revenue += result
+            occupied -= 1
+
+    parking_lot._session.close()
+    engine.dispose()
+
+    mean_distances = {entrypoint: total_distances[entrypoint] / num_of_arrivals[entrypoint]
+                      for entrypoint in sorted(total_distances)}
+
+    return SimulationResult(scenario.name, revenue, num_of_parked, num_of_rejections, num_of_errors,
+                            mean_distances, occupancy)
+
+
+def _load_trace(trace: list):
+    global _trace
+    _trace = trace
+
+
+def _simulate_loaded_trace(scenario: Scenario, occupancy_interval: timedelta):
+    return simulate(scenario, _trace, occupancy_interval)
+
+
+def run_scenarios(trace, scenarios: list, occupancy_interval: timedelta = timedelta(hours=1), max_workers=None):
+    """
+    Replays a trace of gate events against every scenario, each in its own process with its own in-memory db,
+    so the scenarios run on all the cores and the db of the parking lot is never used
+    :param trace: the iterable of the GateEvent objects, e.g. from read_events. The events are sorted by
+    timestamp and the invalid events are skipped.
+    :param scenarios: the list of the Scenario objects
+    :param occupancy_interval: the time between the samples of the number of parked vehicles
+    :param max_workers: the maximum number of processes, defaults to the number of cores
+    :return: the list of the SimulationResult object of every scenario, in the order of the scenarios
+    """
+    trace = sorted((event for event in trace if not isinstance(event, Exception)), key=lambda event: event.timestamp)
+    max_workers = min(max_workers or os.cpu_count(), len(scenarios)) or 1
+
+    # the trace is sent once to every process instead of once with every scenario
+    with ProcessPoolExecutor(max_workers, mp_context=multiprocessing.get_context("spawn"), initializer=_load_trace,
+                             initargs=(trace,)) as executor:
+        return list(executor.map(_simulate_loaded_trace, scenarios, repeat(occupancy_interval)))
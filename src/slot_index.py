@@ -0,0 +1,174 @@
+from src.compiled_parking_map import CompiledParkingMap
+from src.enums import Size, EntryPoint
+
+import heapq
+import threading
+
+
+class SlotIndex:
+    """
+    An index of the free parking slots of a parking lot. For every entrypoint and every slot size it walks the
+    slots of the compiled parking map in their order of (distance from the entrypoint, slot id) with a cursor
+    that skips the occupied slots. The slots that are released behind the cursor are kept in a min-heap of
+    (distance, slot size, slot id), which is the same order the parking lot uses to pick the nearest slot.
+    Nothing is built per slot, so the index of a memory-mapped parking map is ready at once.
+    """
+    def __init__(self, parking_map: CompiledParkingMap):
+        """
+        Constructor for the SlotIndex class
+
+        :param parking_map: the CompiledParkingMap object of the parking lot
+        """
+        num_of_slots = parking_map.num_of_slots
+
+        self.entrypoints = parking_map.entrypoints
+        self._slot_sizes = parking_map.sizes.data  # memoryviews, indexing them gives python ints
+        self._free = bytearray(b"\x01") * num_of_slots
+        self._orderings = {}
+        self._distances = {}
+        self._cursors = {}
+        self._released = {}
+        self._queued = {}  # marks the slots that currently have an entry in the released heaps of an entrypoint
+
+        for entrypoint in parking_map.entrypoints:
+            self._orderings[entrypoint] = {size: parking_map.ordering(entrypoint, size).data for size in Size}
+            self._distances[entrypoint] = parking_map.distances[entrypoint.value].data
+            self._cursors[entrypoint] = {size: 0 for size in Size}
+            self._released[entrypoint] = {size: [] for size in Size}
+            self._queued[entrypoint] = bytearray(num_of_slots)
+
+    def is_free(self, slot_id: int):
+        return bool(self._free[slot_id])
+
+    def occupy(self, slot_id: int):
+        """
+        Marks a slot as occupied. The slot is skipped lazily the next time it is reached.
+        :param slot_id: the id of the occupied slot
+        :return:
+        """
+        self._free[slot_id] = 0
+
+    def claim(self, slot_id: int):
+        """
+        Marks a slot as occupied if it is still free
+        :param slot_id: the id of the slot
+        :return: True if the slot was free and is now occupied, False otherwise
+        """
+        if not self._free[slot_id]:
+            return False
+
+        self.occupy(slot_id)
+
+        return True
+
+    def release(self, slot_id: int):
+        """
+        Marks a slot as free and pushes it to the released heaps of the entrypoints whose cursor passed it
+        :param slot_id: the id of the released slot
+        :return:
+        """
+        if self._free[slot_id]:
+            return
+
+        self._free[slot_id] = 1
+        size_value = self._slot_sizes[slot_id]
+        size = Size(size_value)
+
+        for entrypoint, orderings in self._orderings.items():
+            queued = self._queued[entrypoint]
+
+            if queued[slot_id]:  # the old entry is still in the heap and is valid again
+                continue
+
+            distances = self._distances[entrypoint]
+            ordering = orderings[size]
+            cursor = self._cursors[entrypoint][size]
+            entry = (distances[slot_id], size_value, slot_id)
+
+            # the slots from the cursor on are still ahead and will be reached by the cursor
+            if cursor < len(ordering) and entry >= (distances[ordering[cursor]], size_value, ordering[cursor]):
+                continue
+
+            heapq.heappush(self._released[entrypoint][size], entry)
+            queued[slot_id] = 1
+
+    def peek(self, size: Size, entrypoint: EntryPoint):
+        """
+        Gets the nearest free slot of the given size from the entrypoint
+        :param size: the size of the slot
+        :param entrypoint: the entry point of the vehicle to the parking lot
+        :return: the (distance, size value, slot id) tuple of the nearest free slot, or None if there is no free
+        slot of the given size
+        """
+        free = self._free
+        ordering = self._orderings[entrypoint][size]
+        cursors = self._cursors[entrypoint]
+        cursor = cursors[size]
+
+        while cursor < len(ordering) and not free[ordering[cursor]]:
+            cursor += 1
+
+        cursors[size] = cursor
+
+        heap = self._released[entrypoint][size]
+        queued = self._queued[entrypoint]
+
+        while heap and not free[heap[0][2]]:  # drop the slots that were occupied since they were released
+            queued[heapq.heappop(heap)[2]] = 0
+
+        nearest = heap[0] if heap else None
+
+        if cursor < len(ordering):
+            slot_id = ordering[cursor]
+            candidate = (self._distances[entrypoint][slot_id], size.value, slot_id)
+
+            if nearest is None or candidate < nearest:
+                nearest = candidate
+
+        return nearest
+
+    def find_nearest(self, vehicle_size: Size, entrypoint: EntryPoint):
+        """
+        Finds the nearest free slot from the entrypoint that can fit a vehicle of the given size
+        :param vehicle_size: the size of the vehicle
+        :param entrypoint: the entry point of the vehicle to the parking lot
+        :return: the id of the nearest free slot, or None if there is no slot available
+        """
+        nearest = None
+
+        for size in Size:
+            if size.value < vehicle_size.value:
+                continue
+
+            candidate = self.peek(size, entrypoint)
+
+            if candidate is not None and (nearest is None or candidate < nearest):
+                nearest = candidate
+
+        return nearest[2] if nearest is not None else None
+
+
+class SynchronizedSlotIndex(SlotIndex):
+    """
+    A SlotIndex that can be shared by many threads. The cursors and heaps of every slot size are guarded by
+    their own lock, so vehicles looking for slots of different sizes don't block each other.
+    """
+    def __init__(self, parking_map: CompiledParkingMap):
+        super().__init__(parking_map)
+        self._locks = {size: threading.RLock() for size in Size}
+
+    def occupy(self, slot_id: int):
+        with self._locks[Size(self._slot_sizes[slot_id])]:
+            super().occupy(slot_id)
+
+    def claim(self, slot_id: int):
+        with self._locks[Size(self._slot_sizes[slot_id])]:
+            return super().claim(slot_id)
+
+    def release(self, slot_id: int):
+        with self._locks[Size(self._slot_sizes[slot_id])]:
+            super().release(slot_id)
+
+    def peek(self, size: Size, entrypoint: EntryPoint):
+        with self._locks[size]:
+            return super().peek(size, entrypoint)
@@ -0,0 +1,228 @@
+from src.compiled_parking_map import CompiledParkingMap
+from src.enums import Size
+
+from collections.abc import Sequence
+
+import threading
+
+import numpy as np
+
+SIZES_BY_VALUE = {size.value: size for size in Size}
+
+
+class SlotStore:
+    """
+    A columnar store of the parking slots of a parking lot. The slot sizes and the occupancy are kept in arrays,
+    the distances in one entrypoint x slot matrix, and the license plates of the parked vehicles in a parallel
+    list, so describing a large parking lot doesn't need a ParkingSlot object per slot. The number of occupied
+    slots of every zone and size is counted as slots are occupied and released, so it is read without a scan. The
+    zone of a slot is its nearest entrypoint.
+    """
+    def __init__(self, parking_map: CompiledParkingMap):
+        """
+        Constructor for the SlotStore class
+
+        :param parking_map: the CompiledParkingMap object of the parking lot, whose arrays are shared
+        """
+        num_of_slots = parking_map.num_of_slots
+
+        self.sizes = parking_map.sizes
+        self.distances = parking_map.distances
+        self.occupied = np.zeros(num_of_slots, dtype=bool)
+        self.plates = [None] * num_of_slots
+        self.zones = np.argmin(self.distances, axis=0).astype(np.int8)
+
+        # the slot counts by zone and Size value, as lists of python ints that are cheap to update one at a time
+        minlength = max(SIZES_BY_VALUE) + 1
+        self._slot_counts = [np.bincount(self.sizes[self.zones == zone], minlength=minlength).tolist()
+                             for zone in range(parking_map.num_of_distances)]
+        self._occupied_counts = [[0] * minlength for _ in range(parking_map.num_of_distances)]
+        self._reserved = bytearray(num_of_slots)
+        self._reserved_counts = [[0] * minlength for _ in range(parking_map.num_of_distances)]
+
+    def __len__(self):
+        return len(self.plates)
+
+    def size(self, slot_id: int):
+        return SIZES_BY_VALUE[int(self.sizes[slot_id])]
+
+    def slot_distances(self, slot_id: int):
+        """
+        Gets the distances of a slot from the entrypoints
+        :param slot_id: the id of the slot
+        :return: the tuple of the distances of the slot from every entrypoint
+        """
+        return tuple(self.distances[:, slot_id].tolist())
+
+    def is_empty(self, slot_id: int):
+        return not self.occupied[slot_id]
+
+    def plate(self, slot_id: int):
+        """
+        Gets the license plate of the vehicle parked in a slot
+        :param slot_id: the id of the slot
+        :return: the license plate, or None if the slot is empty
+        """
+        return self.plates[slot_id]
+
+    def occupy(self, slot_id: int, license_plate: str):
+        """
+        Marks a slot as occupied by a vehicle
+        :param slot_id: the id of the slot
+        :param license_plate: the license plate of the vehicle
+        :return:
+        """
+        if not self.occupied[slot_id]:
+            self._occupied_counts[self.zones[slot_id]][self.sizes[slot_id]] += 1
+
+        self.occupied[slot_id] = True
+        self.plates[slot_id] = license_plate
+
+    def release(self, slot_id: int):
+        """
+        Marks a slot as empty
+        :param slot_id: the id of the slot
+        :return:
+        """
+        if self.occupied[slot_id]:
+            self._occupied_counts[self.zones[slot_id]][self.sizes[slot_id]] -= 1
+
+        self.occupied[slot_id] = False
+        self.plates[slot_id] = None
+
+    def reserve(self, slot_id: int):
+        """
+        Marks an empty slot as held by a reservation
+        :param slot_id: the id of the slot
+        :return:
+        """
+        if not self._reserved[slot_id]:
+            self._reserved[slot_id] = 1
+            self._reserved_counts[self.zones[slot_id]][self.sizes[slot_id]] += 1
+
+    def unreserve(self, slot_id: int):
+        """
+        Marks a slot as no longer held by a reservation
+        :param slot_id: the id of the slot
+        :return:
+        """
+        if self._reserved[slot_id]:
+            self._reserved[slot_id] = 0
+            self._reserved_counts[self.zones[slot_id]][self.sizes[slot_id]] -= 1
+
+    def occupied_slot_ids(self):
+        """
+        Gets the ids of the occupied slots
+        :return: the array of the ids of the occupied slots in ascending order
+        """
+        return np.flatnonzero(self.occupied)
+
+    def occupancy(self, zone: int = None):
+        """
+        Gets the number of slots and of occupied slots of every size from the counters
+        :param zone: the value of the entrypoint of the zone, defaults to all the zones
+        :return: a dictionary of the (number of slots, number of occupied slots) tuple of every Size
+        """
+        zones = range(len(self._slot_counts)) if zone is None else [zone]
+
+        return {size: (sum(self._slot_counts[zone][size.value] for zone in zones),
+                       sum(self._occupied_counts[zone][size.value] for zone in zones)) for size in Size}
+
+    def reserved(self, zone: int = None):
+        """
+        Gets the number of slots held by reservations of every size from the counters
+        :param zone: the value of the entrypoint of the zone, defaults to all the zones
+        :return: a dictionary of the number of reserved slots of every Size
+        """
+        zones = range(len(self._reserved_counts)) if zone is None else [zone]
+
+        return {size: sum(self._reserved_counts[zone][size.value] for zone in zones) for size in Size}
+
+    def load(self, zone: int):
+        """
+        Gets the share of the slots of a zone that are occupied or reserved from the counters
+        :param zone: the value of the entrypoint of the zone
+        :return: the share from 0 to 1, 1 for a zone without slots
+        """
+        num_of_slots = sum(self._slot_counts[zone])
+
+        if not num_of_slots:
+            return 1
+
+        return (sum(self._occupied_counts[zone]) + sum(self._reserved_counts[zone])) / num_of_slots
+
+
+class SynchronizedSlotStore(SlotStore):
+    """
+    A SlotStore that can be updated by many threads, so the counters of the occupied slots stay exact
+    """
+    def __init__(self, parking_map: CompiledParkingMap):
+        super().__init__(parking_map)
+        self._lock = threading.Lock()
+
+    def occupy(self, slot_id: int, license_plate: str):
+        with self._lock:
+            super().occupy(slot_id, license_plate)
+
+    def release(self, slot_id: int):
+        with self._lock:
+            super().release(slot_id)
+
+    def reserve(self, slot_id: int):
+        with self._lock:
+            super().reserve(slot_id)
+
+    def unreserve(self, slot_id: int):
+        with self._lock:
+            super().unreserve(slot_id)
+
+    def occupancy(self, zone: int = None):
+        with self._lock:
+            return super().occupancy(zone)
+
+    def reserved(self, zone: int = None):
+        with self._lock:
+            return super().reserved(zone)
+
+    def load(self, zone: int):
+        with self._lock:
+            return super().load(zone)
+
+
+class ParkingSlotsView(Sequence):
+    """
+    A read-only sequence of the ParkingSlot objects of a SlotStore. The occupied slots are the ParkingSlot rows
+    stored in the db, and the empty slots are new ParkingSlot objects made when they are accessed.
+    """
+    def __init__(self, slot_store: SlotStore, get_occupied_slot):
+        """
+        Constructor for the ParkingSlotsView class
+
+        :param slot_store: the SlotStore object
+        :param get_occupied_slot: the callable that gets the ParkingSlot row of an occupied slot from its id
+        """
+        self._slot_store = slot_store
+        self._get_occupied_slot = get_occupied_slot
+
+    def __len__(self):
+        return len(self._slot_store)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[slot_id] for slot_id in range(*index.indices(len(self)))]
+
+        if index < 0:
+            index += len(self)
+
+        if not 0 <= index < len(self):
+            raise IndexError("Parking slot index out of range")
+
+        if not self._slot_store.is_empty(index):
+            slot = self._get_occupied_slot(index)
+
+            if slot is not None:
+                return slot
+
+        from src.parking_slot import ParkingSlot  # the db models are only imported once a slot is viewed
+
+        return ParkingSlot(index, self._slot_store.size(index), self._slot_store.slot_distances(index))
@@ -0,0 +1,232 @@
+from src.parking_slot import ParkingSlot
+from src.vehicles import Vehicle, ParkingVehicle
+from src.visits import Visit, HourlyVisitStats, DailyVisitStats
+from src.enums import Hours
+
+from sqlalchemy import Table, Column, MetaData, Index, func, select, union_all, inspect
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+HISTORY_TABLE_PREFIX = "visits_"
+
+_history_metadata = MetaData()  # the partitions are created on demand, not by Base.metadata.create_all
+
+
+def partition_name(date: datetime):
+    """
+    Gets the name of the history partition of a month
+    :param date: a date of the month
+    :return: the name of the table, e.g. visits_2022_09
+    """
+    return f"{HISTORY_TABLE_PREFIX}{date.year:04d}_{date.month:02d}"
+
+
+def history_partition(date: datetime):
+    """
+    Gets the history partition of a month. It has the columns and the primary key of the visits table, and holds
+    the visits that ended in that month.
+    :param date: a date of the month
+    :return: the Table object of the partition
+    """
+    name = partition_name(date)
+
+    if name in _history_metadata.tables:
+        return _history_metadata.tables[name]
+
+    columns = [Column(column.name, column.type, primary_key=column.primary_key) for column in Visit.__table__.columns]
+
+    return Table(name, _history_metadata, *columns,
+                 Index(f"ix_{name}_license_plate_date_of_exit", "license_plate", "date_of_exit"))
+
+
+def _month_start(date: datetime):
+    return datetime(date.year, date.month, 1)
+
+
+def _next_month(date: datetime):
+    return datetime(date.year + date.month // 12, date.month % 12 + 1, 1)
+
+
+class VehicleArchive:
+    """
+    Keeps the vehicles table to the active sessions, the parked and recently exited vehicles, and the visits table
+    to the visits of the continuous window. The rows of the vehicles that left before the continuous window are
+    deleted, as their visits are already in the visits table, and the older visits are moved to a partition of the
+    visits per month of their date of exit. Neither table then grows with the history, and old months can be
+    dropped, or moved to cheaper storage, a partition at a time.
+    """
+    def __init__(self):
+        self._created_partitions = set()  # the partitions known to exist, so they are only looked up once
+
+    def forget_partitions(self):
+        """
+        Forgets the partitions that were created, e.g. after a rollback that may have undone their creation
+        :return:
+        """
+        self._created_partitions.clear()
+
+    def _partition(self, session: Session, date: datetime):
+        """
+        Gets the history partition of a month, creating its table if it doesn't exist yet
+        :param session: the db session the rows are moved in
+        :param date: a date of the month
+        :return: the Table object of the partition
+        """
+        partition = history_partition(date)
+
+        if partition.name not in self._created_partitions:
+            partition.create(session.connection(), checkfirst=True)
+            self._created_partitions.add(partition.name)
+
+        return partition
+
+    def _archive_visits(self, session: Session, cutoff: datetime):
+        """
+        Moves the visits that ended before a date from the visits table to the partitions of their months
+        :param session: the db session the rows are moved in
+        :param cutoff: the date
+        :return: the number of moved visits
+        """
+        visits = Visit.__table__
+        exited_before_cutoff = visits.c.date_of_exit < cutoff
+        first_exit = session.execute(select(func.min(visits.c.date_of_exit)).where(exited_before_cutoff)).scalar()
+
+        if first_exit is None:
+            return 0
+
+        num_of_moved = 0
+        month = _month_start(first_exit)
+
+        while month < cutoff:
+            condition = exited_before_cutoff & (visits.c.date_of_exit >= month) & \
+                        (visits.c.date_of_exit < _next_month(month))
+            partition = self._partition(session, month)
+            session.execute(partition.insert().from_select([column.name for column in visits.columns],
+                                                           select(visits).where(condition)))
+            num_of_moved += session.execute(visits.delete().where(condition)).rowcount
+            month = _next_month(month)
+
+        return num_of_moved
+
+    def archive_vehicles(self, session: Session, vehicles: list, cutoff: datetime):
+        """
+        Deletes the rows of vehicles that were evicted from the registry of a parking lot, and archives the visits
+        that ended before the continuous window. The rows must already be written to the db. A vehicle that came
+        back since is parked again and is left alone.
+        :param session: the db session of the parking lot, the rows are changed without committing them
+        :param vehicles: the list of the evicted ParkingVehicle objects
+        :param cutoff: the start of the continuous window, only the vehicles that exited before it are deleted
+        :return: the number of deleted rows
+        """
+        table = Vehicle.__table__
+        plates = [vehicle.license_plate for vehicle in vehicles]
+
+        with session.no_autoflush:
+            num_of_deleted = session.execute(table.delete().where(
+                (table.c.date_of_exit < cutoff) & table.c.license_plate.in_(plates))).rowcount
+            self._archive_visits(session, cutoff)
+
+        return num_of_deleted
+
+    def archive_before(self, session: Session, cutoff: datetime):
+        """
+        Deletes every vehicle of the vehicles table that exited before a date and archives the visits before it,
+        e.g. in the db of a parking lot that was used without an archive
+        :param session: the db session, the rows are changed without committing them
+        :param cutoff: the date, the vehicles that exited before it are deleted
+        :return: the number of deleted rows
+        """
+        table = Vehicle.__table__
+        exited_before_cutoff = table.c.date_of_exit < cutoff
+
+        with session.no_autoflush:
+            num_of_deleted = session.execute(table.delete().where(exited_before_cutoff)).rowcount
+            self._archive_visits(session, cutoff)
+
+        return num_of_deleted
+
+    @staticmethod
+    def partitions(bind):
+        """
+        Gets the names of the history partitions of a db
+        :param bind: the Engine or Connection of the db
+        :return: the sorted list of the table names, the oldest month first
+        """
+        return sorted(name for name in inspect(bind).get_table_names() if name.startswith(HISTORY_TABLE_PREFIX))
+
+    def history(self, engine, license_plate: str):
+        """
+        Gets the visits of a vehicle from the visits table and every partition
+        :param engine: the Engine of the db
+        :param license_plate: the license plate of the vehicle
+        :return: the list of the rows of the visits, ordered by date of exit
+        """
+        tables = [Visit.__table__] + [history_partition(datetime(int(name[-7:-3]), int(name[-2:]), 1))
+                                      for name in self.partitions(engine)]
+        visits = union_all(*[select(table).where(table.c.license_plate == license_plate)
+                             for table in tables]).subquery()
+
+        with engine.connect() as connection:
+            return connection.execute(select(visits).order_by(visits.c.date_of_exit)).all()
+
+    def drop_partition(self, bind, date: datetime):
+        """
+        Drops the history partition of a month, e.g. after exporting it
+        :param bind: the Engine or Connection of the db
+        :param date: a date of the month
+        :return:
+        """
+        partition = history_partition(date)
+        partition.drop(bind, checkfirst=True)
+        self._created_partitions.discard(partition.name)
+
+
+def _record_missing_visits(session: Session):
+    """
+    Appends to the visits table the last visits of the exited vehicles that have none, e.g. in a db created
+    before the visits table. Their slot and fee are not known, and the size of the vehicle stands for the size
+    of the slot.
+    :param session: the db session, the rows are appended without committing them
+    :return:
+    """
+    vehicles = Vehicle.__table__
+    visits = Visit.__table__
+    recorded = select(visits.c.visit_id).where((visits.c.license_plate == vehicles.c.license_plate) &
+                                               (visits.c.date_of_exit == vehicles.c.date_of_exit))
+    session.execute(visits.insert().from_select(
+        ["license_plate", "size", "date_of_entry", "date_of_exit"],
+        select(vehicles.c.license_plate, vehicles.c.size, vehicles.c.date_of_entry, vehicles.c.date_of_exit)
+        .where(vehicles.c.date_of_exit.isnot(None) & ~recorded.exists())))
+
+
+def migrate_schema(engine, vehicle_archive: VehicleArchive = None):
+    """
+    Migrates the db of a parking lot created before the archive: creates the missing tables, e.g. of the visits,
+    and the indexes of the license plates of the slots and of the dates of exit, records the visits of the exited
+    vehicles that have none, and archives the vehicles that left before the continuous window of the last exit
+    :param engine: the Engine of the db
+    :param vehicle_archive: the VehicleArchive object, defaults to a new one
+    :return: the number of archived vehicles
+    """
+    if vehicle_archive is None:
+        vehicle_archive = VehicleArchive()
+
+    for table in (Vehicle.__table__, ParkingSlot.__table__, Visit.__table__, HourlyVisitStats.__table__,
+                  DailyVisitStats.__table__):
+        table.create(engine, checkfirst=True)
+
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+    with Session(bind=engine) as session:
+        _record_missing_visits(session)
+        last_exit = session.execute(select(func.max(ParkingVehicle.date_of_exit))).scalar()
+
+        if last_exit is None:
+            return 0
+
+        num_of_archived = vehicle_archive.archive_before(
+            session, last_exit - timedelta(hours=Hours.WITHIN_CONTINUOUS.value))
+        session.commit()
+
+    return num_of_archived
@@ -0,0 +1,122 @@
+from src.enums import Hours
+
+from datetime import datetime, timedelta
+
+import heapq
+import threading
+
+
+class VehicleRegistry:
+    """
+    An in-memory registry of the vehicles of a parking lot keyed by their license plate. It holds the parked
+    vehicles and the vehicles that left recently enough to be charged the continuous rate if they come back.
+    """
+    def __init__(self, continuous_window: timedelta = timedelta(hours=Hours.WITHIN_CONTINUOUS.value)):
+        """
+        Constructor for the VehicleRegistry class
+
+        :param continuous_window: how long an exited vehicle is kept in the registry
+        """
+        self._continuous_window = continuous_window
+        self._vehicles = {}
+        self._exits = []  # min-heap of (date_of_exit, license_plate) of the exited vehicles
+
+    def __len__(self):
+        return len(self._vehicles)
+
+    def __contains__(self, license_plate: str):
+        return license_plate in self._vehicles
+
+    def get(self, license_plate: str):
+        """
+        Gets the vehicle with the given license plate
+        :param license_plate: the license plate of the vehicle
+        :return: the vehicle object, or None if the vehicle is not in the registry
+        """
+        return self._vehicles.get(license_plate)
+
+    def vehicles(self):
+        """
+        Gets the vehicles of the registry
+        :return: the list of the vehicle objects, the parked ones and the exited ones that were not evicted yet
+        """
+        return list(self._vehicles.values())
+
+    def add(self, vehicle):
+        """
+        Adds a vehicle to the registry, replacing the vehicle with the same license plate
+        :param vehicle: the ParkingVehicle object
+        :return:
+        """
+        self._vehicles[vehicle.license_plate] = vehicle
+
+    def remove(self, license_plate: str):
+        """
+        Removes the vehicle with the given license plate from the registry
+        :param license_plate: the license plate of the vehicle
+        :return:
+        """
+        self._vehicles.pop(license_plate, None)
+
+    def exit(self, vehicle):
+        """
+        Marks a vehicle of the registry as exited so it is evicted once it is outside the continuous window
+        :param vehicle: the ParkingVehicle object with its date of exit
+        :return:
+        """
+        heapq.heappush(self._exits, (vehicle.date_of_exit, vehicle.license_plate))
+
+    def evict(self, now: datetime):
+        """
+        Removes the vehicles that exited before the continuous window ending at the given date
+        :param now: the current date of the parking lot
+        :return: the list of the evicted vehicle objects
+        """
+        cutoff = now - self._continuous_window
+        evicted = []
+
+        while self._exits and self._exits[0][0] < cutoff:
+            date_of_exit, license_plate = heapq.heappop(self._exits)
+            vehicle = self._vehicles.get(license_plate)
+
+            # skip the vehicles that came back or exited again after this entry was pushed
+            if vehicle is None or vehicle.date_of_exit != date_of_exit:
+                continue
+
+            del self._vehicles[license_plate]
+            evicted.append(vehicle)
+
+        return evicted
+
+
+class SynchronizedVehicleRegistry(VehicleRegistry):
+    """
+    A VehicleRegistry that can be shared by many threads
+    """
+    def __init__(self, continuous_window: timedelta = timedelta(hours=Hours.WITHIN_CONTINUOUS.value)):
+        super().__init__(continuous_window)
+        self._lock = threading.Lock()
+
+    def get(self, license_plate: str):
+        with self._lock:
+            return super().get(license_plate)
+
+    def vehicles(self):
+        with self._lock:
+            return super().vehicles()
+
+    def add(self, vehicle):
+        with self._lock:
+            super().add(vehicle)
+
+    def remove(self, license_plate: str):
+        with self._lock:
+            super().remove(license_plate)
+
+    def exit(self, vehicle):
+        with self._lock:
+            super().exit(vehicle)
+
+    def evict(self, now: datetime):
+        with self._lock:
+            return super().evict(now)
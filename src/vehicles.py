@@ -29,7 +29,7 @@ class SizedVehicle(Vehicle):
 class ParkingVehicle(SizedVehicle):
     date_of_first_entry = Column(DateTime)
     date_of_entry = Column(DateTime)
-    date_of_exit = Column(DateTime, nullable=True)
+    date_of_exit = Column(DateTime, nullable=True, index=True)
     charge_flat_rate = Column(Boolean, default=True)
     #flat_rate_hours = Column(Integer, default=3)
     total_hours_stayed = Column(Float, default=0)
@@ -0,0 +1,221 @@
+from src.enums import Size
+from src.db import Base
+
+from sqlalchemy import Column, Integer, String, Enum, DateTime, Float, select, insert, update, bindparam, text
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+VisitReport = namedtuple("VisitReport", ["period_start", "size", "num_of_visits", "revenue", "mean_dwell_hours",
+                                         "mean_occupancy"])
+
+
+class Visit(Base):
+    """
+    Model class for the visits, a row is appended when a vehicle leaves and is never changed
+    """
+    __tablename__ = "visits"
+    visit_id = Column(Integer, primary_key=True)
+    license_plate = Column(String, index=True)
+    slot_id = Column(Integer)
+    size = Column(Enum(Size))  # the size of the slot
+    date_of_entry = Column(DateTime)
+    date_of_exit = Column(DateTime, index=True)
+    fee = Column(Float)
+
+
+class VisitStats:
+    """
+    The columns of the aggregates of the visits of a period by slot size. The visits, revenue and dwell time are
+    counted in the period of the exit, and the occupied hours of every period a visit overlaps.
+    """
+    period_start = Column(DateTime, primary_key=True)
+    size = Column(Enum(Size), primary_key=True)
+    num_of_visits = Column(Integer, default=0)
+    revenue = Column(Float, default=0)
+    dwell_hours = Column(Float, default=0)
+    occupied_hours = Column(Float, default=0)
+
+
+class HourlyVisitStats(VisitStats, Base):
+    __tablename__ = "hourly_visit_stats"
+
+
+class DailyVisitStats(VisitStats, Base):
+    __tablename__ = "daily_visit_stats"
+
+
+STATS_PERIODS = {HourlyVisitStats: timedelta(hours=1), DailyVisitStats: timedelta(days=1)}
+STATS_COLUMNS = ["num_of_visits", "revenue", "dwell_hours", "occupied_hours"]
+UPSERT_DIALECTS = {"sqlite", "postgresql"}  # the backends with INSERT ... ON CONFLICT DO UPDATE
+
+
+def _period_start(date: datetime, period: timedelta):
+    return datetime.min + (date - datetime.min) // period * period
+
+
+def _occupied_hours(date_of_entry: datetime, date_of_exit: datetime, period: timedelta):
+    """
+    Splits a stay over the periods it overlaps
+    :param date_of_entry: the date the vehicle came in
+    :param date_of_exit: the date the vehicle left
+    :param period: the length of the periods
+    :return: the generator of the (period start, hours of the stay in the period) tuples, up to the period of
+    the exit
+    """
+    period_start = _period_start(date_of_entry, period)
+
+    while True:
+        period_end = period_start + period
+        yield period_start, (min(date_of_exit, period_end) - max(date_of_entry, period_start)).total_seconds()/3600
+
+        if date_of_exit < period_end:
+            return
+
+        period_start = period_end
+
+
+class VisitStatistics:
+    """
+    Keeps the hourly and daily aggregates of the visits up to date. The visits of a transaction are added to the
+    aggregates with one statement per table, so the reports never scan the visits.
+    """
+    def __init__(self):
+        self._upserts = {}  # the upsert statements by table, they are only built once
+
+    @staticmethod
+    def _upsert_statement(table):
+        """
+        Builds the statement that adds the changes to a row of an aggregates table, or inserts the row. It is a
+        text statement, since the ON CONFLICT clause of the dialects is compiled again on every execution.
+        :param table: the Table object of the aggregates
+        :return: the TextClause object
+        """
+        columns = ["period_start", "size"] + STATS_COLUMNS
+        updates = ", ".join(f"{name} = {table.name}.{name} + excluded.{name}" for name in STATS_COLUMNS)
+
+        return text(f"INSERT INTO {table.name} ({', '.join(columns)}) "
+                    f"VALUES ({', '.join(':' + name for name in columns)}) "
+                    f"ON CONFLICT (period_start, size) DO UPDATE SET {updates}").bindparams(
+            *[bindparam(name, type_=table.c[name].type) for name in columns])
+
+    @staticmethod
+    def _deltas(visits: list):
+        """
+        Adds up the changes of the aggregates of visits
+        :param visits: the list of the Visit objects
+        :return: a dictionary of the [visits, revenue, dwell hours, occupied hours] lists by stats model and
+        (period start, size)
+        """
+        deltas = {model: {} for model in STATS_PERIODS}
+
+        for visit in visits:
+            dwell_hours = (visit.date_of_exit - visit.date_of_entry).total_seconds()/3600
+
+            for model, period in STATS_PERIODS.items():
+                for period_start, occupied_hours in _occupied_hours(visit.date_of_entry, visit.date_of_exit, period):
+                    delta = deltas[model].setdefault((period_start, visit.size), [0, 0, 0, 0])
+                    delta[3] += occupied_hours
+
+                # the last period is the period of the exit
+                delta[0] += 1
+                delta[1] += visit.fee
+                delta[2] += dwell_hours
+
+        return deltas
+
+    def _upsert(self, session, table, rows: list):
+        """
+        Adds the changes to the rows of an aggregates table in a single statement, so concurrent transactions
+        can't insert the same row twice
+        :param session: the db session
+        :param table: the Table object of the aggregates
+        :param rows: the list of the dictionaries of the period start, size and changes of every row
+        :return:
+        """
+        statement = self._upserts.get(table.name)
+
+        if statement is None:
+            statement = self._upserts[table.name] = self._upsert_statement(table)
+
+        session.connection().execute(statement, rows)
+
+    @staticmethod
+    def _update_or_insert(session, table, rows: list):
+        """
+        Adds the changes to the rows of an aggregates table that exist, and inserts the others
+        :param session: the db session
+        :param table: the Table object of the aggregates
+        :param rows: the list of the dictionaries of the period start, size and changes of every row
+        :return:
+        """
+        period_starts = [row["period_start"] for row in rows]
+        existing = set(map(tuple, session.execute(select(table.c.period_start, table.c.size).where(
+            table.c.period_start.between(min(period_starts), max(period_starts))))))
+        updated_rows = [{f"b_{name}": value for name, value in row.items()} for row in rows
+                        if (row["period_start"], row["size"]) in existing]
+        inserted_rows = [row for row in rows if (row["period_start"], row["size"]) not in existing]
+
+        if updated_rows:
+            session.execute(update(table).where(table.c.period_start == bindparam("b_period_start"),
+                                                table.c.size == bindparam("b_size")).values(
+                {name: table.c[name] + bindparam(f"b_{name}") for name in STATS_COLUMNS}), updated_rows)
+
+        if inserted_rows:
+            session.execute(insert(table), inserted_rows)
+
+    def record(self, session, visits: list):
+        """
+        Adds visits to the aggregates without committing the changes
+        :param session: the db session the visits are added in
+        :param visits: the list of the Visit objects
+        :return:
+        """
+        upsert = session.get_bind().dialect.name in UPSERT_DIALECTS
+
+        for model, deltas in self._deltas(visits).items():
+            rows = [{"period_start": period_start, "size": size, **dict(zip(STATS_COLUMNS, delta))}
+                    for (period_start, size), delta in deltas.items()]
+
+            if upsert:
+                self._upsert(session, model.__table__, rows)
+            else:
+                self._update_or_insert(session, model.__table__, rows)
+
+
+def report(engine, start: datetime, end: datetime, period: timedelta = timedelta(days=1)):
+    """
+    Reports the visits of the periods between two dates from the aggregates
+    :param engine: the Engine of the db
+    :param start: the start of the first period
+    :param end: the end of the report, the periods that start before it are reported
+    :param period: the length of the periods, an hour or a day
+    :return: the list of the VisitReport objects of every period and slot size with visits, ordered by period
+    and size. The mean occupancy is the mean number of slots of the size that were occupied during the period.
+    """
+    model = next((model for model, model_period in STATS_PERIODS.items() if model_period == period), None)
+
+    if model is None:
+        raise ValueError(f"There are no aggregates of {period} periods.")
+
+    table = model.__table__
+    query = select(table).where(table.c.period_start >= start, table.c.period_start < end)
+
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+
+    return sorted((VisitReport(row.period_start, row.size, row.num_of_visits, row.revenue,
+                               row.dwell_hours / row.num_of_visits if row.num_of_visits else 0,
+                               row.occupied_hours / (period.total_seconds()/3600)) for row in rows),
+                  key=lambda visit_report: (visit_report.period_start, visit_report.size.value))
+
+
+def daily_report(engine, day: datetime):
+    """
+    Reports the visits of a day from the daily aggregates
+    :param engine: the Engine of the db
+    :param day: a date of the day
+    :return: a dictionary of the VisitReport objects of the day by slot Size
+    """
+    day = _period_start(day, timedelta(days=1))
+
+    return {visit_report.size: visit_report for visit_report in report(engine, day, day + timedelta(days=1))}
@@ -4,6 +4,11 @@ from src.db import Base
 import pytest
 
 
+def pytest_configure(config):
+    # a flush that warns about conflicting instances leaves the db session out of step with the parking lot
+    config.addinivalue_line("filterwarnings", "error::sqlalchemy.exc.SAWarning")
+
+
 @pytest.fixture(scope="function")
 def engine():
     return create_engine("sqlite:///parking_lot.db")
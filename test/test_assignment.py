@@ -0,0 +1,109 @@
+from src.assignment import NearestSlotStrategy, SmallestFitStrategy, ZoneBalancingStrategy
+from src.compiled_parking_map import compile_parking_map
+from src.slot_index import SlotIndex
+from src.slot_store import SlotStore
+from src.parking_lot import AutomatedParkingLot
+from src.vehicles import ParkingVehicle
+from src.db import Base, create_db_engine
+from src.enums import Size, EntryPoint
+
+from datetime import datetime
+
+
+def occupy(slot_index: SlotIndex, slot_store: SlotStore, slot_id: int):
+    slot_index.occupy(slot_id)
+    slot_store.occupy(slot_id, f"PLATE{slot_id}")
+
+
+class TestAssignmentStrategies:
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    def build(self, parking_map: dict):
+        compiled_parking_map = compile_parking_map(parking_map)
+
+        return SlotIndex(compiled_parking_map), SlotStore(compiled_parking_map)
+
+    def test_smallest_fit(self):
+        slot_index, slot_store = self.build({
+            "slot_sizes": [Size.LARGE, Size.MEDIUM, Size.SMALL],
+            "distances": [(1, 1, 1), (3, 3, 3), (5, 5, 5)],
+            "entrypoints": self.entrypoints
+        })
+
+        assert NearestSlotStrategy().find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 0
+        assert SmallestFitStrategy().find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 2
+        assert SmallestFitStrategy().find_slot(slot_index, slot_store, Size.MEDIUM, EntryPoint.A) == 1
+        assert SmallestFitStrategy(max_detour=2).find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 1
+
+        occupy(slot_index, slot_store, 2)
+
+        assert SmallestFitStrategy().find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 1
+
+    def test_zone_balancing(self):
+        slot_index, slot_store = self.build({
+            "slot_sizes": [Size.SMALL] * 5,
+            "distances": [(1, 10, 10), (2, 10, 10), (10, 1, 10), (10, 2, 10), (10, 10, 1)],
+            "entrypoints": self.entrypoints
+        })
+        strategy = ZoneBalancingStrategy()
+
+        assert strategy.find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 0
+
+        occupy(slot_index, slot_store, 0)
+
+        # the zone of A is half full, so the next vehicle from A goes to the nearest slot of the emptier zones
+        assert NearestSlotStrategy().find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 1
+        assert strategy.find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 2
+        assert ZoneBalancingStrategy(load_weight=0).find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 1
+
+        for slot_id in range(1, 5):
+            occupy(slot_index, slot_store, slot_id)
+
+        assert strategy.find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) is None
+
+    def test_zone_balancing_lots(self):
+        slot_index, slot_store = self.build({
+            "slot_sizes": [Size.SMALL] * 6,
+            "distances": [(1, 10, 10), (2, 10, 10), (2, 10, 10), (2, 10, 10), (5, 1, 10), (5, 10, 1)],
+            "entrypoints": self.entrypoints
+        })
+        other_slot_index, other_slot_store = self.build({
+            "slot_sizes": [Size.SMALL] * 5,
+            "distances": [(1, 10, 10), (2, 10, 10), (10, 1, 10), (10, 2, 10), (10, 10, 1)],
+            "entrypoints": self.entrypoints
+        })
+        strategy = ZoneBalancingStrategy()
+        occupy(other_slot_index, other_slot_store, 0)
+
+        assert strategy.find_slot(other_slot_index, other_slot_store, Size.SMALL, EntryPoint.A) == 2
+
+        occupy(slot_index, slot_store, 0)
+
+        # the median distance from A is 2 here, the penalty of the median 10 of the other parking lot would send
+        # the vehicle to slot 4
+        assert strategy.find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 1
+
+    def test_zone_balancing_float_distances(self):
+        slot_index, slot_store = self.build({
+            "slot_sizes": [Size.SMALL] * 3,
+            "distances": [(1.9, 1, 10), (1.1, 5, 10), (10, 10, 1)],
+            "entrypoints": self.entrypoints
+        })
+
+        assert ZoneBalancingStrategy(load_weight=0).find_slot(slot_index, slot_store, Size.SMALL, EntryPoint.A) == 1
+
+    def test_parking_lot_strategy(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_map = {
+            "slot_sizes": [Size.LARGE, Size.SMALL],
+            "distances": [(1, 1, 1), (5, 5, 5)],
+            "entrypoints": self.entrypoints
+        }
+        parking_lot = AutomatedParkingLot(parking_map, engine=engine, assignment_strategy=SmallestFitStrategy())
+
+        assert parking_lot.find_slot(Size.SMALL, EntryPoint.A).slot_id == 1
+        assert parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A,
+                                        datetime(2022, 9, 25, 15, 30)).slot_id == 1
+        assert parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC456"), EntryPoint.A,
+                                        datetime(2022, 9, 25, 15, 30)).slot_id == 0
@@ -0,0 +1,116 @@
+from src.vehicles import *
+from src.parking_lot import AutomatedParkingLot
+from src.async_parking_lot import AsyncParkingLot
+from src.enums import Size, EntryPoint
+from src.exceptions import *
+from src.db import Base, create_db_engine, engine
+
+from sqlalchemy import event
+from datetime import datetime, timedelta
+
+import asyncio
+import pytest
+
+
+class TestAsyncParkingLot:
+    num_of_gates = 20
+    vehicles_per_gate = 10
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.MEDIUM, Size.LARGE] * 80,
+        "distances": [(i % 7, i % 11, i % 13) for i in range(240)],
+        "entrypoints": entrypoints
+    }
+
+    def test_park_and_unpark_vehicles(self, session):
+        commits = []
+
+        def count_commit(connection):
+            commits.append(connection)
+
+        async def gate(parking_lot, gate_id):
+            slots = []
+            date_of_entry = datetime(2022, 9, 25, 15, 30)
+
+            for i in range(self.vehicles_per_gate):
+                vehicle = ParkingVehicle(Size(i % 3 + 1), f"G{gate_id}V{i}")
+                slots.append(await parking_lot.park_vehicle(vehicle, self.entrypoints[gate_id % 3], date_of_entry))
+
+            fees = [await parking_lot.unpark_vehicle(Vehicle(license_plate=f"G{gate_id}V{i}"),
+                                                     date_of_entry + timedelta(hours=1))
+                    for i in range(0, self.vehicles_per_gate, 2)]
+
+            return slots, fees
+
+        async def run():
+            async with AsyncParkingLot(AutomatedParkingLot(self.parking_map)) as parking_lot:
+                return await asyncio.gather(*(gate(parking_lot, gate_id) for gate_id in range(self.num_of_gates)))
+
+        event.listen(engine, "commit", count_commit)
+
+        try:
+            results = asyncio.run(run())
+        finally:
+            event.remove(engine, "commit", count_commit)
+
+        slot_ids = [slot.slot_id for slots, _ in results for slot in slots]
+
+        assert len(slot_ids) == len(set(slot_ids)) == self.num_of_gates * self.vehicles_per_gate
+        assert all(fee == 40 for _, fees in results for fee in fees)
+        assert len(commits) < self.num_of_gates * self.vehicles_per_gate  # the commits were grouped
+
+    def test_errors(self, session):
+        parking_map = {
+            "slot_sizes": [Size.SMALL] * 3,
+            "distances": [(1, 2, 3)] * 3,
+            "entrypoints": self.entrypoints
+        }
+
+        async def run():
+            async with AsyncParkingLot(AutomatedParkingLot(parking_map)) as parking_lot:
+                await parking_lot.park_vehicle(SmallParkingVehicle("ABC123"), EntryPoint.A,
+                                               datetime(2022, 9, 25, 15, 30))
+
+                with pytest.raises(VehicleAlreadyParked):
+                    await parking_lot.park_vehicle(SmallParkingVehicle("ABC123"), EntryPoint.A,
+                                                   datetime(2022, 9, 25, 15, 30))
+
+                with pytest.raises(NoMoreAvailableSpot):
+                    await parking_lot.park_vehicle(LargeParkingVehicle("LRG123"), EntryPoint.A,
+                                                   datetime(2022, 9, 25, 15, 30))
+
+        asyncio.run(run())
+
+    def test_failed_commit(self, tmp_path, monkeypatch):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        date_of_entry = datetime(2022, 9, 25, 15, 30)
+
+        def fail_once():
+            monkeypatch.undo()
+            raise RuntimeError("The db is down.")
+
+        async def park(async_parking_lot, license_plates):
+            return await asyncio.gather(*(async_parking_lot.park_vehicle(
+                SmallParkingVehicle(license_plate), EntryPoint.A, date_of_entry) for license_plate in license_plates),
+                return_exceptions=True)
+
+        async def run():
+            async with AsyncParkingLot(parking_lot) as async_parking_lot:
+                monkeypatch.setattr(parking_lot._session, "commit", fail_once)
+                results = await park(async_parking_lot, [f"V{i}" for i in range(5)])
+                parked = [f"V{i}" for i, result in enumerate(results) if not isinstance(result, Exception)]
+
+                # the vehicles of the failed group commit are not in the parking lot, so they can park again
+                assert isinstance(results[0], RuntimeError)
+                assert parking_lot.occupancy()[Size.SMALL][1] == len(parked)
+                assert all((parking_lot._vehicle_registry.get(f"V{i}") is not None) == (f"V{i}" in parked)
+                           for i in range(5))
+
+                return results + await park(async_parking_lot, [f"V{i}" for i in range(5) if f"V{i}" not in parked])
+
+        slot_ids = [result.slot_id for result in asyncio.run(run()) if not isinstance(result, Exception)]
+
+        assert len(slot_ids) == len(set(slot_ids)) == 5
+        assert parking_lot.occupancy()[Size.SMALL][1] == 5
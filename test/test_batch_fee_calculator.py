@@ -0,0 +1,64 @@
+from src.batch_fee_calculator import BatchParkingFeeCalculator
+from src.fee_calculator import ParkingFeeCalculator
+from src.enums import Size
+from src.exceptions import FeeCannotBeCalculated
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import random
+import pytest
+
+
+class TestBatchParkingFeeCalculator:
+    def test_calculate_fees(self):
+        calculator = BatchParkingFeeCalculator()
+        date_of_entry = [datetime(2022, 9, 25, 15, 30)] * 3
+        date_of_exit = [datetime(2022, 9, 25, 16, 30), datetime(2022, 9, 25, 20, 30), datetime(2022, 9, 27, 19, 30)]
+
+        fee_batch = calculator.calculate_fees(date_of_entry, date_of_entry, date_of_exit,
+                                              [Size.SMALL, Size.LARGE, Size.MEDIUM], [0, 0, 0], [True, True, True])
+
+        assert fee_batch.fees.tolist() == [40, 240, 10240]
+        assert fee_batch.hour_paid.tolist() == [3, 5, 52]
+        assert fee_batch.charge_flat_rate.tolist() == [True, True, False]
+        assert fee_batch.total_hours_stayed.tolist() == [1, 5, 52]
+
+    def test_matches_calculate_fee(self):
+        rng = random.Random(11)
+        batch_calculator = BatchParkingFeeCalculator(flat_rate=40)
+        calculator = ParkingFeeCalculator(flat_rate=40)
+        columns = {"date_of_entry": [], "date_of_first_entry": [], "date_of_exit": [], "slot_sizes": [],
+                   "hour_paid": [], "charge_flat_rate": []}
+        vehicles = []
+
+        for _ in range(5000):
+            date_of_first_entry = datetime(2022, 1, 1) + timedelta(minutes=rng.randint(0, 500000))
+            date_of_entry = date_of_first_entry + timedelta(minutes=rng.choice([0, rng.randint(0, 300)]))
+            date_of_exit = date_of_entry + timedelta(hours=rng.choice([0, 1, 3, 24, 48]),
+                                                     seconds=rng.randint(0, 200000),
+                                                     microseconds=rng.choice([0, rng.randint(0, 999999)]))
+            vehicle = SimpleNamespace(date_of_entry=date_of_entry, date_of_first_entry=date_of_first_entry,
+                                      date_of_exit=date_of_exit, slot=SimpleNamespace(size=rng.choice(list(Size))),
+                                      hour_paid=rng.choice([0, 3, rng.randint(0, 80)]),
+                                      charge_flat_rate=rng.random() < 0.5, total_hours_stayed=0)
+
+            for column in columns:
+                columns[column].append(vehicle.slot.size if column == "slot_sizes" else getattr(vehicle, column))
+
+            vehicles.append(vehicle)
+
+        fee_batch = batch_calculator.calculate_fees(**columns)
+
+        for i, vehicle in enumerate(vehicles):
+            assert fee_batch.fees[i] == calculator.calculate_fee(vehicle)
+            assert fee_batch.hour_paid[i] == vehicle.hour_paid
+            assert fee_batch.charge_flat_rate[i] == vehicle.charge_flat_rate
+            assert fee_batch.total_hours_stayed[i] == vehicle.total_hours_stayed
+
+    def test_missing_dates(self):
+        calculator = BatchParkingFeeCalculator()
+
+        with pytest.raises(FeeCannotBeCalculated):
+            calculator.calculate_fees([datetime(2022, 9, 25, 15, 30)], [datetime(2022, 9, 25, 15, 30)], [None],
+                                      [Size.SMALL], [0], [True])
@@ -0,0 +1,89 @@
+from src.vehicles import *
+from src.compiled_parking_map import CompiledParkingMap, compile_parking_map, load_parking_map
+from src.parking_lot import AutomatedParkingLot
+from src.enums import Size, EntryPoint
+
+from datetime import datetime
+
+import json
+import os
+import pytest
+
+
+class TestCompiledParkingMap:
+    slots = [Size.SMALL, Size.LARGE, Size.MEDIUM, Size.SMALL, Size.MEDIUM, Size.LARGE]
+    distances = [(1, 2, 3), (1, 3, 2), (3, 2, 1), (2, 1, 3), (3, 1, 2), (2, 3, 1)]
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    parking_map = {
+        "slot_sizes": slots,
+        "distances": distances,
+        "entrypoints": entrypoints
+    }
+
+    def test_compile(self):
+        compiled_parking_map = compile_parking_map(self.parking_map)
+
+        assert compiled_parking_map.num_of_slots == 6
+        assert compiled_parking_map.slot_distances(4) == (3, 1, 2)
+        assert compiled_parking_map.ordering(EntryPoint.A, Size.SMALL).tolist() == [0, 3]
+        assert compiled_parking_map.ordering(EntryPoint.B, Size.MEDIUM).tolist() == [4, 2]
+        assert compiled_parking_map.ordering(EntryPoint.C, Size.LARGE).tolist() == [5, 1]
+        assert compiled_parking_map.hash == compile_parking_map(dict(self.parking_map)).hash
+        assert compiled_parking_map.hash != compile_parking_map(dict(self.parking_map, slot_sizes=[Size.LARGE] * 6)).hash
+
+    def test_invalid(self, tmp_path):
+        with pytest.raises(TypeError):
+            compile_parking_map([1, 2, 3])
+
+        with pytest.raises(ValueError):
+            compile_parking_map(dict(self.parking_map, distances=[(1, 2)] * 6), cache_dir=str(tmp_path))
+
+        with pytest.raises(ValueError):
+            compile_parking_map(self.parking_map, num_of_entrypoints=4)
+
+    def test_cache(self, tmp_path):
+        compiled_parking_map = compile_parking_map(self.parking_map, cache_dir=str(tmp_path))
+        path = tmp_path / f"{compiled_parking_map.hash}.plmap"
+        modified = os.stat(path).st_mtime_ns
+
+        cached_parking_map = compile_parking_map(self.parking_map, cache_dir=str(tmp_path))
+        loaded_parking_map = CompiledParkingMap.load(str(path), verify=True)
+
+        assert os.stat(path).st_mtime_ns == modified
+        assert loaded_parking_map.hash == cached_parking_map.hash == compiled_parking_map.hash
+        assert loaded_parking_map.entrypoints == self.entrypoints
+        assert loaded_parking_map.distances.tolist() == compiled_parking_map.distances.tolist()
+        assert loaded_parking_map.orderings.tolist() == compiled_parking_map.orderings.tolist()
+
+        with pytest.raises(ValueError):
+            compile_parking_map(self.parking_map, num_of_entrypoints=4, cache_dir=str(tmp_path))
+
+    def test_load_parking_map(self, tmp_path):
+        layout = {"slot_sizes": ["small", "LARGE"], "distances": [[1, 2, 3], [3, 2, 1]], "entrypoints": ["A", "B", "C"]}
+        (tmp_path / "layout.json").write_text(json.dumps(layout))
+
+        assert load_parking_map(str(tmp_path / "layout.json")) == {
+            "slot_sizes": [Size.SMALL, Size.LARGE], "distances": [(1, 2, 3), (3, 2, 1)],
+            "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]}
+
+        compile_parking_map(load_parking_map(str(tmp_path / "layout.json"))).save(str(tmp_path / "layout.plmap"))
+
+        assert load_parking_map(str(tmp_path / "layout.plmap")).num_of_slots == 2
+
+        (tmp_path / "invalid.json").write_text(json.dumps({**layout, "slot_sizes": ["HUGE", "SMALL"]}))
+
+        with pytest.raises(ValueError):
+            load_parking_map(str(tmp_path / "invalid.json"))
+
+    def test_parking_lot(self, session, tmp_path):
+        compiled_parking_map = compile_parking_map(self.parking_map, cache_dir=str(tmp_path))
+        parking_lot = AutomatedParkingLot(CompiledParkingMap.load(
+            str(tmp_path / f"{compiled_parking_map.hash}.plmap")))
+
+        slot = parking_lot.park_vehicle(MediumParkingVehicle(license_plate="MED123"), EntryPoint.B,
+                                        datetime(2022, 9, 25, 15, 30))
+
+        assert slot.slot_id == 4
+        assert slot.distances == (3, 1, 2)
+        assert len(parking_lot.parking_slots) == 6
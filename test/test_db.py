@@ -0,0 +1,76 @@
+from src.db import create_db_engine
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BLOCK_SQLALCHEMY = """
+import sys
+
+class BlockSQLAlchemy:
+    def find_spec(self, name, path=None, target=None):
+        if name.split(".")[0] == "sqlalchemy":
+            raise ImportError(name)
+
+sys.meta_path.insert(0, BlockSQLAlchemy())
+"""
+
+
+def run_python(script: str, cwd: str, **env):
+    environ = {name: value for name, value in os.environ.items() if not name.startswith("PARKING_LOT_DB_")}
+
+    return subprocess.run([sys.executable, "-c", script], cwd=cwd, env={**environ, "PYTHONPATH": ROOT, **env},
+                          capture_output=True, text=True)
+
+
+class TestDb:
+    def test_sqlite_pragmas(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db", journal_mode="WAL", synchronous="NORMAL",
+                                  cache_size=-4096, mmap_size=1 << 20)
+
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "wal"
+            assert connection.exec_driver_sql("PRAGMA synchronous").scalar() == 1  # NORMAL
+            assert connection.exec_driver_sql("PRAGMA cache_size").scalar() == -4096
+            assert connection.exec_driver_sql("PRAGMA mmap_size").scalar() == 1 << 20
+
+    def test_sqlite_defaults(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql("PRAGMA journal_mode").scalar() == "delete"
+
+    def test_default_engine_is_lazy(self, tmp_path):
+        result = run_python("import src.db, src.parking_lot\n"
+                            "assert 'engine' not in vars(src.db)\n"
+                            "print(src.db.session.get_bind().url)", str(tmp_path))
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.strip() == "sqlite:///parking_lot.db"
+
+    def test_default_engine_settings(self, tmp_path):
+        script = ("import src.db\n"
+                  "with src.db.engine.connect() as connection:\n"
+                  "    print(connection.exec_driver_sql('PRAGMA journal_mode').scalar(),\n"
+                  "          connection.exec_driver_sql('PRAGMA synchronous').scalar())")
+
+        # the default engine keeps the durability of SQLite, WAL and NORMAL are opt-in
+        result = run_python(script, str(tmp_path))
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["delete", "2"]  # FULL
+
+        result = run_python(script, str(tmp_path), PARKING_LOT_DB_JOURNAL_MODE="WAL",
+                            PARKING_LOT_DB_SYNCHRONOUS="NORMAL")
+
+        assert result.returncode == 0, result.stderr
+        assert result.stdout.split() == ["wal", "1"]
+
+    def test_imports_without_sqlalchemy(self, tmp_path):
+        result = run_python(BLOCK_SQLALCHEMY + "import src.enums, src.fee_calculator, src.batch_fee_calculator, "
+                                               "src.slot_store, src.slot_index, src.vehicle_registry, "
+                                               "src.reservations, src.assignment, src.instrumentation", str(tmp_path))
+
+        assert result.returncode == 0, result.stderr
@@ -0,0 +1,158 @@
+from src.parking_lot import AutomatedParkingLot
+from src.parking_slot import ParkingSlot
+from src.vehicles import SmallParkingVehicle
+from src.event_stream import (GateEvent, EventResult, parse_event, read_events, order_events, apply_events, replay,
+                              format_result, write_results)
+from src.enums import Size, EntryPoint, Direction
+from src.db import Base, create_db_engine
+from src.exceptions import *
+
+from datetime import datetime, timedelta
+
+import io
+import json
+import pytest
+
+
+class TestEventStream:
+    slots = [Size.SMALL, Size.LARGE, Size.MEDIUM, Size.SMALL, Size.MEDIUM, Size.LARGE]
+    distances = [(1, 2, 3), (1, 3, 2), (3, 2, 1), (2, 1, 3), (3, 1, 2), (2, 3, 1)]
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    parking_map = {
+        "slot_sizes": slots,
+        "distances": distances,
+        "entrypoints": entrypoints
+    }
+
+    ndjson = "\n".join([
+        '{"license_plate": "ABC456", "size": "small", "entrypoint": "A", "timestamp": "2022-09-25T15:30:00", '
+        '"direction": "in"}',
+        '{"license_plate": "ABC456", "timestamp": "2022-09-25T17:30:00", "direction": "out"}',
+        '',
+        'not json',
+        '{"license_plate": "XYZ123", "size": "huge", "entrypoint": "A", "timestamp": "2022-09-25T15:30:00", '
+        '"direction": "in"}',
+    ])
+
+    csv = ("license_plate,size,entrypoint,timestamp,direction\n"
+           "ABC456,SMALL,A,2022-09-25T15:30:00Z,in\n"
+           "ABC456,,,2022-09-25T17:30:00Z,OUT\n")
+
+    def parking_lot(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+
+        return AutomatedParkingLot(self.parking_map, engine=engine)
+
+    def test_parse_event(self):
+        event = parse_event({"license_plate": "ABC456", "size": "Medium", "entrypoint": "b",
+                             "timestamp": "2022-09-25T15:30:00+08:00", "direction": "in"})
+
+        assert event == GateEvent("ABC456", Size.MEDIUM, EntryPoint.B, datetime(2022, 9, 25, 7, 30), Direction.IN)
+        assert parse_event({"license_plate": "ABC456", "timestamp": 0, "direction": "out"}).timestamp == \
+            datetime(1970, 1, 1)
+        assert parse_event({"license_plate": "ABC456", "timestamp": "1700000000", "direction": "out"}).timestamp \
+            == datetime(2023, 11, 14, 22, 13, 20)
+
+        with pytest.raises(InvalidGateEvent):
+            parse_event({"license_plate": "ABC456", "timestamp": "2022-09-25T15:30:00", "direction": "sideways"})
+
+        with pytest.raises(InvalidGateEvent):
+            parse_event({"license_plate": "ABC456", "entrypoint": "A", "timestamp": "2022-09-25T15:30:00",
+                         "direction": "in"})
+
+    def test_read_events(self):
+        events = list(read_events(io.StringIO(self.ndjson)))
+
+        assert [event.direction for event in events[:2]] == [Direction.IN, Direction.OUT]
+        assert all(isinstance(event, InvalidGateEvent) for event in events[2:])
+        assert len(events) == 4
+
+        assert list(read_events(io.StringIO(self.csv), "csv")) == events[:2]
+
+        # the timestamps of CSV are strings, also when they are seconds since the epoch
+        lines = io.StringIO("license_plate,timestamp,direction\nABC456,1700000000.5,out\n")
+        csv_events = list(read_events(lines, "csv"))
+
+        assert csv_events[0].timestamp == datetime(2023, 11, 14, 22, 13, 20, 500000)
+
+        with pytest.raises(ValueError):
+            read_events(io.StringIO(self.csv), "xml")
+
+    def test_order_events(self):
+        start = datetime(2022, 9, 25, 15, 30)
+        events = [GateEvent(str(minutes), None, None, start + timedelta(minutes=minutes), Direction.OUT)
+                  for minutes in [0, 3, 1, 10, 2, 20]]
+
+        ordered = list(order_events(events, max_delay=timedelta(minutes=5)))
+
+        # the event of minute 1 is put back in order, the event of minute 2 arrived after minute 3 was applied
+        assert [event.license_plate for event in ordered if not isinstance(event, Exception)] == \
+            ["0", "1", "3", "10", "20"]
+        assert isinstance(ordered[3], InvalidGateEvent)
+
+        assert len(list(order_events(events, max_delay=timedelta(hours=1), max_buffered=2))) == len(events)
+
+    def test_apply_events(self, tmp_path):
+        parking_lot = self.parking_lot(tmp_path)
+        results = list(apply_events(parking_lot, read_events(io.StringIO(self.ndjson)), batch_size=2))
+
+        assert isinstance(results[0].result, ParkingSlot) and results[0].result.slot_id == 0
+        assert results[1].result == 40
+        assert results[2].event is None and isinstance(results[2].result, InvalidGateEvent)
+
+        # parked and unparked again within the same batch
+        results = list(apply_events(parking_lot, [
+            GateEvent("ABC456", Size.SMALL, EntryPoint.A, datetime(2022, 9, 25, 18, 0), Direction.IN),
+            GateEvent("ABC456", None, None, datetime(2022, 9, 25, 18, 30), Direction.OUT),
+            GateEvent("ABC456", None, None, datetime(2022, 9, 25, 18, 30), Direction.OUT),
+        ]))
+
+        assert results[1].result == 0
+        assert isinstance(results[2].result, VehicleNotParked)
+        assert parking_lot.parking_slots[0].isempty
+
+    def test_apply_events_failed_commit(self, tmp_path, monkeypatch):
+        parking_lot = self.parking_lot(tmp_path)
+        start = datetime(2022, 9, 25, 15, 30)
+        parking_lot.park_vehicle(SmallParkingVehicle("ABC123"), EntryPoint.A, start)
+        events = [
+            GateEvent("ABC123", None, None, start + timedelta(hours=2), Direction.OUT),
+            GateEvent("ABC456", Size.SMALL, EntryPoint.A, start, Direction.IN),
+            GateEvent("ABC789", Size.SMALL, EntryPoint.D, start, Direction.IN),
+        ]
+
+        def fail_once():
+            monkeypatch.undo()
+            raise RuntimeError("The db is down.")
+
+        monkeypatch.setattr(parking_lot._session, "commit", fail_once)
+        results = list(apply_events(parking_lot, events))
+
+        assert [type(result.result) for result in results] == [RuntimeError, RuntimeError, InvalidEntryPoint]
+
+        # nothing of the failed batch is left in the parking lot, so it can be applied again
+        assert parking_lot.occupancy()[Size.SMALL] == (2, 1)
+        assert parking_lot.parking_slots[0].vehicle.license_plate == "ABC123"
+
+        results = list(apply_events(parking_lot, events))
+
+        assert results[0].result == 40 and results[1].result.slot_id == 0
+        assert parking_lot.occupancy()[Size.SMALL] == (2, 1)
+
+    def test_replay(self, tmp_path):
+        parking_lot = self.parking_lot(tmp_path)
+        output = io.StringIO()
+
+        assert write_results(replay(parking_lot, io.StringIO(self.csv), "csv"), output) == 0
+
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+
+        assert records == [
+            {"license_plate": "ABC456", "timestamp": "2022-09-25T15:30:00", "direction": "in", "slot_id": 0},
+            {"license_plate": "ABC456", "timestamp": "2022-09-25T17:30:00", "direction": "out", "fee": 40},
+        ]
+
+        assert json.loads(format_result(EventResult(None, InvalidGateEvent("bad")))) \
+            == {"error": "InvalidGateEvent", "message": "bad"}
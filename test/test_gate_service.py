@@ -0,0 +1,214 @@
+from src.parking_lot import AutomatedParkingLot
+from src.gate_service import GateService
+from src.db import Base, create_db_engine
+from src.enums import Size, EntryPoint
+
+from sqlalchemy import event
+
+import asyncio
+import json
+
+
+class Client:
+    """A keep-alive HTTP client of the tests"""
+    def __init__(self, port: int):
+        self.port = port
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: dict = None, keep_alive=True):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+
+        data = json.dumps(body).encode() if body is not None else b""
+        self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n"
+                          f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + data)
+
+        status = int((await self.reader.readline()).split()[1])
+        headers = {}
+
+        line = await self.reader.readline()
+
+        while line != b"\r\n":
+            name, _, value = line.decode().partition(":")
+            headers[name.lower()] = value.strip()
+            line = await self.reader.readline()
+
+        response = json.loads(await self.reader.readexactly(int(headers["content-length"])))
+
+        if headers["connection"] == "close":
+            self.close()
+
+        return status, response
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+class TestGateService:
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.MEDIUM, Size.LARGE] * 40,
+        "distances": [(i % 7, i % 11, i % 13) for i in range(120)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+
+    def create_parking_lot(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+
+        return AutomatedParkingLot(self.parking_map, engine=engine), engine
+
+    def test_endpoints(self, tmp_path):
+        parking_lot, _ = self.create_parking_lot(tmp_path)
+
+        async def run():
+            async with GateService(parking_lot, port=0) as service:
+                client = Client(service.port)
+                vehicle = {"license_plate": "ABC123", "size": "small", "entrypoint": "A",
+                           "timestamp": "2022-09-25T15:30:00"}
+
+                # every request goes over the same connection
+                responses = [
+                    await client.request("POST", "/park", vehicle),
+                    await client.request("POST", "/park", vehicle),
+                    await client.request("GET", "/quote?license_plate=ABC123&timestamp=2022-09-25T18:30:00"),
+                    await client.request("GET", "/availability?size=small&zone=A"),
+                    await client.request("POST", "/unpark", {"license_plate": "ABC123",
+                                                             "timestamp": "2022-09-25T18:30:00"}),
+                    await client.request("GET", "/quote?license_plate=ABC123"),
+                    await client.request("POST", "/park", {"license_plate": "ABC456", "size": "huge"}),
+                    await client.request("GET", "/park"),
+                    await client.request("GET", "/nowhere", keep_alive=False)
+                ]
+
+                assert client.writer is None
+
+                return responses
+
+        responses = asyncio.run(run())
+
+        assert responses[0] == (200, {"license_plate": "ABC123", "timestamp": "2022-09-25T15:30:00",
+                                      "direction": "in", "slot_id": 0})
+        assert responses[1][0] == 409 and responses[1][1]["error"] == "VehicleAlreadyParked"
+        assert responses[2] == (200, {"license_plate": "ABC123", "timestamp": "2022-09-25T18:30:00", "fee": 40})
+        assert responses[3] == (200, {"SMALL": {"slots": 23, "occupied": 1, "available": 72}})
+        assert responses[4][1]["fee"] == 40
+        assert responses[5][0] == 404
+        assert [status for status, _ in responses[6:]] == [400, 405, 404]
+
+    def test_coalescing(self, tmp_path):
+        parking_lot, engine = self.create_parking_lot(tmp_path)
+        commits = []
+
+        async def park(port: int, i: int):
+            client = Client(port)
+            vehicle = {"license_plate": f"V{i}", "size": Size(i % 3 + 1).name, "entrypoint": "B",
+                       "timestamp": "2022-09-25T15:30:00"}
+            response = await client.request("POST", "/park", vehicle)
+            client.close()
+
+            return response
+
+        async def run():
+            async with GateService(parking_lot, port=0, coalesce_window=0.05) as service:
+                return await asyncio.gather(*(park(service.port, i) for i in range(60)))
+
+        event.listen(engine, "commit", lambda connection: commits.append(connection))
+        responses = asyncio.run(run())
+
+        slot_ids = [response["slot_id"] for status, response in responses if status == 200]
+
+        assert len(slot_ids) == len(set(slot_ids)) == 60
+        assert len(commits) < 10  # the requests were committed in a few batches
+        assert sum(occupied for _, occupied in parking_lot.occupancy().values()) == 60
+
+    def test_backpressure(self, tmp_path):
+        parking_lot, _ = self.create_parking_lot(tmp_path)
+
+        async def park(port: int, i: int):
+            client = Client(port)
+            response = await client.request("POST", "/park", {"license_plate": f"V{i}", "size": "small",
+                                                              "entrypoint": "A", "timestamp": "2022-09-25T15:30:00"})
+            client.close()
+
+            return response
+
+        async def run():
+            async with GateService(parking_lot, port=0, coalesce_window=0.2, max_pending=4) as service:
+                return await asyncio.gather(*(park(service.port, i) for i in range(20)))
+
+        statuses = [status for status, _ in asyncio.run(run())]
+
+        # the writer holds one request while it waits for the others, the queue holds the next 4
+        assert 0 < statuses.count(200) <= 5
+        assert statuses.count(503) == 20 - statuses.count(200)
+
+    def test_failed_commit(self, tmp_path, monkeypatch):
+        parking_lot, _ = self.create_parking_lot(tmp_path)
+
+        def fail_once():
+            monkeypatch.undo()
+            raise RuntimeError("The db is down.")
+
+        async def run():
+            async with GateService(parking_lot, port=0) as service:
+                client = Client(service.port)
+                responses = []
+
+                for path, body in [("/park", {"license_plate": "ABC123", "size": "small", "entrypoint": "A",
+                                              "timestamp": "2022-09-25T15:30:00"}),
+                                   ("/unpark", {"license_plate": "ABC123", "timestamp": "2022-09-25T18:30:00"})]:
+                    monkeypatch.setattr(parking_lot._session, "commit", fail_once)
+                    responses.append(await client.request("POST", path, body))
+                    responses.append(await client.request("GET", "/availability?size=small&zone=A"))
+                    responses.append(await client.request("POST", path, body))  # the retry is committed
+
+                client.close()
+
+                return responses
+
+        responses = asyncio.run(run())
+
+        # the failed requests left nothing behind, so their retries are served like the first try
+        assert responses[0][0] == 500 and responses[0][1]["error"] == "RuntimeError"
+        assert responses[1][1]["SMALL"]["occupied"] == 0
+        assert responses[2] == (200, {"license_plate": "ABC123", "timestamp": "2022-09-25T15:30:00",
+                                      "direction": "in", "slot_id": 0})
+        assert responses[3][0] == 500
+        assert responses[4][1]["SMALL"]["occupied"] == 1
+        assert responses[5][1]["fee"] == 40
+
+    def test_invalid_requests(self, tmp_path, monkeypatch):
+        parking_lot, _ = self.create_parking_lot(tmp_path)
+
+        async def raw_request(port: int, data: bytes):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(data)
+            status = int((await reader.readline()).split()[1])
+            writer.close()
+
+            return status
+
+        def fail(zone=None):
+            raise RuntimeError("A bug")
+
+        async def run():
+            async with GateService(parking_lot, port=0) as service:
+                client = Client(service.port)
+                statuses = [
+                    await raw_request(service.port, b"POST /park HTTP/1.1\r\nContent-Length: -1\r\n\r\n"),
+                    await raw_request(service.port, b"GET /availability HTTP/1.1\r\nX-Long: " + b"x" * 70000 +
+                                      b"\r\n\r\n")
+                ]
+
+                # an unexpected exception is answered 500, and the connection is kept
+                monkeypatch.setattr(parking_lot, "occupancy", fail)
+                statuses.append((await client.request("GET", "/availability"))[0])
+                monkeypatch.undo()
+                statuses.append((await client.request("GET", "/availability"))[0])
+                client.close()
+
+                return statuses
+
+        assert asyncio.run(run()) == [400, 400, 500, 200]
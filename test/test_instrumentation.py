@@ -0,0 +1,91 @@
+from src.vehicles import *
+from src.parking_lot import AutomatedParkingLot
+from src.instrumentation import *
+from src.enums import Size, EntryPoint
+from src.exceptions import *
+from src.db import Base, create_db_engine
+
+from datetime import datetime
+
+import pytest
+
+
+class TestInstrumentation:
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 2, 3), (1, 3, 2)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        return engine
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(1, 2, 5))
+
+        for value in [0.5, 1.5, 1.5, 4, 10]:
+            histogram.observe(value)
+
+        assert histogram.count == 5
+        assert histogram.sum == 17.5
+        assert histogram.quantile(0.5) == 2
+        assert histogram.quantile(0.8) == 5
+        assert histogram.quantile(1) == float("inf")
+
+    def test_parking_lot_metrics(self, engine):
+        sink = InMemorySink()
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine, instrumentation=Instrumentation(sink))
+        date = datetime(2022, 9, 25, 15, 30)
+
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="SML123"), EntryPoint.A, date)
+        parking_lot.park_vehicle(LargeParkingVehicle(license_plate="LRG123"), EntryPoint.A, date)
+
+        with pytest.raises(NoMoreAvailableSpot):
+            parking_lot.park_vehicle(SmallParkingVehicle(license_plate="SML456"), EntryPoint.A, date)
+
+        assert sink.gauge(OCCUPIED_SLOTS, size="SMALL") == 1
+        assert sink.gauge(OCCUPIED_SLOTS, size="LARGE") == 1
+        assert sink.gauge(SLOTS, size="MEDIUM") == 0
+
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="SML123"), datetime(2022, 9, 25, 17, 30)) == 40
+
+        assert sink.gauge(OCCUPIED_SLOTS, size="SMALL") == 0
+        assert sink.counter(OPERATIONS_TOTAL, operation="park", outcome="ok") == 2
+        assert sink.counter(OPERATIONS_TOTAL, operation="park", outcome="NoMoreAvailableSpot") == 1
+        assert sink.counter(OPERATIONS_TOTAL, operation="unpark", outcome="ok") == 1
+        assert sink.histogram(PHASE_SECONDS, phase="slot_search").count == 3
+        assert sink.histogram(PHASE_SECONDS, phase="fee").count == 1
+        assert sink.histogram(PHASE_SECONDS, phase="commit").count == 3
+        assert sink.histogram(QUERIES_PER_OPERATION, operation="park").sum > 0
+        assert sink.histogram(QUERIES_PER_COMMIT).sum > 0
+
+    def test_prometheus_text_file(self, engine, tmp_path):
+        path = tmp_path / "parking_lot.prom"
+        sink = PrometheusTextFileSink(str(path))
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine, instrumentation=Instrumentation(sink))
+
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="SML123"), EntryPoint.A,
+                                 datetime(2022, 9, 25, 15, 30))
+        sink.write()
+
+        text = path.read_text()
+
+        assert "# TYPE parking_lot_occupied_slots gauge" in text
+        assert 'parking_lot_occupied_slots{size="SMALL"} 1' in text
+        assert 'parking_lot_operations_total{operation="park",outcome="ok"} 1' in text
+        assert 'parking_lot_phase_seconds_bucket{phase="slot_search",le="+Inf"} 1' in text
+
+    def test_callback(self, engine):
+        events = []
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine,
+                                          instrumentation=Instrumentation(CallbackSink(
+                                              lambda *event: events.append(event))))
+
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="SML123"), EntryPoint.A,
+                                 datetime(2022, 9, 25, 15, 30))
+
+        assert ("increment", OPERATIONS_TOTAL, {"operation": "park", "outcome": "ok"}, 1) in events
+        assert ("set_gauge", OCCUPIED_SLOTS, {"size": "SMALL"}, 1) in events
@@ -0,0 +1,168 @@
+from src.journal import Journal, ReportingSink, WAL
+from src.journaled_parking_lot import JournaledParkingLot
+from src.visits import Visit, daily_report
+from src.vehicles import Vehicle, ParkingVehicle
+from src.db import Base, create_db_engine
+from src.exceptions import VehicleAlreadyParked
+from src.enums import Size, EntryPoint
+
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+from datetime import datetime, timedelta
+
+import os
+import pytest
+import time
+
+
+class TestJournaledParkingLot:
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 2, 3), (2, 3, 1)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+    start = datetime(2022, 9, 30, 22, 0)
+
+    def test_restart(self, tmp_path):
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path))) as parking_lot:
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+            parking_lot.park_vehicle(ParkingVehicle(Size.LARGE, "ABC456"), EntryPoint.A, self.start)
+
+            assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1.5)) == 40
+
+        # the vehicles are recovered from the log
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path))) as parking_lot:
+            assert parking_lot.occupancy()[Size.LARGE] == (1, 1)
+            assert parking_lot.parking_slots[1].vehicle.license_plate == "ABC456"
+
+            with pytest.raises(VehicleAlreadyParked):
+                parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC456"), EntryPoint.A, self.start)
+
+            # the vehicle that came back is charged the continuous rate
+            assert parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A,
+                                            self.start + timedelta(hours=2)).slot_id == 0
+
+        # and from the snapshot written on the restart and the log after it
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path))) as parking_lot:
+            assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=4)) == 20
+            assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"), self.start + timedelta(hours=3.5)) == 140
+
+        assert sorted(os.listdir(tmp_path)) == ["snapshot_00000003.csv", "wal_00000003.csv"]
+
+    def test_snapshots(self, tmp_path):
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path)), snapshot_interval=2) as parking_lot:
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC456"), EntryPoint.A, self.start)
+
+            assert sorted(os.listdir(tmp_path)) == ["snapshot_00000002.csv", "wal_00000002.csv"]
+
+            parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1))
+
+        # a record that was not completely written when the process stopped is ignored
+        with open(tmp_path / "wal_00000002.csv", "a") as file:
+            file.write("U,ABC456,1,LARGE")
+
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path))) as parking_lot:
+            assert parking_lot.occupancy() == {Size.SMALL: (1, 0), Size.MEDIUM: (0, 0), Size.LARGE: (1, 1)}
+            assert Journal(str(tmp_path)).read_snapshot(3)["ABC123"].date_of_exit == self.start + timedelta(hours=1)
+
+        assert not os.path.exists(tmp_path / f"{WAL}_00000002.csv")
+
+    def test_failed_append(self, tmp_path, monkeypatch):
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path))) as parking_lot:
+            def fail_once(records):
+                monkeypatch.undo()
+                raise OSError("The disk is full.")
+
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+            monkeypatch.setattr(parking_lot._journal, "append", fail_once)
+
+            with pytest.raises(OSError):
+                parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1))
+
+            # the unpark that was not logged is undone, so the vehicle can still leave
+            assert parking_lot.occupancy()[Size.SMALL] == (1, 1)
+            assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1)) == 40
+
+    def test_failed_fsync(self, tmp_path, monkeypatch):
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path), fsync_interval=0)) as parking_lot:
+            def fail_once(descriptor):
+                monkeypatch.undo()
+                raise OSError("The disk is full.")
+
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+            monkeypatch.setattr(os, "fsync", fail_once)
+
+            with pytest.raises(OSError):
+                parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1))
+
+        # the records of the commit that failed are cut from the log, so the vehicle is still parked
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path))) as parking_lot:
+            assert parking_lot.occupancy()[Size.SMALL] == (1, 1)
+            assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1)) == 40
+
+    def test_fsync_timer(self, tmp_path, monkeypatch):
+        fsyncs = []
+        fsync = os.fsync
+        monkeypatch.setattr(os, "fsync", lambda descriptor: fsyncs.append(fsync(descriptor)))
+
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path), fsync_interval=0.05)) as parking_lot:
+            fsyncs.clear()
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+            parking_lot.park_vehicle(ParkingVehicle(Size.LARGE, "ABC456"), EntryPoint.A, self.start)
+
+            # the first commit starts an interval, the next one is fsynced at its end without another commit
+            assert len(fsyncs) == 1
+            time.sleep(0.2)
+            assert len(fsyncs) == 2
+
+    def test_reporting_sink(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        reporting_sink = ReportingSink(engine)
+
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path / "journal")),
+                                 reporting_sink=reporting_sink) as parking_lot:
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+            parking_lot.park_vehicle(ParkingVehicle(Size.LARGE, "ABC456"), EntryPoint.A, self.start)
+            parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1.5))
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start + timedelta(hours=2))
+            parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=4))
+
+        assert reporting_sink.error is None
+
+        with engine.connect() as connection:
+            visits = connection.execute(select(Visit.license_plate, Visit.slot_id, Visit.size, Visit.fee)
+                                        .order_by(Visit.date_of_exit)).all()
+            vehicles = connection.execute(select(Vehicle.license_plate, Vehicle.__table__.c.date_of_exit)
+                                          .order_by(Vehicle.license_plate)).all()
+
+        assert visits == [("ABC123", 0, Size.SMALL, 40), ("ABC123", 0, Size.SMALL, 20)]
+        assert vehicles == [("ABC123", self.start + timedelta(hours=4)), ("ABC456", None)]
+        assert daily_report(engine, self.start)[Size.SMALL][2:4] == (1, 40)
+
+    def test_failed_reporting_sink(self, tmp_path, caplog):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")  # its tables are missing
+        reporting_sink = ReportingSink(engine)
+        parking_lot = JournaledParkingLot(self.parking_map, Journal(str(tmp_path / "journal")),
+                                          reporting_sink=reporting_sink)
+
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+
+        with pytest.raises(OperationalError):
+            reporting_sink.flush()
+
+        assert "reporting sink stopped" in caplog.text
+
+        # the sink doesn't write the next records on top of the missing ones, the parking lot goes on
+        Base.metadata.create_all(engine)
+        parking_lot.park_vehicle(ParkingVehicle(Size.LARGE, "ABC456"), EntryPoint.A, self.start)
+
+        with pytest.raises(OperationalError):
+            parking_lot.close()
+
+        with engine.connect() as connection:
+            assert connection.execute(select(Vehicle.license_plate)).all() == []
+
+        with JournaledParkingLot(self.parking_map, Journal(str(tmp_path / "journal"))) as parking_lot:
+            assert parking_lot.occupancy()[Size.LARGE] == (1, 1)
@@ -0,0 +1,80 @@
+from main import main, parse_command, read_commands
+from src.exceptions import InvalidGateEvent
+from src.enums import Size, EntryPoint, Direction
+
+from datetime import datetime
+
+import io
+import json
+import pytest
+
+
+def read_lines(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+
+class TestMain:
+    def test_parse_command(self):
+        event = parse_command(["ABC123", "small", "b", "2022-09-25T15:30"], Direction.IN)
+
+        assert (event.license_plate, event.size, event.entrypoint) == ("ABC123", Size.SMALL, EntryPoint.B)
+        assert event.timestamp == datetime(2022, 9, 25, 15, 30)
+        assert parse_command(["ABC123"], Direction.OUT).size is None
+
+        with pytest.raises(InvalidGateEvent):
+            parse_command(["ABC123", "2022-09-25T15:30", "A"], Direction.OUT)
+
+        events = list(read_commands(["ABC123,small,A,2022-09-25T15:30\n", "\n", "ABC456 huge A\n"], Direction.IN))
+
+        assert events[0].license_plate == "ABC123"
+        assert len(events) == 2 and isinstance(events[1], InvalidGateEvent)
+
+    def test_park_and_unpark(self, tmp_path, monkeypatch, capsys):
+        db = ["--db", f"sqlite:///{tmp_path}/parking_lot.db"]
+
+        assert main(["park", "ABC123", "small", "A", "2022-09-25T15:30", *db]) == 0
+        assert read_lines(capsys) == [{"license_plate": "ABC123", "timestamp": "2022-09-25T15:30:00",
+                                       "direction": "in", "slot_id": 0}]
+
+        monkeypatch.setattr("sys.stdin", io.StringIO("ABC456 large B 2022-09-25T15:31\nABC789 huge A\n"))
+
+        assert main(["park", *db]) == 1
+        assert [line.get("slot_id", line.get("error")) for line in read_lines(capsys)] == [1, "InvalidGateEvent"]
+
+        assert main(["status", "--zone", "a", *db]) == 0
+        assert read_lines(capsys)[0] == {"size": "SMALL", "slots": 1, "occupied": 1, "available": 0, "zone": "A"}
+
+        # an unknown zone is a usage error, like a zone the parking lot doesn't have
+        with pytest.raises(SystemExit) as exit_info:
+            main(["status", "--zone", "Z", *db])
+
+        assert exit_info.value.code == 2
+        assert main(["status", "--zone", "d", *db]) == 2
+        assert "no entrypoint D" in capsys.readouterr().err
+
+        monkeypatch.setattr("sys.stdin", io.StringIO("ABC123,2022-09-25T18:00\nABC456 2022-09-25T17:31\n"))
+
+        assert main(["unpark", *db]) == 0
+        assert [line["fee"] for line in read_lines(capsys)] == [40, 40]
+
+    def test_replay(self, tmp_path, capsys):
+        events = tmp_path / "gate_events.ndjson"
+        events.write_text(
+            '{"license_plate": "ABC123", "size": "small", "entrypoint": "A", "timestamp": "2022-09-25T15:30:00", '
+            '"direction": "in"}\n'
+            '{"license_plate": "ABC123", "timestamp": "2022-09-25T17:30:00", "direction": "out"}\n')
+
+        assert main(["replay", str(events), "--journal", str(tmp_path / "journal")]) == 0
+        assert [line.get("fee") for line in read_lines(capsys)] == [None, 40]
+
+        # the journal keeps the exit of the vehicle
+        assert main(["unpark", "ABC123", "--journal", str(tmp_path / "journal")]) == 1
+        assert read_lines(capsys)[0]["error"] == "VehicleNotParked"
+
+    def test_bench(self, capsys):
+        assert main(["bench", "--slots", "50", "--visits", "100", "--backend", "journal"]) == 0
+
+        result = read_lines(capsys)[0]
+
+        assert result["backend"] == "journal"
+        assert result["events"] > 100 and result["events_per_s"] > 0
@@ -2,9 +2,12 @@ from src.vehicles import *
 from src.parking_slot import ParkingSlot
 from src.parking_lot import AutomatedParkingLot, ParkingLot
 from src.enums import Size, EntryPoint
+from src.db import Base, create_db_engine
+from src.fee_calculator import ParkingFeeCalculator
 from src.exceptions import *
 
-from datetime import datetime
+from sqlalchemy import event
+from datetime import datetime, timedelta
 
 import pytest
 
@@ -129,3 +132,368 @@ class TestParkingLot:
         assert total_fee_medium_slot == 10060
         assert total_fee_large_slot == 10100
 
+    def test_park_vehicles(self, session):
+        parking_lot = AutomatedParkingLot(self.parking_map)
+        date_of_entry = datetime(2022, 9, 25, 15, 30)
+
+        results = parking_lot.park_vehicles([
+            (SmallParkingVehicle("ABC456"), EntryPoint.A, date_of_entry),
+            (MediumParkingVehicle("MED123"), EntryPoint.B, date_of_entry),
+            (LargeParkingVehicle("LRG123"), EntryPoint.C, date_of_entry),
+            (LargeParkingVehicle("ABC123"), EntryPoint.C, date_of_entry),
+            (LargeParkingVehicle("EFG123"), EntryPoint.C, date_of_entry),
+            (SmallParkingVehicle("ABC456"), EntryPoint.A, date_of_entry),
+        ])
+
+        assert [slot.slot_id for slot in results[:4]] == [0, 4, 5, 1]
+        assert isinstance(results[4], NoMoreAvailableSpot)
+        assert isinstance(results[5], VehicleAlreadyParked)
+
+    def test_unpark_vehicles(self, session):
+        parking_lot = AutomatedParkingLot(self.parking_map)
+        vehicle_small = SmallParkingVehicle("SML123")
+        vehicle_large = LargeParkingVehicle("LRG123")
+
+        parking_lot.park_vehicles([
+            (vehicle_small, EntryPoint.A, datetime(2022, 9, 25, 15, 30)),
+            (vehicle_large, EntryPoint.C, datetime(2022, 9, 25, 15, 30)),
+        ])
+
+        results = parking_lot.unpark_vehicles([
+            (vehicle_small, datetime(2022, 9, 25, 16, 30)),
+            (vehicle_large, datetime(2022, 9, 25, 20, 30)),
+            (vehicle_small, datetime(2022, 9, 25, 17, 30)),
+            (Vehicle(license_plate="NOT123"), datetime(2022, 9, 25, 17, 30)),
+        ])
+
+        assert results[:2] == [40, 240]
+        assert isinstance(results[2], VehicleNotParked)
+        assert isinstance(results[3], VehicleNotParked)
+
+        for slot in parking_lot.parking_slots:
+            assert slot.isempty is True
+
+    def test_park_vehicle_returning(self, session):
+        parking_lot = AutomatedParkingLot(self.parking_map)
+
+        parking_lot.park_vehicle(SmallParkingVehicle("SML123"), EntryPoint.A, datetime(2022, 9, 25, 10, 0))
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="SML123"), datetime(2022, 9, 25, 12, 0)) == 40
+
+        # came back within an hour, so the fee continues from the first entry
+        parking_lot.park_vehicle(SmallParkingVehicle("SML123"), EntryPoint.A, datetime(2022, 9, 25, 12, 30))
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="SML123"), datetime(2022, 9, 25, 15, 0)) == 40
+
+        # came back after more than an hour, so it is charged as a new visit
+        parking_lot.park_vehicle(SmallParkingVehicle("SML123"), EntryPoint.A, datetime(2022, 9, 25, 19, 0))
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="SML123"), datetime(2022, 9, 25, 21, 0)) == 40
+
+    def test_injected_engine(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db", journal_mode="WAL")
+        Base.metadata.create_all(engine)
+
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        slot = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.A,
+                                        datetime(2022, 9, 25, 15, 30))
+
+        restarted_parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        restored_slot = restarted_parking_lot.parking_slots[slot.slot_id]
+
+        assert not restored_slot.isempty
+        assert restored_slot.vehicle.license_plate == "ABC456"
+        assert restarted_parking_lot.unpark_vehicle(SmallParkingVehicle(license_plate="ABC456"),
+                                                    datetime(2022, 9, 25, 17, 30)) == 40
+
+    def test_parking_lots_have_their_own_sessions(self, engine):
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map)
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.A,
+                                 datetime(2022, 9, 25, 15, 30))
+
+        # a new db, the rows of the first parking lot are gone but its objects are still in its session
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+
+        restarted_parking_lot = AutomatedParkingLot(self.parking_map)
+        slot = restarted_parking_lot.park_vehicle(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.A,
+                                                  datetime(2022, 9, 25, 15, 30))
+
+        assert restarted_parking_lot._session is not parking_lot._session
+        assert slot.slot_id == 0
+        assert restarted_parking_lot.parking_slots[0].vehicle.license_plate == "XYZ123"
+
+        Base.metadata.drop_all(engine)
+
+    @pytest.mark.parametrize("num_of_entrypoints", [4, 5])
+    def test_entrypoint_layouts(self, session, num_of_entrypoints):
+        entrypoints = list(EntryPoint)[:num_of_entrypoints]
+        parking_map = {  # slot i is the nearest slot of the i-th entrypoint
+            "slot_sizes": [Size.SMALL] * num_of_entrypoints,
+            "distances": [tuple(abs(i - j) + 1 for j in range(num_of_entrypoints)) for i in range(num_of_entrypoints)],
+            "entrypoints": entrypoints
+        }
+        parking_lot = AutomatedParkingLot(parking_map, num_of_entrypoints=num_of_entrypoints)
+
+        # the value of an entrypoint is the column of its distances, D and E are 3 and 4
+        assert [entrypoint.value for entrypoint in entrypoints] == list(range(num_of_entrypoints))
+        assert [parking_lot.find_slot(Size.SMALL, entrypoint).slot_id for entrypoint in entrypoints] \
+            == list(range(num_of_entrypoints))
+
+        slot = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), entrypoints[-1],
+                                        datetime(2022, 9, 25, 15, 30))
+
+        assert slot.slot_id == num_of_entrypoints - 1
+
+        # the entrypoints of a parking map can't skip a column
+        with pytest.raises(ValueError):
+            AutomatedParkingLot({**parking_map, "entrypoints": entrypoints[:2] + entrypoints[3:]},
+                                num_of_entrypoints=num_of_entrypoints - 1)
+
+    def test_restore_queries(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        start = datetime(2022, 9, 25, 15, 30)
+        statements = []
+
+        for i, vehicle in enumerate([LargeParkingVehicle(license_plate="LRG123"),
+                                     MediumParkingVehicle(license_plate="MED123"),
+                                     SmallParkingVehicle(license_plate="SML123"),
+                                     SmallParkingVehicle(license_plate="SML456")]):
+            parking_lot.park_vehicle(vehicle, EntryPoint.A, start + timedelta(minutes=i))
+
+        parking_lot.unpark_vehicle(Vehicle(license_plate="SML456"), start + timedelta(hours=1))
+
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        restarted = AutomatedParkingLot(self.parking_map, engine=engine)
+
+        # one query loads the occupied slots with their vehicles, whatever their number
+        assert len([statement for statement in statements if "FROM slots" in statement]) == 1
+        assert len(statements) == 3  # with the last exit and the vehicles that exited within the window
+
+        statements.clear()
+
+        assert [restarted.parking_slots[slot_id].vehicle.license_plate for slot_id in (0, 1, 5)] \
+            == ["SML123", "LRG123", "MED123"]
+        assert restarted.unpark_vehicle(Vehicle(license_plate="SML123"), start + timedelta(hours=2)) == 40
+        assert not any(statement.startswith("SELECT") for statement in statements)
+
+    def test_occupancy_and_find_slot(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+
+        assert parking_lot.occupancy() == {Size.SMALL: (2, 0), Size.MEDIUM: (2, 0), Size.LARGE: (2, 0)}
+        assert parking_lot.available_slots(Size.MEDIUM) == 4
+
+        slot = parking_lot.find_slot(Size.MEDIUM, EntryPoint.A)
+
+        assert slot.slot_id == 1 and slot.isempty
+        assert parking_lot.find_slot(Size.MEDIUM, EntryPoint.A).slot_id == 1  # nothing was reserved
+
+        parking_lot.park_vehicle(MediumParkingVehicle(license_plate="MED123"), EntryPoint.A,
+                                 datetime(2022, 9, 25, 15, 30))
+
+        assert parking_lot.occupancy()[Size.LARGE] == (2, 1)
+        assert parking_lot.occupancy(EntryPoint.A)[Size.LARGE] == (1, 1)
+        assert parking_lot.available_slots(Size.LARGE) == 1
+        assert parking_lot.find_slot(Size.MEDIUM, EntryPoint.A).slot_id == 5
+
+        parking_lot.unpark_vehicle(Vehicle(license_plate="MED123"), datetime(2022, 9, 25, 17, 30))
+
+        assert parking_lot.occupancy(EntryPoint.A)[Size.LARGE] == (1, 0)
+
+        with pytest.raises(InvalidEntryPoint):
+            parking_lot.occupancy(EntryPoint.D)
+
+        with pytest.raises(InvalidEntryPoint):
+            parking_lot.available_slots(Size.SMALL, EntryPoint.D)
+
+    def test_reservations(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        start = datetime(2022, 9, 25, 15, 30)
+
+        reservation = parking_lot.reserve_slot(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, start,
+                                               start + timedelta(minutes=30))
+
+        assert reservation.slot_id == 0
+        assert parking_lot.available_slots(Size.SMALL) == 5
+        assert parking_lot.occupancy()[Size.SMALL] == (2, 0)
+
+        # the reserved slot is skipped by the other vehicles
+        slot = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.A,
+                                        start + timedelta(minutes=5))
+
+        assert slot.slot_id == 1
+
+        # the vehicle gets its reserved slot even from another entrypoint
+        slot = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.C,
+                                        start + timedelta(minutes=10))
+
+        assert slot.slot_id == 0
+        assert parking_lot.occupancy()[Size.SMALL] == (2, 1)
+
+        with pytest.raises(VehicleAlreadyParked):
+            parking_lot.reserve_slot(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, start,
+                                     start + timedelta(minutes=30))
+
+        with pytest.raises(ValueError):
+            parking_lot.reserve_slot(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.A, start, start)
+
+        # an expired reservation frees its slot
+        reservation = parking_lot.reserve_slot(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.A, start,
+                                               start + timedelta(minutes=30))
+
+        assert reservation.slot_id == 3
+        assert parking_lot.expire_reservations(start + timedelta(minutes=30)) == [reservation]
+        assert parking_lot.find_slot(Size.SMALL, EntryPoint.B).slot_id == 3
+
+        parking_lot.reserve_slot(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.B, start,
+                                 start + timedelta(minutes=30))
+
+        assert parking_lot.cancel_reservation("XYZ123").slot_id == 3
+        assert parking_lot.cancel_reservation("XYZ123") is None
+        assert parking_lot.available_slots(Size.SMALL) == 4
+
+        # a new reservation that can't be made keeps the old one
+        parking_lot.reserve_slot(LargeParkingVehicle(license_plate="LRG123"), EntryPoint.A, start,
+                                 start + timedelta(minutes=30))
+        reservation = parking_lot.reserve_slot(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.B, start,
+                                               start + timedelta(minutes=30))
+
+        with pytest.raises(NoMoreAvailableSpot):
+            parking_lot.reserve_slot(LargeParkingVehicle(license_plate="XYZ123"), EntryPoint.B, start,
+                                     start + timedelta(hours=1))
+
+        with pytest.raises(InvalidEntryPoint):
+            parking_lot.reserve_slot(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.D, start,
+                                     start + timedelta(hours=1))
+
+        assert parking_lot.available_slots(Size.SMALL) == 2
+        assert parking_lot.cancel_reservation("XYZ123") == reservation
+
+    def test_failed_commit(self, tmp_path, monkeypatch):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        start = datetime(2022, 9, 25, 15, 30)
+
+        def fail_once():
+            monkeypatch.undo()
+            raise RuntimeError("The db is down.")
+
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, start)
+        parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), start + timedelta(hours=1))
+        parking_lot.park_vehicle(MediumParkingVehicle(license_plate="MED123"), EntryPoint.C, start)
+        parking_lot.reserve_slot(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.B, start,
+                                 start + timedelta(hours=3))
+        occupancy = parking_lot.occupancy()
+
+        def park_batch():
+            date_of_entry = start + timedelta(hours=1, minutes=30)
+
+            return [(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, date_of_entry),
+                    (SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.A, date_of_entry),
+                    (LargeParkingVehicle(license_plate="LRG123"), EntryPoint.A, date_of_entry)]
+
+        monkeypatch.setattr(parking_lot._session, "commit", fail_once)
+
+        with pytest.raises(RuntimeError):
+            parking_lot.park_vehicles(park_batch())
+
+        # the changes of the batch are undone in memory too
+        assert parking_lot.occupancy() == occupancy
+        assert parking_lot.available_slots(Size.SMALL) == 4  # the reserved slot is still held
+        assert parking_lot.quote_fee("MED123", start + timedelta(hours=1)) == 40
+
+        with pytest.raises(VehicleNotParked):
+            parking_lot.quote_fee("LRG123", start + timedelta(hours=2))
+
+        # the retried batch gets the same slots, the reserved one and the continuous rate of the returning vehicle
+        assert [slot.slot_id for slot in parking_lot.park_vehicles(park_batch())] == [0, 3, 1]
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), start + timedelta(hours=2)) == 0
+
+        monkeypatch.setattr(parking_lot._session, "commit", fail_once)
+
+        with pytest.raises(RuntimeError):
+            parking_lot.unpark_vehicle(Vehicle(license_plate="MED123"), start + timedelta(hours=2))
+
+        assert parking_lot.occupancy()[Size.MEDIUM] == (2, 1)
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="MED123"), start + timedelta(hours=2)) == 40
+
+        # a restarted parking lot finds the same vehicles in the db
+        restarted = AutomatedParkingLot(self.parking_map, engine=engine)
+
+        assert restarted.occupancy() == parking_lot.occupancy()
+
+    def test_failed_park(self, tmp_path, monkeypatch):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        start = datetime(2022, 9, 25, 15, 30)
+        store_park = parking_lot._store_park
+
+        def fail_after_store_park(vehicle, vehicle_parked_before, slot):
+            store_park(vehicle, vehicle_parked_before, slot)
+            raise RuntimeError("The db is down.")
+
+        monkeypatch.setattr(parking_lot, "_store_park", fail_after_store_park)
+
+        with pytest.raises(RuntimeError):
+            parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, start)
+
+        # the slot claimed before the failure is freed
+        assert parking_lot.available_slots(Size.SMALL) == 6
+        assert parking_lot._undo_log == []
+
+        with pytest.raises(RuntimeError):
+            parking_lot.park_vehicles([(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, start),
+                                       (LargeParkingVehicle(license_plate="LRG123"), EntryPoint.D, start)])
+
+        assert parking_lot.available_slots(Size.SMALL) == 6
+
+        monkeypatch.undo()
+
+        assert parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, start).slot_id == 0
+        assert parking_lot.occupancy()[Size.SMALL] == (2, 1)
+
+    def test_quote_fee(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        settled = []
+
+        class CountingFeeCalculator(ParkingFeeCalculator):
+            def settle(self, schedule, date_of_exit):
+                settled.append(date_of_exit)
+                return super().settle(schedule, date_of_exit)
+
+        parking_lot = AutomatedParkingLot(self.parking_map, fee_calculator=CountingFeeCalculator(), engine=engine)
+        start = datetime(2022, 9, 25, 15, 30)
+
+        with pytest.raises(VehicleNotParked):
+            parking_lot.quote_fee("LRG123", start)
+
+        parking_lot.park_vehicle(LargeParkingVehicle(license_plate="LRG123"), EntryPoint.A, start)
+
+        assert parking_lot.quote_fee("LRG123", start + timedelta(hours=2)) == 40
+        assert parking_lot.quote_fee("LRG123", start + timedelta(hours=4, minutes=10)) == 40 + 100 * 2
+        assert parking_lot.quote_fee("LRG123", start + timedelta(hours=4, minutes=50)) == 40 + 100 * 2
+        assert len(settled) == 2  # the same billed hour is only calculated once
+
+        with pytest.raises(ValueError):
+            parking_lot.quote_fee("LRG123", start - timedelta(hours=1))
+
+        # quoting doesn't change the vehicle, so the fee at the exit is the same
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="LRG123"), start + timedelta(hours=4, minutes=10)) \
+            == 40 + 100 * 2
+
+        with pytest.raises(VehicleNotParked):
+            parking_lot.quote_fee("LRG123", start + timedelta(hours=5))
+
+        # back within the continuous window, the hours already paid are not quoted again
+        parking_lot.park_vehicle(LargeParkingVehicle(license_plate="LRG123"), EntryPoint.A,
+                                 start + timedelta(hours=4, minutes=30))
+
+        assert parking_lot.quote_fee("LRG123", start + timedelta(hours=4, minutes=50)) == 0
+        assert parking_lot.quote_fee("LRG123", start + timedelta(hours=5, minutes=10)) == 100
@@ -0,0 +1,75 @@
+from src.reservations import Reservation, ReservationBook, SynchronizedReservationBook, ReservationExpiryTimer
+from src.parking_lot import ThreadSafeParkingLot
+from src.vehicles import ParkingVehicle
+from src.enums import Size, EntryPoint
+
+from datetime import datetime, timedelta
+
+import threading
+
+
+class TestReservationBook:
+    start = datetime(2022, 9, 25, 15, 30)
+
+    def test_expire(self):
+        reservation_book = ReservationBook()
+        first = Reservation("ABC123", 0, self.start + timedelta(minutes=10))
+        second = Reservation("ABC456", 1, self.start + timedelta(minutes=20))
+
+        assert reservation_book.add(first) is None
+        assert reservation_book.add(second) is None
+        assert reservation_book.expire(self.start) == []
+        assert reservation_book.expire(self.start + timedelta(minutes=10)) == [first]
+        assert reservation_book.get("ABC123") is None and len(reservation_book) == 1
+
+    def test_replaced_and_removed_reservations_dont_expire(self):
+        reservation_book = SynchronizedReservationBook()
+        first = Reservation("ABC123", 0, self.start + timedelta(minutes=10))
+        replacement = Reservation("ABC123", 2, self.start + timedelta(minutes=30))
+
+        reservation_book.add(first)
+
+        assert reservation_book.add(replacement) is first
+
+        reservation_book.add(Reservation("ABC456", 1, self.start + timedelta(minutes=20)))
+
+        assert reservation_book.remove("ABC456").slot_id == 1
+        assert reservation_book.remove("ABC456") is None
+        assert reservation_book.expire(self.start + timedelta(minutes=25)) == []
+        assert reservation_book.expire(self.start + timedelta(minutes=30)) == [replacement]
+
+
+class TestReservationExpiryTimer:
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 2, 3), (2, 3, 1)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+
+    def test_timer(self, session):
+        parking_lot = ThreadSafeParkingLot(self.parking_map)
+        start = datetime(2022, 9, 25, 15, 30)
+        now = [start]
+        expired = threading.Event()
+
+        parking_lot.reserve_slot(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, start,
+                                 start + timedelta(minutes=10))
+
+        def clock():
+            if parking_lot.available_slots(Size.SMALL) == 2:
+                expired.set()
+
+            return now[0]
+
+        timer = ReservationExpiryTimer(parking_lot, interval=0.01, clock=clock)
+        timer.start()
+
+        assert not expired.wait(0.05)
+
+        now[0] = start + timedelta(minutes=10)
+
+        assert expired.wait(5)
+
+        timer.stop()
+
+        assert not timer.is_alive()
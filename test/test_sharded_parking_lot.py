@@ -0,0 +1,193 @@
+from src.vehicles import *
+from src.parking_lot import AutomatedParkingLot, ParkingLot
+from src.sharded_parking_lot import ShardedParkingLot, LocalShard, ProcessShard
+from src.enums import Size, EntryPoint
+from src.db import Base, create_db_engine
+from src.exceptions import *
+
+from datetime import datetime
+
+import pytest
+
+
+class TestShardedParkingLot:
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    level_1 = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 5, 5), (2, 5, 5)],
+        "entrypoints": entrypoints
+    }
+    level_2 = {
+        "slot_sizes": [Size.SMALL, Size.MEDIUM],
+        "distances": [(1, 1, 1), (2, 2, 2)],
+        "entrypoints": entrypoints
+    }
+
+    @staticmethod
+    def local_shard(parking_map, db_path):
+        engine = create_db_engine(f"sqlite:///{db_path}")
+        Base.metadata.create_all(engine)
+
+        return LocalShard(AutomatedParkingLot(parking_map, engine=engine))
+
+    def sharded_parking_lot(self, tmp_path):
+        return ShardedParkingLot([self.local_shard(self.level_1, tmp_path / "level_1.db"),
+                                  self.local_shard(self.level_2, tmp_path / "level_2.db")],
+                                 shard_distances=[(0, 0, 0), (3, 3, 3)])
+
+    def test_routes_to_nearest_shard(self, tmp_path):
+        parking_lot = self.sharded_parking_lot(tmp_path)
+
+        assert isinstance(parking_lot, ParkingLot)
+
+        # level 1 is nearer to entrypoint A, level 2 is nearer to entrypoint B even with its ramp
+        slot_1 = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A,
+                                          datetime(2022, 9, 25, 15, 30))
+        slot_2 = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B,
+                                          datetime(2022, 9, 25, 15, 30))
+
+        assert (parking_lot.shard_of("ABC123"), slot_1.slot_id) == (0, 0)
+        assert (parking_lot.shard_of("ABC456"), slot_2.slot_id) == (1, 0)
+
+        # the only slot left for a medium vehicle from A is the large slot of level 1
+        slot_3 = parking_lot.park_vehicle(MediumParkingVehicle(license_plate="MED123"), EntryPoint.A,
+                                          datetime(2022, 9, 25, 15, 30))
+
+        assert (parking_lot.shard_of("MED123"), slot_3.slot_id) == (0, 1)
+
+        with pytest.raises(VehicleAlreadyParked):
+            parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A,
+                                     datetime(2022, 9, 25, 15, 30))
+
+        with pytest.raises(InvalidEntryPoint):
+            parking_lot.park_vehicle(SmallParkingVehicle(license_plate="XYZ123"), EntryPoint.D,
+                                     datetime(2022, 9, 25, 15, 30))
+
+        parking_lot.park_vehicle(MediumParkingVehicle(license_plate="MED456"), EntryPoint.A,
+                                 datetime(2022, 9, 25, 15, 30))
+
+        with pytest.raises(NoMoreAvailableSpot):
+            parking_lot.park_vehicle(LargeParkingVehicle(license_plate="LRG123"), EntryPoint.A,
+                                     datetime(2022, 9, 25, 15, 30))
+
+    def test_unpark_by_plate(self, tmp_path):
+        parking_lot = self.sharded_parking_lot(tmp_path)
+
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B,
+                                 datetime(2022, 9, 25, 15, 30))
+
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"), datetime(2022, 9, 25, 17, 30)) == 40
+        assert parking_lot.shard_of("ABC456") is None
+
+        with pytest.raises(VehicleNotParked):
+            parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"), datetime(2022, 9, 25, 17, 30))
+
+        # the vehicle comes back within the continuous window to its previous level, which is farther from A
+        slot = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.A,
+                                        datetime(2022, 9, 25, 17, 45))
+
+        assert (parking_lot.shard_of("ABC456"), slot.slot_id) == (1, 0)
+
+    def test_batches(self, tmp_path):
+        parking_lot = self.sharded_parking_lot(tmp_path)
+
+        results = parking_lot.park_vehicles([
+            (SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, datetime(2022, 9, 25, 15, 30)),
+            (SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B, datetime(2022, 9, 25, 15, 30)),
+            (SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, datetime(2022, 9, 25, 15, 30)),
+        ])
+
+        assert [result.slot_id for result in results[:2]] == [0, 0]
+        assert isinstance(results[2], VehicleAlreadyParked)
+
+        results = parking_lot.unpark_vehicles([
+            (Vehicle(license_plate="ABC456"), datetime(2022, 9, 25, 17, 30)),
+            (Vehicle(license_plate="XYZ123"), datetime(2022, 9, 25, 17, 30)),
+            (Vehicle(license_plate="ABC123"), datetime(2022, 9, 25, 17, 30)),
+        ])
+
+        assert results[0] == 40 and results[2] == 40
+        assert isinstance(results[1], VehicleNotParked)
+
+    def test_restart(self, tmp_path):
+        parking_lot = self.sharded_parking_lot(tmp_path)
+        parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B,
+                                 datetime(2022, 9, 25, 15, 30))
+
+        restarted_parking_lot = self.sharded_parking_lot(tmp_path)
+
+        assert restarted_parking_lot.shard_of("ABC456") == 1
+        assert restarted_parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"),
+                                                    datetime(2022, 9, 25, 17, 30)) == 40
+
+    def test_failed_shard(self, tmp_path, monkeypatch):
+        parking_lot = self.sharded_parking_lot(tmp_path)
+        level_2 = parking_lot.shards[1]._parking_lot
+
+        def store_park(*args):
+            raise RuntimeError("disk I/O error")
+
+        monkeypatch.setattr(level_2, "_store_park", store_park)
+
+        with pytest.raises(RuntimeError):
+            parking_lot.park_vehicles([
+                (SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, datetime(2022, 9, 25, 15, 30)),
+                (SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B, datetime(2022, 9, 25, 15, 30)),
+            ])
+
+        # level 1 parked its vehicle, the reservation of level 2 is undone
+        assert [parking_lot.shard_of("ABC123"), parking_lot.shard_of("ABC456")] == [0, None]
+
+        monkeypatch.undo()
+        slot = parking_lot.park_vehicle(SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B,
+                                        datetime(2022, 9, 25, 15, 30))
+
+        assert (parking_lot.shard_of("ABC456"), slot.slot_id) == (1, 0)
+
+        monkeypatch.setattr(level_2, "_store_unpark", store_park)
+
+        with pytest.raises(RuntimeError):
+            parking_lot.unpark_vehicles([
+                (Vehicle(license_plate="ABC123"), datetime(2022, 9, 25, 17, 30)),
+                (Vehicle(license_plate="ABC456"), datetime(2022, 9, 25, 17, 30)),
+            ])
+
+        assert [parking_lot.shard_of("ABC123"), parking_lot.shard_of("ABC456")] == [None, 1]
+
+        monkeypatch.undo()
+
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"), datetime(2022, 9, 25, 17, 30)) == 40
+
+    def test_invalid_init(self, tmp_path):
+        with pytest.raises(ValueError):
+            ShardedParkingLot([])
+
+        with pytest.raises(ValueError):
+            ShardedParkingLot([self.local_shard(self.level_1, tmp_path / "level_1.db")],
+                              shard_distances=[(0, 0, 0), (3, 3, 3)])
+
+    def test_process_shards(self, tmp_path):
+        shards = [ProcessShard(self.level_1, f"sqlite:///{tmp_path}/level_1.db"),
+                  ProcessShard(self.level_2, f"sqlite:///{tmp_path}/level_2.db")]
+
+        # the exception of a failed call is sent back, and the process keeps serving its shard
+        shards[0].send("no_such_method")
+
+        assert isinstance(shards[0].receive(), AttributeError)
+
+        with ShardedParkingLot(shards, shard_distances=[(0, 0, 0), (3, 3, 3)]) as parking_lot:
+            results = parking_lot.park_vehicles([
+                (SmallParkingVehicle(license_plate="ABC123"), EntryPoint.A, datetime(2022, 9, 25, 15, 30)),
+                (SmallParkingVehicle(license_plate="ABC456"), EntryPoint.B, datetime(2022, 9, 25, 15, 30)),
+            ])
+
+            assert [result.slot_id for result in results] == [0, 0]
+            assert [parking_lot.shard_of("ABC123"), parking_lot.shard_of("ABC456")] == [0, 1]
+            assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"),
+                                              datetime(2022, 9, 25, 17, 30)) == 40
+
+        with ShardedParkingLot([ProcessShard(self.level_1, f"sqlite:///{tmp_path}/level_1.db"),
+                                ProcessShard(self.level_2, f"sqlite:///{tmp_path}/level_2.db")]) as parking_lot:
+            assert parking_lot.shard_of("ABC123") == 0
+            assert parking_lot.shard_of("ABC456") is None
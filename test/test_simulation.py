@@ -0,0 +1,62 @@
+from src.simulation import Scenario, SimulationResult, scenario_grid, simulate, run_scenarios
+from src.event_stream import GateEvent
+from src.enums import Size, EntryPoint, Direction
+
+from datetime import datetime, timedelta
+
+import os
+
+
+class TestSimulation:
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 2, 3), (4, 5, 6)],
+        "entrypoints": entrypoints
+    }
+    small_parking_map = {
+        "slot_sizes": [Size.LARGE],
+        "distances": [(1, 1, 1)],
+        "entrypoints": entrypoints
+    }
+
+    start = datetime(2022, 9, 25, 15, 30)
+    trace = [
+        GateEvent("ABC123", Size.SMALL, EntryPoint.A, start, Direction.IN),
+        GateEvent("ABC456", Size.SMALL, EntryPoint.B, start + timedelta(minutes=30), Direction.IN),
+        GateEvent("ABC123", None, None, start + timedelta(hours=2), Direction.OUT),
+        GateEvent("ABC456", None, None, start + timedelta(hours=5), Direction.OUT),
+    ]
+
+    def test_scenario_grid(self):
+        scenarios = scenario_grid({"one_level": self.parking_map}, [40, 50],
+                                  {"default": None, "cheap": {size: 10 for size in Size}})
+
+        assert [scenario.name for scenario in scenarios] == [
+            "one_level/flat_rate=40/default", "one_level/flat_rate=40/cheap",
+            "one_level/flat_rate=50/default", "one_level/flat_rate=50/cheap",
+        ]
+        assert scenarios[3] == Scenario("one_level/flat_rate=50/cheap", self.parking_map, 50,
+                                        {size: 10 for size in Size})
+
+    def test_simulate(self):
+        result = simulate(Scenario("one_level", self.parking_map), self.trace)
+
+        assert result == SimulationResult(
+            "one_level", 40 + 40 + 100 * 2, 2, 0, 0, {"A": 1, "B": 5},
+            [(self.start + timedelta(hours=hours), occupied) for hours, occupied in enumerate([0, 2, 2, 1, 1, 1])]
+        )
+
+        result = simulate(Scenario("small", self.small_parking_map, flat_rate=10), self.trace)
+
+        assert (result.revenue, result.num_of_parked, result.num_of_rejections, result.num_of_errors) == (10, 1, 1, 1)
+
+    def test_run_scenarios(self, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        scenarios = [Scenario("one_level", self.parking_map), Scenario("small", self.small_parking_map)]
+
+        results = run_scenarios(reversed(self.trace), scenarios, max_workers=2)
+
+        assert results == [simulate(scenario, self.trace) for scenario in scenarios]
+        assert os.listdir(tmp_path) == []  # the db of the parking lot is never used
@@ -0,0 +1,72 @@
+from src.slot_index import SlotIndex
+from src.compiled_parking_map import compile_parking_map
+from src.enums import Size, EntryPoint
+
+import random
+
+
+def nearest_by_sorting(slot_sizes, distances, free, vehicle_size, entrypoint):
+    sorted_ids = sorted(range(len(slot_sizes)), key=lambda i: (distances[i][entrypoint.value], slot_sizes[i].value))
+
+    for slot_id in sorted_ids:
+        if free[slot_id] and vehicle_size.value <= slot_sizes[slot_id].value:
+            return slot_id
+
+    return None
+
+
+class TestSlotIndex:
+    slots = [Size.SMALL, Size.LARGE, Size.MEDIUM, Size.SMALL, Size.MEDIUM, Size.LARGE]
+    distances = [(1, 2, 3), (1, 3, 2), (3, 2, 1), (2, 1, 3), (3, 1, 2), (2, 3, 1)]
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    def test_find_nearest(self):
+        slot_index = SlotIndex(compile_parking_map({
+            "slot_sizes": self.slots,
+            "distances": self.distances,
+            "entrypoints": self.entrypoints
+        }))
+
+        assert slot_index.find_nearest(Size.SMALL, EntryPoint.A) == 0
+        assert slot_index.find_nearest(Size.MEDIUM, EntryPoint.B) == 4
+        assert slot_index.find_nearest(Size.LARGE, EntryPoint.C) == 5
+
+        slot_index.occupy(5)
+        slot_index.occupy(1)
+
+        assert slot_index.find_nearest(Size.LARGE, EntryPoint.C) is None
+
+        slot_index.release(1)
+
+        assert slot_index.find_nearest(Size.LARGE, EntryPoint.C) == 1
+
+    def test_matches_sorting(self):
+        rng = random.Random(7)
+        num_of_slots = 200
+        slot_sizes = [rng.choice(list(Size)) for _ in range(num_of_slots)]
+        distances = [tuple(rng.randint(1, 20) for _ in self.entrypoints) for _ in range(num_of_slots)]
+        free = [True] * num_of_slots
+
+        slot_index = SlotIndex(compile_parking_map({
+            "slot_sizes": slot_sizes,
+            "distances": distances,
+            "entrypoints": self.entrypoints
+        }))
+
+        for _ in range(2000):
+            vehicle_size = rng.choice(list(Size))
+            entrypoint = rng.choice(self.entrypoints)
+            expected = nearest_by_sorting(slot_sizes, distances, free, vehicle_size, entrypoint)
+
+            assert slot_index.find_nearest(vehicle_size, entrypoint) == expected
+
+            if expected is not None and rng.random() < 0.6:
+                slot_index.occupy(expected)
+                free[expected] = False
+            else:
+                occupied = [i for i in range(num_of_slots) if not free[i]]
+
+                if occupied:
+                    slot_id = rng.choice(occupied)
+                    slot_index.release(slot_id)
+                    free[slot_id] = True
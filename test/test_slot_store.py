@@ -0,0 +1,74 @@
+from src.slot_store import SlotStore, ParkingSlotsView
+from src.compiled_parking_map import compile_parking_map
+from src.parking_slot import ParkingSlot
+from src.enums import Size, EntryPoint
+
+import pytest
+
+
+class TestSlotStore:
+    slots = [Size.SMALL, Size.LARGE, Size.MEDIUM, Size.SMALL]
+    distances = [(1, 2, 3), (1, 3, 2), (3, 2, 1), (2, 1, 3)]
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    def compile(self):
+        return compile_parking_map({"slot_sizes": self.slots, "distances": self.distances,
+                                    "entrypoints": self.entrypoints})
+
+    def test_store(self):
+        slot_store = SlotStore(self.compile())
+
+        assert len(slot_store) == 4
+        assert slot_store.size(2) == Size.MEDIUM
+        assert slot_store.slot_distances(3) == (2, 1, 3)
+        assert slot_store.distances.shape == (3, 4)
+
+        slot_store.occupy(0, "SML123")
+        slot_store.occupy(3, "SML456")
+
+        assert slot_store.is_empty(0) is False and slot_store.plate(0) == "SML123"
+        assert slot_store.occupied_slot_ids().tolist() == [0, 3]
+        assert slot_store.occupancy()[Size.SMALL] == (2, 2)
+        assert slot_store.occupancy()[Size.LARGE] == (1, 0)
+
+        slot_store.release(0)
+
+        assert slot_store.is_empty(0) is True and slot_store.plate(0) is None
+        assert slot_store.occupancy()[Size.SMALL] == (2, 1)
+
+    def test_zone_occupancy(self):
+        slot_store = SlotStore(self.compile())
+
+        # every slot is in the zone of its nearest entrypoint, the first one on a tie
+        assert slot_store.zones.tolist() == [0, 0, 2, 1]
+        assert slot_store.occupancy(0) == {Size.SMALL: (1, 0), Size.MEDIUM: (0, 0), Size.LARGE: (1, 0)}
+
+        slot_store.occupy(0, "SML123")
+        slot_store.occupy(0, "SML123")
+        slot_store.occupy(3, "SML456")
+
+        assert slot_store.occupancy(0)[Size.SMALL] == (1, 1)
+        assert slot_store.occupancy(1)[Size.SMALL] == (1, 1)
+
+        slot_store.release(3)
+        slot_store.release(3)
+
+        assert slot_store.occupancy(1)[Size.SMALL] == (1, 0)
+        assert slot_store.occupancy()[Size.SMALL] == (2, 1)
+
+    def test_view(self):
+        slot_store = SlotStore(self.compile())
+        occupied_slot = ParkingSlot(1, Size.LARGE, (1, 3, 2))
+        parking_slots = ParkingSlotsView(slot_store, lambda slot_id: occupied_slot)
+
+        slot_store.occupy(1, "LRG123")
+
+        assert len(parking_slots) == 4
+        assert parking_slots[1] is occupied_slot
+        assert parking_slots[-1].slot_id == 3 and parking_slots[-1].isempty is True
+        assert parking_slots[2].distances == (3, 2, 1)
+        assert [slot.slot_id for slot in parking_slots[1:3]] == [1, 2]
+        assert all(type(slot) == ParkingSlot for slot in parking_slots)
+
+        with pytest.raises(IndexError):
+            parking_slots[4]
@@ -0,0 +1,68 @@
+from src.vehicles import *
+from src.parking_lot import ThreadSafeParkingLot
+from src.parking_slot import ParkingSlot
+from src.enums import Size, EntryPoint
+from src.exceptions import *
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+import random
+import threading
+
+
+class TestThreadSafeParkingLot:
+    num_of_threads = 16
+    vehicles_per_thread = 60
+    entrypoints = [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+
+    def test_no_slot_assigned_twice(self, engine, session):
+        rng = random.Random(3)
+        num_of_slots = 600
+        parking_map = {
+            "slot_sizes": [rng.choice(list(Size)) for _ in range(num_of_slots)],
+            "distances": [tuple(rng.randint(1, 30) for _ in self.entrypoints) for _ in range(num_of_slots)],
+            "entrypoints": self.entrypoints
+        }
+        parking_lot = ThreadSafeParkingLot(parking_map)
+        occupants = {}
+        occupants_lock = threading.Lock()
+        double_assignments = []
+        date_of_entry = datetime(2022, 9, 25, 15, 30)
+
+        def gate(thread_id):
+            thread_rng = random.Random(thread_id)
+
+            for i in range(self.vehicles_per_thread):
+                license_plate = f"T{thread_id}V{i}"
+
+                try:
+                    slot = parking_lot.park_vehicle(ParkingVehicle(thread_rng.choice(list(Size)), license_plate),
+                                                    thread_rng.choice(self.entrypoints), date_of_entry)
+                except NoMoreAvailableSpot:
+                    continue
+
+                with occupants_lock:
+                    if slot.slot_id in occupants:
+                        double_assignments.append((slot.slot_id, occupants[slot.slot_id], license_plate))
+
+                    occupants[slot.slot_id] = license_plate
+
+                if thread_rng.random() < 0.5:  # leave the slot so other threads can take it
+                    with occupants_lock:
+                        del occupants[slot.slot_id]
+
+                    parking_lot.unpark_vehicle(Vehicle(license_plate=license_plate),
+                                               date_of_entry + timedelta(hours=1))
+
+        with ThreadPoolExecutor(self.num_of_threads) as executor:
+            list(executor.map(gate, range(self.num_of_threads)))
+
+        assert double_assignments == []
+
+        slots_in_db = {slot.slot_id: slot.vehicle_plate for slot in Session(bind=engine).query(ParkingSlot)}
+
+        assert slots_in_db == occupants
+        assert {slot.slot_id for slot in parking_lot.parking_slots if not slot.isempty} == set(occupants)
+        assert sum(occupied for _, occupied in parking_lot.occupancy().values()) == len(occupants)
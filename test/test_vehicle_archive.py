@@ -0,0 +1,110 @@
+from src.vehicle_archive import VehicleArchive, migrate_schema, partition_name
+from src.parking_lot import AutomatedParkingLot, ThreadSafeParkingLot
+from src.vehicles import Vehicle, ParkingVehicle
+from src.visits import Visit
+from src.db import Base, create_db_engine
+from src.enums import Size, EntryPoint
+
+from sqlalchemy import inspect, select
+from datetime import datetime, timedelta
+
+import pytest
+
+
+class TestVehicleArchive:
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 2, 3), (2, 3, 1)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+    start = datetime(2022, 9, 30, 22, 0)
+
+    @staticmethod
+    def vehicle_plates(engine):
+        with engine.connect() as connection:
+            return sorted(connection.execute(select(Vehicle.__table__.c.license_plate)).scalars())
+
+    @staticmethod
+    def visit_plates(engine):
+        with engine.connect() as connection:
+            return sorted(connection.execute(select(Visit.__table__.c.license_plate)).scalars())
+
+    @pytest.mark.parametrize("parking_lot_class", [AutomatedParkingLot, ThreadSafeParkingLot])
+    def test_evicted_vehicles_are_archived(self, tmp_path, parking_lot_class):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+        vehicle_archive = VehicleArchive()
+        parking_lot = parking_lot_class(self.parking_map, engine=engine, vehicle_archive=vehicle_archive)
+
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+        parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=2))
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC456"), EntryPoint.A,
+                                 self.start + timedelta(hours=2, minutes=30))
+
+        assert self.vehicle_plates(engine) == ["ABC123", "ABC456"]  # ABC123 is within the continuous window
+
+        parking_lot.park_vehicle(ParkingVehicle(Size.LARGE, "ABC789"), EntryPoint.A, self.start + timedelta(hours=4))
+
+        assert self.vehicle_plates(engine) == ["ABC456", "ABC789"]
+        assert vehicle_archive.partitions(engine) == [partition_name(self.start + timedelta(hours=2))]
+
+        history = vehicle_archive.history(engine, "ABC123")
+
+        # the visit is moved from the visits table to the partition of its month
+        assert [(visit.date_of_exit, visit.fee) for visit in history] == [(self.start + timedelta(hours=2), 40)]
+        assert self.visit_plates(engine) == []
+
+        # a vehicle that comes back after it was archived starts a new visit
+        parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"), self.start + timedelta(hours=5))
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start + timedelta(hours=5))
+
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=6)) == 40
+        assert vehicle_archive.history(engine, "ABC123")[:1] == history
+        assert len(vehicle_archive.history(engine, "ABC123")) == 2
+
+        partition = vehicle_archive.partitions(engine)[0]
+
+        assert [index["column_names"] for index in inspect(engine).get_indexes(partition)] == \
+            [["license_plate", "date_of_exit"]]
+
+    def test_migrate_schema(self, tmp_path):
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+
+        with engine.begin() as connection:  # the tables of a db created before the indexes
+            connection.exec_driver_sql("DROP INDEX ix_slots_vehicle_plate")
+            connection.exec_driver_sql("DROP INDEX ix_vehicles_date_of_exit")
+
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+
+        for hours, license_plate in enumerate(["ABC123", "ABC456", "ABC789"]):
+            parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, license_plate), EntryPoint.A,
+                                     self.start + timedelta(hours=hours * 24))
+            parking_lot.unpark_vehicle(Vehicle(license_plate=license_plate),
+                                       self.start + timedelta(hours=hours * 24 + 1))
+
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "XYZ123"), EntryPoint.A, self.start + timedelta(days=3))
+        parking_lot._session.close()
+
+        with engine.begin() as connection:  # and before the visits table
+            connection.exec_driver_sql("DELETE FROM visits WHERE license_plate != 'ABC456'")
+
+        assert migrate_schema(engine) == 2
+
+        indexes = {index["name"] for table in ("slots", "vehicles") for index in inspect(engine).get_indexes(table)}
+
+        assert {"ix_slots_vehicle_plate", "ix_vehicles_date_of_exit"} <= indexes
+        assert self.vehicle_plates(engine) == ["ABC789", "XYZ123"]
+        assert VehicleArchive.partitions(engine) == ["visits_2022_09", "visits_2022_10"]
+        assert self.visit_plates(engine) == ["ABC789"]
+        assert migrate_schema(engine) == 0
+
+        # the visits that were not recorded have no fee
+        assert [visit.fee for visit in VehicleArchive().history(engine, "ABC123")] == [None]
+        assert [visit.fee for visit in VehicleArchive().history(engine, "ABC456")] == [40]
+
+        # the migrated db is restored like any other
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine, vehicle_archive=VehicleArchive())
+
+        assert parking_lot.parking_slots[0].vehicle_plate == "XYZ123"
+        assert "ABC789" in parking_lot._vehicle_registry
@@ -0,0 +1,44 @@
+from src.vehicle_registry import VehicleRegistry
+from src.vehicles import SmallParkingVehicle
+
+from datetime import datetime
+
+
+class TestVehicleRegistry:
+    def test_add(self):
+        registry = VehicleRegistry()
+        vehicle = SmallParkingVehicle("ABC123")
+
+        registry.add(vehicle)
+
+        assert "ABC123" in registry and len(registry) == 1
+        assert registry.get("ABC123") is vehicle
+        assert registry.get("ABC234") is None
+
+    def test_evict(self):
+        registry = VehicleRegistry()
+        vehicle_parked = SmallParkingVehicle("ABC123")
+        vehicle_exited = SmallParkingVehicle("ABC234")
+        vehicle_exited.date_of_exit = datetime(2022, 9, 25, 15, 30)
+
+        registry.add(vehicle_parked)
+        registry.add(vehicle_exited)
+        registry.exit(vehicle_exited)
+
+        assert registry.evict(datetime(2022, 9, 25, 16, 30)) == []  # still within the continuous window
+        assert registry.evict(datetime(2022, 9, 25, 16, 31)) == [vehicle_exited]
+        assert "ABC234" not in registry and "ABC123" in registry
+
+    def test_evict_returned_vehicle(self):
+        registry = VehicleRegistry()
+        vehicle = SmallParkingVehicle("ABC123")
+        vehicle.date_of_exit = datetime(2022, 9, 25, 15, 30)
+
+        registry.add(vehicle)
+        registry.exit(vehicle)
+
+        returned_vehicle = SmallParkingVehicle("ABC123")
+        registry.add(returned_vehicle)  # the vehicle came back before it was evicted
+
+        assert registry.evict(datetime(2022, 9, 26, 15, 30)) == []
+        assert registry.get("ABC123") is returned_vehicle
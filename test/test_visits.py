@@ -0,0 +1,83 @@
+from src.visits import Visit, HourlyVisitStats, report, daily_report
+from src.parking_lot import AutomatedParkingLot
+from src.vehicles import Vehicle, ParkingVehicle
+from src.db import Base, create_db_engine
+from src.enums import Size, EntryPoint
+
+from sqlalchemy import event, select
+from datetime import datetime, timedelta
+
+import pytest
+
+
+class TestVisits:
+    parking_map = {
+        "slot_sizes": [Size.SMALL, Size.LARGE],
+        "distances": [(1, 2, 3), (2, 3, 1)],
+        "entrypoints": [EntryPoint.A, EntryPoint.B, EntryPoint.C]
+    }
+    start = datetime(2022, 9, 30, 22, 0)
+
+    @pytest.fixture(params=[True, False], ids=["upsert", "update_or_insert"])
+    def engine(self, request, tmp_path, monkeypatch):
+        if not request.param:
+            monkeypatch.setattr("src.visits.UPSERT_DIALECTS", set())
+
+        engine = create_db_engine(f"sqlite:///{tmp_path}/parking_lot.db")
+        Base.metadata.create_all(engine)
+
+        return engine
+
+    def park_and_unpark(self, engine):
+        parking_lot = AutomatedParkingLot(self.parking_map, engine=engine)
+        statements = []
+
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start)
+        parking_lot.park_vehicle(ParkingVehicle(Size.LARGE, "ABC456"), EntryPoint.A, self.start + timedelta(hours=1))
+
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=1.5)) == 40
+
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+        parking_lot.park_vehicle(ParkingVehicle(Size.SMALL, "ABC123"), EntryPoint.A, self.start + timedelta(hours=2))
+
+        # the vehicle that came back updates its row instead of deleting it and inserting it again
+        assert not any(statement.startswith("DELETE FROM vehicles") for statement in statements)
+        assert any(statement.startswith("UPDATE vehicles") for statement in statements)
+
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC456"), self.start + timedelta(hours=3.5)) == 40
+        assert parking_lot.unpark_vehicle(Vehicle(license_plate="ABC123"), self.start + timedelta(hours=4)) == 20
+
+    def test_visits_are_appended(self, engine):
+        self.park_and_unpark(engine)
+
+        with engine.connect() as connection:
+            visits = connection.execute(select(Visit.license_plate, Visit.slot_id, Visit.size, Visit.fee)
+                                        .order_by(Visit.date_of_exit)).all()
+            num_of_vehicles = len(connection.execute(select(Vehicle.license_plate)).all())
+
+        assert visits == [("ABC123", 0, Size.SMALL, 40), ("ABC456", 1, Size.LARGE, 40),
+                          ("ABC123", 0, Size.SMALL, 20)]
+        assert num_of_vehicles == 2
+
+    def test_reports(self, engine):
+        self.park_and_unpark(engine)
+
+        first_day = daily_report(engine, self.start)
+        second_day = daily_report(engine, self.start + timedelta(days=1))
+
+        assert first_day[Size.SMALL][2:] == (1, 40, 1.5, 1.5 / 24)
+        assert first_day[Size.LARGE][2:] == (0, 0, 0, 1 / 24)  # the vehicle left the next day
+        assert second_day[Size.SMALL][2:] == (1, 20, 2, 2 / 24)
+        assert second_day[Size.LARGE][2:] == (1, 40, 2.5, 1.5 / 24)
+
+        hours = report(engine, self.start, self.start + timedelta(hours=2), timedelta(hours=1))
+
+        assert [(hour.period_start.hour, hour.size, hour.num_of_visits, hour.mean_occupancy) for hour in hours] == [
+            (22, Size.SMALL, 0, 1), (23, Size.SMALL, 1, 0.5), (23, Size.LARGE, 0, 1)]
+
+        with engine.connect() as connection:
+            # the visit that left at 2:00 is counted in the hour of its exit, where it occupied no time
+            assert len(connection.execute(select(HourlyVisitStats.period_start)).all()) == 8
+
+        with pytest.raises(ValueError):
+            report(engine, self.start, self.start + timedelta(days=7), timedelta(weeks=1))